@@ -1,20 +1,17 @@
 #!/usr/bin/env python3
 """
-Generate Android mipmap icons from iOS icon sources.
-Converts 180x180 iOS icons to Android's required mipmap sizes.
+Generate Android mipmap icons from the 1024x1024 master icons.
+Downscales design/master_icons/{name}_1024.png to Android's required mipmap
+sizes (run design/process_nano_icons.py first to produce the masters).
 """
 
 from PIL import Image
 import os
+import sys
 
-# Android mipmap sizes (for adaptive icons, we need slightly larger for foreground)
-MIPMAP_SIZES = {
-    'mipmap-mdpi': 48,
-    'mipmap-hdpi': 72,
-    'mipmap-xhdpi': 96,
-    'mipmap-xxhdpi': 144,
-    'mipmap-xxxhdpi': 192,
-}
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'design'))
+import output_writer
+import render_plan
 
 # New icon names matching iOS
 ICONS = [
@@ -31,33 +28,27 @@ ICONS = [
 
 def generate_icons():
     base_dir = os.path.dirname(os.path.abspath(__file__))
-    ios_assets_dir = os.path.join(base_dir, '..', 'ios', 'Runner', 'Assets.xcassets')
-    android_res_dir = os.path.join(base_dir, 'app', 'src', 'main', 'res')
+    project_dir = os.path.dirname(base_dir)
+    master_dir = os.path.join(project_dir, 'design', 'master_icons')
 
     for icon_name in ICONS:
-        # Source: iOS 180x180 icon
-        ios_icon_path = os.path.join(ios_assets_dir, f'AppIcon-{icon_name}.appiconset', 'icon_180.png')
+        # Source: 1024x1024 master (never upscale the 180px iOS icon to 192px)
+        master_path = os.path.join(master_dir, f'{icon_name}_{render_plan.MASTER_SIZE}.png')
 
-        if not os.path.exists(ios_icon_path):
-            print(f"Warning: Source icon not found: {ios_icon_path}")
+        if not os.path.exists(master_path):
+            print(f"Warning: Master icon not found: {master_path}")
             continue
 
         print(f"Processing {icon_name}...")
-        source_img = Image.open(ios_icon_path)
+        source_img = Image.open(master_path).convert('RGB')
 
-        # Generate for each mipmap density
-        for mipmap_folder, size in MIPMAP_SIZES.items():
-            output_dir = os.path.join(android_res_dir, mipmap_folder)
-            os.makedirs(output_dir, exist_ok=True)
-
-            # Resize with high quality
-            resized = source_img.resize((size, size), Image.Resampling.LANCZOS)
-
-            # Save as ic_launcher_{name}.png
-            output_path = os.path.join(output_dir, f'ic_launcher_{icon_name}.png')
-            resized.save(output_path, 'PNG')
+        # Generate every mipmap density from the one decoded source
+        targets = render_plan.android_targets(project_dir, icon_name)
+        render_plan.render(source_img, targets)
+        for size, mipmap_folder in render_plan.ANDROID_SIZES:
             print(f"  Created: {mipmap_folder}/ic_launcher_{icon_name}.png ({size}x{size})")
 
+    output_writer.print_summary()
     print("\nDone! Android icons generated successfully.")
 
 if __name__ == '__main__':
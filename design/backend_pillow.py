@@ -0,0 +1,66 @@
+#!/usr/bin/env python3
+"""
+Pillow image backend (see image_backend.py).
+Images are PIL images, so this is the reference behaviour of the scripts.
+"""
+
+from PIL import Image
+
+import output_writer
+import quality
+import render_plan
+import strips
+
+NAME = 'pillow'
+
+
+def open(path, rgb=False):
+    """Open an image, optionally as RGB, at the quality preset's resolution."""
+    img = Image.open(path)
+    return quality.reduce_source(img.convert('RGB') if rgb else img)
+
+
+def crop(img, box):
+    """Crop to a (left, top, right, bottom) box."""
+    return img.crop(box)
+
+
+def size(img):
+    """(width, height) of an image."""
+    return img.size
+
+
+def resize(img, size):
+    """
+    Resize to an exact (width, height) with the quality preset's filter
+    (Lanczos for release, in strips if strip mode is on).
+    """
+    return strips.resize(img, size, quality.setting('resample'))
+
+
+def composite(base, overlay, position=(0, 0)):
+    """base with overlay pasted at position, using the overlay's alpha if any."""
+    result = base.copy()
+    mask = overlay if 'A' in overlay.getbands() else None
+    result.paste(overlay, position, mask)
+    return result
+
+
+def encode(img, path):
+    """Write img as a PNG."""
+    output_writer.write_png(img, path)
+
+
+def render(img, targets):
+    """Render img to (px, path) targets through the shared render plan."""
+    return render_plan.render(img, targets)
+
+
+def to_pil(img):
+    """Already a Pillow image."""
+    return img
+
+
+def from_pil(img):
+    """Already a Pillow image."""
+    return img
@@ -0,0 +1,173 @@
+#!/usr/bin/env python3
+"""
+libvips image backend (see image_backend.py), via pyvips.
+Operations only build a pipeline; pixels are computed when an image is
+encoded or converted to Pillow, and only for the region that is needed.
+Requires pyvips and the libvips library.
+"""
+
+from PIL import Image
+import os
+
+import numpy as np
+import pyvips
+
+import output_writer
+import quality
+import render_plan
+
+NAME = 'vips'
+
+# Rows per libvips request when reading a file in strips
+FETCH_ROWS = 64
+
+# libvips kernel for each quality preset resample filter
+KERNELS = {
+    Image.Resampling.NEAREST: 'nearest',
+    Image.Resampling.BILINEAR: 'linear',
+    Image.Resampling.BICUBIC: 'cubic',
+    Image.Resampling.LANCZOS: 'lanczos3',
+}
+
+# Pillow mode for each band count of an 8-bit image
+PIL_MODES = {1: 'L', 2: 'LA', 3: 'RGB', 4: 'RGBA'}
+
+
+def _rgb(img):
+    """First three bands, or a single band repeated, like Image.convert('RGB')."""
+    if img.bands >= 3:
+        return img.extract_band(0, n=3)
+    band = img.extract_band(0)
+    return band.bandjoin([band, band])
+
+
+def open(path, rgb=False):
+    """Open an image lazily, optionally as RGB, at the quality preset's resolution."""
+    # Random access, since callers crop several regions of one grid
+    img = pyvips.Image.new_from_file(path)
+    factor = quality.setting('source_reduce')
+    if factor > 1:
+        img = img.shrink(factor, factor)
+    return _rgb(img) if rgb else img
+
+
+def read_strips(path, rows):
+    """
+    Yield (top, pixels) for each strip of rows rows of the image file at
+    path, as (h, W, 3) RGB arrays, decoding the file top to bottom. Only
+    the strip being read and the decoder's own few rows are in memory.
+    """
+    # libvips' operation cache would keep each finished loader and its
+    # buffers alive, so it is off while the file is read
+    cache_max = pyvips.cache_get_max()
+    pyvips.cache_set_max(0)
+    try:
+        img = _rgb(pyvips.Image.new_from_file(path, access='sequential'))
+        if img.format != 'uchar':
+            img = img.cast('uchar')
+        region = pyvips.Region.new(img)
+        for top in range(0, img.height, rows):
+            pixels = np.empty((min(rows, img.height - top), img.width, 3), dtype=np.uint8)
+            # libvips buffers several times the rows asked for, so ask for few at a time
+            for row in range(0, pixels.shape[0], FETCH_ROWS):
+                height = min(FETCH_ROWS, pixels.shape[0] - row)
+                data = region.fetch(0, top + row, img.width, height)
+                pixels[row:row + height] = np.frombuffer(data, dtype=np.uint8).reshape(
+                    height, img.width, 3)
+            yield top, pixels
+    finally:
+        pyvips.cache_set_max(cache_max)
+
+
+def crop(img, box):
+    """
+    Crop to a (left, top, right, bottom) box. Parts of the box outside the
+    image are black, as with Image.crop.
+    """
+    left, top, right, bottom = box
+    if left >= 0 and top >= 0 and right <= img.width and bottom <= img.height:
+        return img.crop(left, top, right - left, bottom - top)
+    return img.embed(-left, -top, right - left, bottom - top, extend='black')
+
+
+def size(img):
+    """(width, height) of an image."""
+    return img.width, img.height
+
+
+def resize(img, size):
+    """
+    Resize to an exact (width, height) with the quality preset's filter
+    (Lanczos for release), like the Pillow backend.
+    """
+    width, height = size
+    kernel = KERNELS[quality.setting('resample')]
+    hscale, vscale = width / img.width, height / img.height
+    try:
+        # gap=0: one kernel pass over the source, as Image.resize does
+        return img.resize(hscale, vscale=vscale, kernel=kernel, gap=0)
+    except pyvips.Error:
+        # Past libvips' largest single-pass reduction; let it shrink first
+        return img.resize(hscale, vscale=vscale, kernel=kernel)
+
+
+def composite(base, overlay, position=(0, 0)):
+    """base with overlay placed at position, using the overlay's alpha if any."""
+    x, y = position
+    if not overlay.hasalpha():
+        return base.insert(overlay, x, y)
+    result = base.composite2(overlay, 'over', x=x, y=y)
+    # Keep the base's band count, as Image.paste does
+    return result if base.hasalpha() else result.flatten()
+
+
+def encode(img, path):
+    """
+    Write img as a PNG through output_writer, so the file is byte-identical
+    to the Pillow backend's and skipped when its pixels are unchanged.
+    """
+    output_writer.write_png(to_pil(img), path)
+
+
+def render(img, targets):
+    """
+    Render img (a vips or Pillow image) to (px, path) targets.
+    Every size is resized directly from img with the preset's filter, so
+    no pyramid is needed.
+    Returns the number of resamples performed.
+    """
+    if isinstance(img, Image.Image):
+        img = from_pil(img)
+
+    resamples = 0
+    for px, paths in render_plan.build_plan(targets):
+        resized = img
+        if size(img) != (px, px):
+            resized = resize(img, (px, px))
+            resamples += 1
+        if len(paths) > 1:
+            # Compute the pixels once rather than once per path
+            resized = resized.copy_memory()
+        for path in paths:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            encode(resized, path)
+    return resamples
+
+
+def to_pil(img):
+    """Compute img and return it as a Pillow image."""
+    if img.format != 'uchar':
+        img = img.cast('uchar')
+    mode = PIL_MODES[img.bands]
+    return Image.frombuffer(mode, (img.width, img.height), img.write_to_memory(),
+                            'raw', mode, 0, 1)
+
+
+def from_pil(img):
+    """Wrap a Pillow image's pixels as a vips image."""
+    if img.mode not in ('L', 'LA', 'RGB', 'RGBA'):
+        img = img.convert('RGBA' if 'A' in img.getbands() else 'RGB')
+    bands = len(img.getbands())
+    vips_img = pyvips.Image.new_from_memory(img.tobytes(), img.width, img.height,
+                                            bands, 'uchar')
+    return vips_img.copy(interpretation='srgb' if bands >= 3 else 'b-w')
@@ -0,0 +1,243 @@
+#!/usr/bin/env python3
+"""
+Resumable batch run over a directory of icon exports.
+Every image under the input directory (e.g. canva_icons/ or nano_icons/) is
+fixed (Canva gray background or corners, or not at all) and rendered to
+every platform size under the output directory:
+
+    python batch_icons.py canva_icons --out batch_icons_out -j 4
+    python batch_icons.py nano_icons --fix none
+
+Each finished item is appended to a journal (OUT/.batch_journal.jsonl) once
+its outputs are on disk. After a crash or Ctrl-C the same command resumes:
+items already in the journal with the same source file and settings are
+skipped, and the run continues from the first incomplete one. --restart
+ignores the journal. Progress lines show throughput and an ETA.
+
+An item that fails (e.g. a corrupt source) is reported, journaled as failed
+and retried on the next run; the rest of the batch carries on, and the run
+exits non-zero.
+"""
+
+from PIL import Image
+import argparse
+import functools
+import json
+import os
+import sys
+import time
+
+import build_manifest
+import output_writer
+import parallel
+import pixel_cache
+import quality
+import render_plan
+
+IMAGE_EXTENSIONS = ('.png', '.jpg', '.jpeg')
+
+JOURNAL_NAME = '.batch_journal.jsonl'
+
+# --fix choices: (module, function), imported in the worker when used
+FIXERS = {
+    'gray': ('fix_icon_corners_v2', 'fix_gray_pixels'),
+    'corners': ('fix_icon_corners', 'fix_corners'),
+    'none': None,
+}
+
+
+def find_sources(input_dir, exclude=None):
+    """Image files under input_dir (relative paths, sorted), skipping exclude."""
+    sources = []
+    for root, dirs, files in os.walk(input_dir):
+        dirs[:] = sorted(d for d in dirs if not d.startswith('.')
+                         and os.path.join(root, d) != exclude)
+        for filename in sorted(files):
+            if filename.lower().endswith(IMAGE_EXTENSIONS):
+                sources.append(os.path.relpath(os.path.join(root, filename), input_dir))
+    return sources
+
+
+def item_targets(out_dir, item):
+    """Every distinct platform size plus the master, as OUT/<item>/<name>_<px>.png."""
+    name = os.path.splitext(os.path.basename(item))[0]
+    folder = os.path.join(out_dir, os.path.splitext(item)[0])
+    sizes = {px for px, _ in render_plan.platform_targets('', name)} | {render_plan.MASTER_SIZE}
+    return [(px, os.path.join(folder, f'{name}_{px}.png')) for px in sorted(sizes)]
+
+
+def source_key(path):
+    """Identity of a source file in the journal (size, mtime)."""
+    st = os.stat(path)
+    return [st.st_size, st.st_mtime_ns]
+
+
+def load_journal(path, config):
+    """
+    Items recorded as done with this config: dict of item -> source key.
+    An item's last entry counts, so one that failed since is not done. A
+    partly written last line (from a crash mid-append) is ignored.
+    """
+    done = {}
+    try:
+        with open(path) as f:
+            for line in f:
+                try:
+                    entry = json.loads(line)
+                except ValueError:
+                    continue
+                if entry.get('config') != config:
+                    continue
+                if entry.get('status') == 'failed':
+                    done.pop(entry['item'], None)
+                else:
+                    done[entry['item']] = entry['source']
+    except OSError:
+        pass
+    return done
+
+
+def append_journal(journal, entry):
+    """Append one entry and flush it to disk before moving on."""
+    journal.write(json.dumps(entry, sort_keys=True) + '\n')
+    journal.flush()
+    os.fsync(journal.fileno())
+
+
+def square(img):
+    """Centre crop to a square (portrait Canva exports are 1080x1350)."""
+    width, height = img.size
+    side = min(width, height)
+    if width == height:
+        return img
+    left, top = (width - side) // 2, (height - side) // 2
+    return img.crop((left, top, left + side, top + side))
+
+
+def process_item(source_path, targets, fix):
+    """Fix one source and write its sizes; outputs are fsynced before returning."""
+    save = functools.partial(output_writer.write_png, durable=True)
+    with Image.open(source_path) as img:
+        is_square = img.size[0] == img.size[1]
+
+    if FIXERS[fix] is None and is_square:
+        # Nothing to fix: JPEGs can be decoded at reduced DCT scales
+        render_plan.render_file(source_path, targets, save=save)
+    else:
+        img = square(quality.reduce_source(Image.open(source_path).convert('RGB')))
+        if FIXERS[fix] is not None:
+            module, function = FIXERS[fix]
+            img = getattr(__import__(module), function)(img)
+        render_plan.render(img, targets, save=save)
+    return len(targets)
+
+
+def try_item(source_path, targets, fix):
+    """process_item, returning (outputs, None), or (0, error message) if it fails."""
+    try:
+        return process_item(source_path, targets, fix), None
+    except Exception as e:
+        return 0, f"{type(e).__name__}: {e}"
+
+
+def format_duration(seconds):
+    """Short h/m/s duration for progress lines."""
+    seconds = int(round(seconds))
+    if seconds >= 3600:
+        return f"{seconds // 3600}h{seconds % 3600 // 60:02d}m"
+    if seconds >= 60:
+        return f"{seconds // 60}m{seconds % 60:02d}s"
+    return f"{seconds}s"
+
+
+def print_progress(item, finished, total, done_this_run, elapsed):
+    """One progress line: position, throughput of this run and ETA."""
+    rate = done_this_run / elapsed if elapsed > 0 else 0.0
+    eta = format_duration((total - finished) / rate) if rate else '?'
+    print(f"[{finished}/{total}] {item}  {rate:.2f} items/s, ETA {eta}")
+    sys.stdout.flush()
+
+
+def run_batch(input_dir, out_dir, fix='gray', jobs=1, restart=False, journal_path=None):
+    """
+    Process every source under input_dir, resuming from the journal.
+    Returns the numbers of items (processed, failed) in this run.
+    """
+    journal_path = journal_path or os.path.join(out_dir, JOURNAL_NAME)
+    sources = find_sources(input_dir, exclude=os.path.abspath(out_dir))
+    config = build_manifest.config_hash({'fix': fix, 'render': render_plan.plan_config(),
+                                         'out_dir': os.path.abspath(out_dir)})
+
+    done = {} if restart else load_journal(journal_path, config)
+    pending = [item for item in sources
+               if done.get(item) != source_key(os.path.join(input_dir, item))]
+    skipped = len(sources) - len(pending)
+
+    print(f"{len(sources)} sources in {input_dir}: {skipped} already done, "
+          f"{len(pending)} to process")
+    if not pending:
+        return 0, 0
+
+    os.makedirs(os.path.dirname(os.path.abspath(journal_path)), exist_ok=True)
+    if restart and os.path.exists(journal_path):
+        os.remove(journal_path)
+
+    items = [(os.path.join(input_dir, item), item_targets(out_dir, item), fix)
+             for item in pending]
+    processed = failed = 0
+    start = time.perf_counter()
+    with open(journal_path, 'a') as journal:
+        results = parallel.iter_per_icon(try_item, items, jobs)
+        for item, (source_path, _, _), (outputs, error) in zip(pending, items, results):
+            entry = {'item': item, 'source': source_key(source_path), 'config': config}
+            if error:
+                print(f"✗ {item}: {error}")
+                append_journal(journal, dict(entry, status='failed', error=error))
+                failed += 1
+            else:
+                append_journal(journal, dict(entry, status='done', outputs=outputs))
+                processed += 1
+            print_progress(item, skipped + processed + failed, len(sources),
+                           processed + failed, time.perf_counter() - start)
+    return processed, failed
+
+
+def main():
+    base_dir = os.path.dirname(os.path.abspath(__file__))
+
+    parser = argparse.ArgumentParser(description="Resumable batch run over a directory of icons")
+    parser.add_argument('input_dir', help='directory of exported icons (searched recursively)')
+    parser.add_argument('--out', default=os.path.join(base_dir, 'batch_output'),
+                        help='output directory (default: design/batch_output)')
+    parser.add_argument('--fix', choices=list(FIXERS), default='gray',
+                        help='background fix applied before resizing (default: gray)')
+    parser.add_argument('--journal', help=f'journal path (default: OUT/{JOURNAL_NAME})')
+    parser.add_argument('--restart', action='store_true',
+                        help='ignore the journal and process every item again')
+    parallel.add_jobs_argument(parser)
+    quality.add_quality_argument(parser)
+    args = parser.parse_args()
+    quality.set_quality(args.quality)
+
+    if not os.path.isdir(args.input_dir):
+        print(f"Error: {args.input_dir} is not a directory")
+        sys.exit(1)
+
+    try:
+        processed, failed = run_batch(args.input_dir, args.out, args.fix, args.jobs,
+                              args.restart, args.journal)
+    except KeyboardInterrupt:
+        print("\nInterrupted; rerun the same command to resume")
+        sys.exit(130)
+
+    pixel_cache.print_summary()
+    output_writer.print_summary()
+    if failed:
+        print(f"\n✗ Batch finished with {failed} failed ({processed} processed); "
+              f"rerun to retry them")
+        sys.exit(1)
+    print(f"\n✓ Batch complete ({processed} processed)")
+
+
+if __name__ == '__main__':
+    main()
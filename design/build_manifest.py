@@ -0,0 +1,132 @@
+#!/usr/bin/env python3
+"""
+Incremental build manifest for the icon generators.
+Records, per icon, the content hash of its source files, a hash of the
+effective config (size tables, margin_ratio, thresholds, ...) and the hashes
+of every produced output. A rerun skips an icon whose inputs are unchanged and
+whose outputs are still intact.
+
+File stats (size, mtime) are stored next to each hash so an unchanged file is
+recognised without reading it; the content is only rehashed when its stat
+differs. When the hash still matches (after a touch or a checkout), the new
+stat is recorded and the manifest marked dirty, so it is saved and the
+next run takes the fast path again.
+"""
+
+import hashlib
+import json
+import os
+
+MANIFEST_NAME = '.iconbuild.json'
+MANIFEST_VERSION = 1
+
+
+def manifest_path(base_dir):
+    """Default manifest location (design/.iconbuild.json)."""
+    return os.path.join(base_dir, MANIFEST_NAME)
+
+
+def file_hash(path):
+    """SHA-256 of a file's bytes."""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1 << 20), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def config_hash(config):
+    """Stable hash of a JSON-serialisable config."""
+    text = json.dumps(config, sort_keys=True, default=str)
+    return hashlib.sha256(text.encode('utf-8')).hexdigest()
+
+
+def _stat_key(path):
+    st = os.stat(path)
+    return [st.st_size, st.st_mtime_ns]
+
+
+def load_manifest(path):
+    """Load a manifest, returning an empty one if missing or outdated."""
+    try:
+        with open(path) as f:
+            manifest = json.load(f)
+    except (OSError, ValueError):
+        manifest = {}
+
+    if manifest.get('version') != MANIFEST_VERSION:
+        manifest = {'version': MANIFEST_VERSION, 'items': {}}
+    return manifest
+
+
+def save_manifest(manifest, path):
+    """Write the manifest atomically."""
+    manifest.pop('dirty', None)
+    tmp_path = path + '.tmp'
+    with open(tmp_path, 'w') as f:
+        json.dump(manifest, f, indent=2, sort_keys=True)
+    os.replace(tmp_path, path)
+
+
+def _file_entry(path, previous=None):
+    """Hash entry for a file, reusing the previous hash if its stat matches."""
+    stat = _stat_key(path)
+    if previous and previous.get('stat') == stat:
+        return previous
+    return {'hash': file_hash(path), 'stat': stat}
+
+
+def _unchanged(path, entry):
+    """Check a file against its recorded entry, recording its stat if only that changed."""
+    if not os.path.exists(path):
+        return False
+    stat = _stat_key(path)
+    if stat == entry.get('stat'):
+        return True
+    if file_hash(path) != entry.get('hash'):
+        return False
+    entry['stat'] = stat
+    return True
+
+
+def is_up_to_date(manifest, key, sources, config, root):
+    """
+    True if the item was built from the same sources and config and all of
+    its recorded outputs are intact. Paths are relative to root.
+    """
+    item = manifest['items'].get(key)
+    if not item or item.get('config') != config_hash(config):
+        return False
+
+    if sorted(item['sources']) != sorted(sources):
+        return False
+
+    for rel_path, entry in list(item['sources'].items()) + list(item['outputs'].items()):
+        stat = entry.get('stat')
+        if not _unchanged(os.path.join(root, rel_path), entry):
+            return False
+        if entry['stat'] != stat:
+            manifest['dirty'] = True
+    return True
+
+
+def record(manifest, key, sources, outputs, config, root):
+    """Record a successful build of an item."""
+    previous = manifest['items'].get(key, {})
+
+    def entries(paths, old):
+        result = {}
+        for rel_path in paths:
+            result[rel_path] = _file_entry(os.path.join(root, rel_path), old.get(rel_path))
+        return result
+
+    manifest['items'][key] = {
+        'config': config_hash(config),
+        'sources': entries(sources, previous.get('sources', {})),
+        'outputs': entries(outputs, previous.get('outputs', {})),
+    }
+
+
+def relative_paths(paths, root):
+    """Paths relative to root, deduplicated and sorted."""
+    return sorted({os.path.relpath(path, root) for path in paths})
@@ -0,0 +1,93 @@
+#!/usr/bin/env python3
+"""
+Coarse-to-fine mask bounds.
+strips.mask_bounds evaluates the mask on every pixel, but the bounds only
+depend on the margins around the icon: the rows above its first hit and
+below its last, and the columns beside it. mask_bounds here searches each
+edge from the outside in:
+
+1. The mask is evaluated on a COARSE_FACTOR BOX-reduced copy, which gives a
+   guess for every edge.
+2. The top and bottom are found at full resolution with row profiles of the
+   band from the image edge to just past the guess. If the band holds no hit
+   (the guess was off, e.g. a thin line the reduction averaged away), the
+   next band, twice as long, is searched, and so on to the far side.
+3. The left and right are found likewise with column profiles, within the
+   rows between the top and bottom.
+
+Every pixel outside the bounds is still checked at full resolution, so the
+result is exactly strips.mask_bounds's; the icon's interior is never read.
+
+    python coarse_bounds.py grid_highres.png   (compare with strips.mask_bounds)
+"""
+
+from PIL import Image
+import sys
+import time
+
+import image_array
+import strips
+
+COARSE_FACTOR = 8
+
+
+def first_hit(length, guess, profile, reverse=False):
+    """
+    Index of the first hit along an axis of length, searched from index 0
+    (from the end if reverse) in bands: the first band is guess long, each
+    later one twice the previous. profile(start, stop) is the hit profile of
+    [start, stop). Returns None if there is no hit.
+    """
+    done = 0
+    size = max(guess, 1)
+    while done < length:
+        size = min(size, length - done)
+        start = length - done - size if reverse else done
+        index = image_array.first_true(profile(start, start + size), None, reverse)
+        if index is not None:
+            return start + index
+        done += size
+        size *= 2
+    return None
+
+
+def mask_bounds(img, mask_fn, factor=COARSE_FACTOR):
+    """
+    Inclusive (left, top, right, bottom) of the pixels where mask_fn(pixels)
+    is True, or None; the same as strips.mask_bounds.
+    """
+    width, height = img.size
+    if min(width, height) < 4 * factor:
+        return strips.mask_bounds(img, mask_fn)
+
+    coarse = img.reduce(factor)
+    guess = image_array.mask_bounds(mask_fn(image_array.rgb_array(coarse)))
+    left, top, right, bottom = guess or (0, 0, coarse.size[0] - 1, coarse.size[1] - 1)
+
+    def row_profile(start, stop):
+        return strips.mask_profiles(img.crop((0, start, width, stop)), mask_fn)[1]
+
+    first_row = first_hit(height, (top + 2) * factor, row_profile)
+    if first_row is None:
+        return None
+    last_row = first_hit(height, height - (bottom - 1) * factor, row_profile, reverse=True)
+
+    def col_profile(start, stop):
+        return strips.mask_profiles(img.crop((start, first_row, stop, last_row + 1)), mask_fn)[0]
+
+    first_col = first_hit(width, (left + 2) * factor, col_profile)
+    last_col = first_hit(width, width - (right - 1) * factor, col_profile, reverse=True)
+    return first_col, first_row, last_col, last_row
+
+
+if __name__ == '__main__':
+    img = Image.open(sys.argv[1]).convert('RGB')
+    bg_color = img.getpixel((5, 5))
+
+    def mask_fn(pixels):
+        return image_array.color_distance_map(pixels, bg_color) > 30
+
+    for name, find in (('strips.mask_bounds', strips.mask_bounds), ('coarse_bounds', mask_bounds)):
+        start = time.perf_counter()
+        bounds = find(img, mask_fn)
+        print(f"{name}: {bounds} in {(time.perf_counter() - start) * 1000:.1f}ms")
@@ -4,10 +4,16 @@ Create beautiful app icons that fill the entire canvas.
 Inspired by Canva's designs but ensuring edge-to-edge coverage.
 """
 
-from PIL import Image, ImageDraw, ImageFilter, ImageFont
+from PIL import Image, ImageDraw, ImageFilter
+import argparse
 import os
 import math
 
+import build_manifest
+import output_writer
+import render_plan
+import sharding
+
 def create_gradient(size, colors, direction='vertical'):
     """Create a smooth gradient between multiple colors."""
     img = Image.new('RGB', (size, size))
@@ -220,45 +226,51 @@ def create_icon(name, config, size=1024):
 def generate_all_sizes(img, name, base_dir):
     """Generate all platform sizes."""
     project_dir = os.path.dirname(base_dir)
+    targets = render_plan.platform_targets(project_dir, name,
+                                           render_plan.IOS_FILENAME_LEGACY)
+    render_plan.render(img, targets)
 
-    # iOS
-    ios_folder = os.path.join(project_dir, 'ios', 'Runner', 'Assets.xcassets',
-                              f'AppIcon-{name}.appiconset')
-    os.makedirs(ios_folder, exist_ok=True)
-
-    for s, filename in [(40, 'Icon-40.png'), (58, 'Icon-58.png'), (60, 'Icon-60.png'),
-                        (80, 'Icon-80.png'), (87, 'Icon-87.png'), (120, 'Icon-120.png'),
-                        (180, 'Icon-180.png')]:
-        resized = img.resize((s, s), Image.Resampling.LANCZOS)
-        resized.save(os.path.join(ios_folder, filename), 'PNG')
-
-    # Android
-    android_res = os.path.join(project_dir, 'android', 'app', 'src', 'main', 'res')
-    for s, folder in [(48, 'mipmap-mdpi'), (72, 'mipmap-hdpi'), (96, 'mipmap-xhdpi'),
-                      (144, 'mipmap-xxhdpi'), (192, 'mipmap-xxxhdpi')]:
-        out_dir = os.path.join(android_res, folder)
-        os.makedirs(out_dir, exist_ok=True)
-        resized = img.resize((s, s), Image.Resampling.LANCZOS)
-        resized.save(os.path.join(out_dir, f'ic_launcher_{name}.png'), 'PNG')
-
-    # Flutter preview
-    flutter_dir = os.path.join(project_dir, 'assets', 'icons')
-    os.makedirs(flutter_dir, exist_ok=True)
-    preview = img.resize((120, 120), Image.Resampling.LANCZOS)
-    preview.save(os.path.join(flutter_dir, f'icon_{name}.png'), 'PNG')
+def icon_outputs(name, base_dir):
+    """Every file written for an icon."""
+    targets = render_plan.platform_targets(os.path.dirname(base_dir), name,
+                                           render_plan.IOS_FILENAME_LEGACY)
+    return ([os.path.join(base_dir, 'beautiful_icons', f'{name}_1024.png')]
+            + [path for _, path in targets])
 
 def main():
+    parser = argparse.ArgumentParser(description="Create edge-to-edge app icons")
+    sharding.add_shard_argument(parser)
+    args = parser.parse_args()
+    sharding.set_shard(args.shard)
+
     base_dir = os.path.dirname(os.path.abspath(__file__))
+    project_dir = os.path.dirname(base_dir)
     output_dir = os.path.join(base_dir, 'beautiful_icons')
     os.makedirs(output_dir, exist_ok=True)
 
-    for name, config in ICONS.items():
+    names = sharding.select(ICONS)
+    if args.shard:
+        print(sharding.describe(names, ICONS))
+    manifest_file = build_manifest.manifest_path(base_dir)
+    manifest = build_manifest.load_manifest(manifest_file)
+
+    for name in names:
+        config = ICONS[name]
         print(f"Creating {name}...")
         img = create_icon(name, config)
-        img.save(os.path.join(output_dir, f'{name}_1024.png'), 'PNG')
+        output_writer.write_png(img, os.path.join(output_dir, f'{name}_1024.png'))
         generate_all_sizes(img, name, base_dir)
+        if args.shard:
+            outputs = build_manifest.relative_paths(icon_outputs(name, base_dir), project_dir)
+            build_manifest.record(manifest, f'beautiful/{name}', [], outputs,
+                                  {'icon': config, 'plan': render_plan.plan_config()},
+                                  project_dir)
         print(f"  ✓ Done")
 
+    if args.shard:
+        sharding.write_partial(manifest_file, 'beautiful', manifest,
+                               [(name, f'beautiful/{name}') for name in ICONS])
+    output_writer.print_summary()
     print("\n✓ All icons created!")
 
 if __name__ == '__main__':
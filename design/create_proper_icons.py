@@ -4,10 +4,13 @@ Create proper square app icons that fill the entire canvas.
 No rounded corners - iOS will apply its own rounding.
 """
 
-from PIL import Image, ImageDraw, ImageFilter, ImageFont
+from PIL import Image, ImageDraw
 import os
 import math
 
+import output_writer
+import render_plan
+
 # Icon configurations
 ICONS = {
     'navy_stars': {
@@ -247,45 +250,19 @@ def generate_all_icons():
     base_dir = os.path.dirname(os.path.abspath(__file__))
     project_dir = os.path.dirname(base_dir)
 
-    ios_assets = os.path.join(project_dir, 'ios', 'Runner', 'Assets.xcassets')
-    android_res = os.path.join(project_dir, 'android', 'app', 'src', 'main', 'res')
-    flutter_icons = os.path.join(project_dir, 'assets', 'icons')
-
-    # iOS sizes
-    ios_sizes = [(40, 'Icon-40.png'), (58, 'Icon-58.png'), (60, 'Icon-60.png'),
-                 (80, 'Icon-80.png'), (87, 'Icon-87.png'), (120, 'Icon-120.png'),
-                 (180, 'Icon-180.png')]
-
-    # Android sizes
-    android_sizes = [(48, 'mipmap-mdpi'), (72, 'mipmap-hdpi'), (96, 'mipmap-xhdpi'),
-                     (144, 'mipmap-xxhdpi'), (192, 'mipmap-xxxhdpi')]
-
     for name, config in ICONS.items():
         print(f"Generating {name}...")
 
         # Create high-res version (512px) and scale down for quality
         icon = create_icon(name, config, 512)
 
-        # iOS icons
-        ios_folder = os.path.join(ios_assets, f'AppIcon-{name}.appiconset')
-        os.makedirs(ios_folder, exist_ok=True)
-        for size, filename in ios_sizes:
-            resized = icon.resize((size, size), Image.Resampling.LANCZOS)
-            resized.save(os.path.join(ios_folder, filename), 'PNG')
-
-        # Android icons
-        for size, folder in android_sizes:
-            output_dir = os.path.join(android_res, folder)
-            os.makedirs(output_dir, exist_ok=True)
-            resized = icon.resize((size, size), Image.Resampling.LANCZOS)
-            resized.save(os.path.join(output_dir, f'ic_launcher_{name}.png'), 'PNG')
-
-        # Flutter preview (120px)
-        preview = icon.resize((120, 120), Image.Resampling.LANCZOS)
-        preview.save(os.path.join(flutter_icons, f'icon_{name}.png'), 'PNG')
+        targets = render_plan.platform_targets(project_dir, name,
+                                               render_plan.IOS_FILENAME_LEGACY)
+        render_plan.render(icon, targets)
 
         print(f"  ✓ {name} complete")
 
+    output_writer.print_summary()
     print("\n✓ All icons generated successfully!")
 
 
@@ -4,10 +4,13 @@ Create simple, clean app icons with solid backgrounds that fill the entire canva
 Each icon will have a solid color background with a simple cross design.
 """
 
-from PIL import Image, ImageDraw, ImageFont
+from PIL import Image, ImageDraw
 import os
 import math
 
+import output_writer
+import render_plan
+
 # Icon configurations - name: (bg_color, cross_color, accent_color)
 ICON_CONFIGS = {
     'navy_stars': ((26, 35, 64), (212, 175, 85), (255, 215, 100)),  # Navy + Gold
@@ -106,36 +109,9 @@ def create_icon(name, config, size=1024):
 def generate_all_sizes(img, name, base_dir):
     """Generate all required sizes for iOS, Android, and Flutter."""
     project_dir = os.path.dirname(base_dir)
-
-    # iOS
-    ios_assets = os.path.join(project_dir, 'ios', 'Runner', 'Assets.xcassets')
-    ios_folder = os.path.join(ios_assets, f'AppIcon-{name}.appiconset')
-    os.makedirs(ios_folder, exist_ok=True)
-
-    ios_sizes = [(40, 'Icon-40.png'), (58, 'Icon-58.png'), (60, 'Icon-60.png'),
-                 (80, 'Icon-80.png'), (87, 'Icon-87.png'), (120, 'Icon-120.png'),
-                 (180, 'Icon-180.png')]
-
-    for size, filename in ios_sizes:
-        resized = img.resize((size, size), Image.Resampling.LANCZOS)
-        resized.save(os.path.join(ios_folder, filename), 'PNG')
-
-    # Android
-    android_res = os.path.join(project_dir, 'android', 'app', 'src', 'main', 'res')
-    android_sizes = [(48, 'mipmap-mdpi'), (72, 'mipmap-hdpi'), (96, 'mipmap-xhdpi'),
-                     (144, 'mipmap-xxhdpi'), (192, 'mipmap-xxxhdpi')]
-
-    for size, folder in android_sizes:
-        output_dir = os.path.join(android_res, folder)
-        os.makedirs(output_dir, exist_ok=True)
-        resized = img.resize((size, size), Image.Resampling.LANCZOS)
-        resized.save(os.path.join(output_dir, f'ic_launcher_{name}.png'), 'PNG')
-
-    # Flutter preview
-    flutter_icons = os.path.join(project_dir, 'assets', 'icons')
-    os.makedirs(flutter_icons, exist_ok=True)
-    preview = img.resize((120, 120), Image.Resampling.LANCZOS)
-    preview.save(os.path.join(flutter_icons, f'icon_{name}.png'), 'PNG')
+    targets = render_plan.platform_targets(project_dir, name,
+                                           render_plan.IOS_FILENAME_LEGACY)
+    render_plan.render(img, targets)
 
 def main():
     base_dir = os.path.dirname(os.path.abspath(__file__))
@@ -147,13 +123,14 @@ def main():
         img = create_icon(name, config)
 
         # Save full size
-        img.save(os.path.join(output_dir, f'{name}_1024.png'), 'PNG')
+        output_writer.write_png(img, os.path.join(output_dir, f'{name}_1024.png'))
 
         # Generate all sizes
         generate_all_sizes(img, name, base_dir)
 
         print(f"  ✓ Generated all sizes for {name}")
 
+    output_writer.print_summary()
     print("\n✓ All icons created!")
 
 if __name__ == '__main__':
@@ -5,18 +5,21 @@ and scale it to fill the entire canvas.
 """
 
 from PIL import Image
+import argparse
 import os
-import math
+
+import image_array
+import output_writer
+import pixel_cache
+import quality
+import render_plan
 
 def get_pixel_rgb(img, x, y):
     """Get RGB tuple from pixel."""
     p = img.getpixel((x, y))
     return p[:3] if isinstance(p, tuple) else (p, p, p)
 
-def color_distance(c1, c2):
-    """Euclidean color distance."""
-    return math.sqrt(sum((a - b) ** 2 for a, b in zip(c1[:3], c2[:3])))
-
+@pixel_cache.cached('find_icon_inner_rect_30', version=1)
 def find_icon_inner_rect(img, margin_ratio=0.12):
     """
     Find the inner rectangular region of the icon, inside the rounded corners.
@@ -28,15 +31,9 @@ def find_icon_inner_rect(img, margin_ratio=0.12):
     outer_bg = get_pixel_rgb(img, 5, 5)
 
     # Find the icon's bounding box
-    left, top, right, bottom = width, height, 0, 0
-
-    for y in range(height):
-        for x in range(width):
-            if color_distance(get_pixel_rgb(img, x, y), outer_bg) > 30:
-                left = min(left, x)
-                top = min(top, y)
-                right = max(right, x)
-                bottom = max(bottom, y)
+    left, top, right, bottom = quality.mask_bounds(
+        img, lambda pixels: image_array.color_distance_map(pixels, outer_bg) > 30
+    ) or (width, height, 0, 0)
 
     # Calculate the icon dimensions
     icon_width = right - left
@@ -55,7 +52,7 @@ def find_icon_inner_rect(img, margin_ratio=0.12):
 
 def crop_and_scale(input_path, output_path):
     """Crop inner region and scale to fill canvas."""
-    img = Image.open(input_path).convert('RGB')
+    img = quality.reduce_source(Image.open(input_path).convert('RGB'))
     width, height = img.size
 
     print(f"Processing: {input_path}")
@@ -77,50 +74,30 @@ def crop_and_scale(input_path, output_path):
     new_w = int(crop_w * scale)
     new_h = int(crop_h * scale)
 
-    scaled = cropped.resize((new_w, new_h), Image.Resampling.LANCZOS)
+    scaled = cropped.resize((new_w, new_h), quality.setting('resample'))
 
     # Center crop to get exact square
     start_x = (new_w - width) // 2
     start_y = (new_h - height) // 2
     result = scaled.crop((start_x, start_y, start_x + width, start_y + height))
 
-    result.save(output_path, 'PNG')
+    output_writer.write_png(result, output_path)
     print(f"  Saved: {output_path}")
     return result
 
 def generate_sizes(img, name, base_dir):
     """Generate all platform sizes."""
     project_dir = os.path.dirname(base_dir)
-
-    # iOS
-    ios_folder = os.path.join(project_dir, 'ios', 'Runner', 'Assets.xcassets',
-                              f'AppIcon-{name}.appiconset')
-    os.makedirs(ios_folder, exist_ok=True)
-
-    for size, filename in [(40, 'Icon-40.png'), (58, 'Icon-58.png'), (60, 'Icon-60.png'),
-                           (80, 'Icon-80.png'), (87, 'Icon-87.png'), (120, 'Icon-120.png'),
-                           (180, 'Icon-180.png')]:
-        resized = img.resize((size, size), Image.Resampling.LANCZOS)
-        resized.save(os.path.join(ios_folder, filename), 'PNG')
-
-    # Android
-    android_res = os.path.join(project_dir, 'android', 'app', 'src', 'main', 'res')
-    for size, folder in [(48, 'mipmap-mdpi'), (72, 'mipmap-hdpi'), (96, 'mipmap-xhdpi'),
-                         (144, 'mipmap-xxhdpi'), (192, 'mipmap-xxxhdpi')]:
-        out_dir = os.path.join(android_res, folder)
-        os.makedirs(out_dir, exist_ok=True)
-        resized = img.resize((size, size), Image.Resampling.LANCZOS)
-        resized.save(os.path.join(out_dir, f'ic_launcher_{name}.png'), 'PNG')
-
-    # Flutter
-    flutter_dir = os.path.join(project_dir, 'assets', 'icons')
-    os.makedirs(flutter_dir, exist_ok=True)
-    preview = img.resize((120, 120), Image.Resampling.LANCZOS)
-    preview.save(os.path.join(flutter_dir, f'icon_{name}.png'), 'PNG')
-
+    targets = render_plan.platform_targets(project_dir, name,
+                                           render_plan.IOS_FILENAME_LEGACY)
+    render_plan.render(img, targets)
     print(f"  Generated all sizes for {name}")
 
 if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Crop and scale the exported navy_stars icon")
+    quality.add_quality_argument(parser)
+    quality.set_quality(parser.parse_args().quality)
+
     base_dir = os.path.dirname(os.path.abspath(__file__))
 
     input_path = os.path.join(base_dir, 'exported_navy_stars.png')
@@ -129,3 +106,4 @@ if __name__ == '__main__':
     if os.path.exists(input_path):
         result = crop_and_scale(input_path, output_path)
         generate_sizes(result, 'navy_stars', base_dir)
+        output_writer.print_summary()
@@ -8,53 +8,9 @@ We need to extract just the icon area and extend it to fill the whole square.
 from PIL import Image
 import os
 
-def find_icon_bounds(img):
-    """Find the bounding box of the actual icon (non-gray area)."""
-    width, height = img.size
-
-    # Get the background color (corner pixel)
-    bg_color = img.getpixel((5, 5))
-
-    # Find bounds
-    left, top, right, bottom = width, height, 0, 0
-
-    for y in range(height):
-        for x in range(width):
-            pixel = img.getpixel((x, y))
-            # Check if pixel is significantly different from background
-            diff = sum(abs(pixel[i] - bg_color[i]) for i in range(3))
-            if diff > 30:  # Threshold
-                left = min(left, x)
-                top = min(top, y)
-                right = max(right, x)
-                bottom = max(bottom, y)
-
-    return left, top, right, bottom
-
-
-def get_dominant_edge_color(img, edge, bounds):
-    """Get the dominant color along an edge of the icon area."""
-    left, top, right, bottom = bounds
-    samples = []
-
-    if edge == 'top':
-        for x in range(left + 10, right - 10, 5):
-            samples.append(img.getpixel((x, top + 5)))
-    elif edge == 'bottom':
-        for x in range(left + 10, right - 10, 5):
-            samples.append(img.getpixel((x, bottom - 5)))
-    elif edge == 'left':
-        for y in range(top + 10, bottom - 10, 5):
-            samples.append(img.getpixel((left + 5, y)))
-    elif edge == 'right':
-        for y in range(top + 10, bottom - 10, 5):
-            samples.append(img.getpixel((right - 5, y)))
-
-    from collections import Counter
-    if samples:
-        return Counter(samples).most_common(1)[0][0]
-    return (128, 128, 128)
-
+import image_analysis
+import output_writer
+import render_plan
 
 def extract_and_fill_icon(img_path, output_path):
     """Extract icon and fill entire canvas with it."""
@@ -62,8 +18,8 @@ def extract_and_fill_icon(img_path, output_path):
     width, height = img.size
 
     # Find the icon bounds
-    bounds = find_icon_bounds(img)
-    left, top, right, bottom = bounds
+    analysis = image_analysis.analyze(img)
+    left, top, right, bottom = analysis['bounds']
 
     print(f"  Icon bounds: ({left}, {top}) to ({right}, {bottom})")
 
@@ -84,50 +40,24 @@ def extract_and_fill_icon(img_path, output_path):
     # Paste the icon
     result.paste(icon, (paste_x, paste_y))
 
-    # Now fill the edges with the icon's edge colors
+    # Now fill the edges with the icon's edge colors, sampled just inside the
+    # icon (which the fills never cover); the top and bottom fills span the
+    # full width, so they also cover the corners.
+    top_color, bottom_color, left_color, right_color = analysis['icon_edges']
+
     # Top edge
-    top_color = get_dominant_edge_color(result, 'top', (paste_x, paste_y, paste_x + icon_w, paste_y + icon_h))
-    for y in range(paste_y):
-        for x in range(width):
-            result.putpixel((x, y), top_color)
+    result.paste(top_color, (0, 0, width, paste_y))
 
     # Bottom edge
-    bottom_color = get_dominant_edge_color(result, 'bottom', (paste_x, paste_y, paste_x + icon_w, paste_y + icon_h))
-    for y in range(paste_y + icon_h, height):
-        for x in range(width):
-            result.putpixel((x, y), bottom_color)
+    result.paste(bottom_color, (0, paste_y + icon_h, width, height))
 
     # Left edge
-    left_color = get_dominant_edge_color(result, 'left', (paste_x, paste_y, paste_x + icon_w, paste_y + icon_h))
-    for y in range(paste_y, paste_y + icon_h):
-        for x in range(paste_x):
-            result.putpixel((x, y), left_color)
+    result.paste(left_color, (0, paste_y, paste_x, paste_y + icon_h))
 
     # Right edge
-    right_color = get_dominant_edge_color(result, 'right', (paste_x, paste_y, paste_x + icon_w, paste_y + icon_h))
-    for y in range(paste_y, paste_y + icon_h):
-        for x in range(paste_x + icon_w, width):
-            result.putpixel((x, y), right_color)
-
-    # Fill corners
-    # Top-left
-    for y in range(paste_y):
-        for x in range(paste_x):
-            result.putpixel((x, y), top_color)
-    # Top-right
-    for y in range(paste_y):
-        for x in range(paste_x + icon_w, width):
-            result.putpixel((x, y), top_color)
-    # Bottom-left
-    for y in range(paste_y + icon_h, height):
-        for x in range(paste_x):
-            result.putpixel((x, y), bottom_color)
-    # Bottom-right
-    for y in range(paste_y + icon_h, height):
-        for x in range(paste_x + icon_w, width):
-            result.putpixel((x, y), bottom_color)
-
-    result.save(output_path, 'PNG')
+    result.paste(right_color, (paste_x + icon_w, paste_y, width, paste_y + icon_h))
+
+    output_writer.write_png(result, output_path)
     print(f"  Saved to {output_path}")
     return result
 
@@ -141,32 +71,10 @@ def process_icon(input_path, name):
     output_path = os.path.join(base_dir, 'canva_icons', f'{name}_filled.png')
     filled = extract_and_fill_icon(input_path, output_path)
 
-    # Generate iOS sizes
-    ios_assets = os.path.join(project_dir, 'ios', 'Runner', 'Assets.xcassets')
-    ios_folder = os.path.join(ios_assets, f'AppIcon-{name}.appiconset')
-
-    ios_sizes = [(40, 'Icon-40.png'), (58, 'Icon-58.png'), (60, 'Icon-60.png'),
-                 (80, 'Icon-80.png'), (87, 'Icon-87.png'), (120, 'Icon-120.png'),
-                 (180, 'Icon-180.png')]
-
-    for size, filename in ios_sizes:
-        resized = filled.resize((size, size), Image.Resampling.LANCZOS)
-        resized.save(os.path.join(ios_folder, filename), 'PNG')
-
-    # Generate Android sizes
-    android_res = os.path.join(project_dir, 'android', 'app', 'src', 'main', 'res')
-    android_sizes = [(48, 'mipmap-mdpi'), (72, 'mipmap-hdpi'), (96, 'mipmap-xhdpi'),
-                     (144, 'mipmap-xxhdpi'), (192, 'mipmap-xxxhdpi')]
-
-    for size, folder in android_sizes:
-        output_dir = os.path.join(android_res, folder)
-        resized = filled.resize((size, size), Image.Resampling.LANCZOS)
-        resized.save(os.path.join(output_dir, f'ic_launcher_{name}.png'), 'PNG')
-
-    # Generate Flutter preview
-    flutter_icons = os.path.join(project_dir, 'assets', 'icons')
-    preview = filled.resize((120, 120), Image.Resampling.LANCZOS)
-    preview.save(os.path.join(flutter_icons, f'icon_{name}.png'), 'PNG')
+    # Generate iOS, Android and Flutter sizes
+    targets = render_plan.platform_targets(project_dir, name,
+                                           render_plan.IOS_FILENAME_LEGACY)
+    render_plan.render(filled, targets)
 
     print(f"  ✓ All sizes generated for {name}")
 
@@ -179,3 +87,4 @@ if __name__ == '__main__':
     if os.path.exists(input_path):
         print("Processing navy_stars...")
         process_icon(input_path, 'navy_stars')
+        output_writer.print_summary()
@@ -11,91 +11,13 @@ Strategy:
 4. Mask out the external background and paste the icon content
 """
 
-from PIL import Image, ImageDraw, ImageFilter
+from PIL import Image
 import os
-from collections import Counter
-import math
 
-def get_pixel_rgb(img, x, y):
-    """Get RGB values from a pixel."""
-    pixel = img.getpixel((x, y))
-    if isinstance(pixel, tuple):
-        return pixel[:3]
-    return (pixel, pixel, pixel)
-
-def color_distance(c1, c2):
-    """Calculate Euclidean distance between two colors."""
-    return math.sqrt(sum((a - b) ** 2 for a, b in zip(c1[:3], c2[:3])))
-
-def find_icon_bounds(img, bg_color, threshold=35):
-    """Find the bounding box of the icon (non-background area)."""
-    width, height = img.size
-
-    # Find left bound
-    left = 0
-    for x in range(width):
-        for y in range(height // 4, 3 * height // 4):
-            if color_distance(get_pixel_rgb(img, x, y), bg_color) > threshold:
-                left = x
-                break
-        if left > 0:
-            break
-
-    # Find right bound
-    right = width - 1
-    for x in range(width - 1, -1, -1):
-        for y in range(height // 4, 3 * height // 4):
-            if color_distance(get_pixel_rgb(img, x, y), bg_color) > threshold:
-                right = x
-                break
-        if right < width - 1:
-            break
-
-    # Find top bound
-    top = 0
-    for y in range(height):
-        for x in range(width // 4, 3 * width // 4):
-            if color_distance(get_pixel_rgb(img, x, y), bg_color) > threshold:
-                top = y
-                break
-        if top > 0:
-            break
-
-    # Find bottom bound
-    bottom = height - 1
-    for y in range(height - 1, -1, -1):
-        for x in range(width // 4, 3 * width // 4):
-            if color_distance(get_pixel_rgb(img, x, y), bg_color) > threshold:
-                bottom = y
-                break
-        if bottom < height - 1:
-            break
-
-    return left, top, right, bottom
-
-def sample_inner_background(img, bounds, corner_offset=100):
-    """Sample the icon's inner background color (avoiding the rounded corners)."""
-    left, top, right, bottom = bounds
-
-    # Sample from multiple points inside the icon, away from corners
-    sample_points = [
-        (left + corner_offset, top + 30),  # top edge
-        (right - corner_offset, top + 30),
-        (left + 30, top + corner_offset),  # left edge
-        (left + 30, bottom - corner_offset),
-        (right - 30, top + corner_offset),  # right edge
-        (right - 30, bottom - corner_offset),
-        (left + corner_offset, bottom - 30),  # bottom edge
-        (right - corner_offset, bottom - 30),
-    ]
-
-    colors = []
-    for x, y in sample_points:
-        if left < x < right and top < y < bottom:
-            colors.append(get_pixel_rgb(img, x, y))
-
-    # Return most common color
-    return Counter(colors).most_common(1)[0][0] if colors else (128, 128, 128)
+import image_analysis
+import image_array
+import output_writer
+import render_plan
 
 def extract_and_fill(input_path, output_path):
     """
@@ -108,66 +30,34 @@ def extract_and_fill(input_path, output_path):
     print(f"  Size: {width}x{height}")
 
     # Get the outer background color
-    outer_bg = get_pixel_rgb(img, 5, 5)
+    analysis = image_analysis.analyze(img)
+    outer_bg = analysis['outer_bg']
     print(f"  Outer background: {outer_bg}")
 
     # Find icon bounds
-    bounds = find_icon_bounds(img, outer_bg)
-    left, top, right, bottom = bounds
+    left, top, right, bottom = analysis['bounds_mid']
     print(f"  Icon bounds: ({left}, {top}) to ({right}, {bottom})")
 
     # Sample the inner background color
-    inner_bg = sample_inner_background(img, bounds)
+    inner_bg = analysis['inner_bg_mid']
     print(f"  Inner background: {inner_bg}")
 
-    # Create result image filled with inner background
-    result = Image.new('RGB', (width, height), inner_bg)
-
     # Copy pixels from original, replacing outer background with inner background
-    for y in range(height):
-        for x in range(width):
-            pixel = get_pixel_rgb(img, x, y)
+    pixels = image_array.rgb_array(img)
+    result = pixels.copy()
+    result[image_array.color_distance_map(pixels, outer_bg) < 25] = inner_bg
+    result = image_array.to_image(result)
 
-            # If pixel is similar to outer background, use inner background
-            if color_distance(pixel, outer_bg) < 25:
-                result.putpixel((x, y), inner_bg)
-            else:
-                result.putpixel((x, y), pixel)
-
-    result.save(output_path, 'PNG')
+    output_writer.write_png(result, output_path)
     print(f"  Saved: {output_path}")
     return result
 
 def generate_sizes(img, name, base_dir):
     """Generate all platform sizes."""
     project_dir = os.path.dirname(base_dir)
-
-    # iOS
-    ios_folder = os.path.join(project_dir, 'ios', 'Runner', 'Assets.xcassets',
-                              f'AppIcon-{name}.appiconset')
-    os.makedirs(ios_folder, exist_ok=True)
-
-    for size, filename in [(40, 'Icon-40.png'), (58, 'Icon-58.png'), (60, 'Icon-60.png'),
-                           (80, 'Icon-80.png'), (87, 'Icon-87.png'), (120, 'Icon-120.png'),
-                           (180, 'Icon-180.png')]:
-        resized = img.resize((size, size), Image.Resampling.LANCZOS)
-        resized.save(os.path.join(ios_folder, filename), 'PNG')
-
-    # Android
-    android_res = os.path.join(project_dir, 'android', 'app', 'src', 'main', 'res')
-    for size, folder in [(48, 'mipmap-mdpi'), (72, 'mipmap-hdpi'), (96, 'mipmap-xhdpi'),
-                         (144, 'mipmap-xxhdpi'), (192, 'mipmap-xxxhdpi')]:
-        out_dir = os.path.join(android_res, folder)
-        os.makedirs(out_dir, exist_ok=True)
-        resized = img.resize((size, size), Image.Resampling.LANCZOS)
-        resized.save(os.path.join(out_dir, f'ic_launcher_{name}.png'), 'PNG')
-
-    # Flutter
-    flutter_dir = os.path.join(project_dir, 'assets', 'icons')
-    os.makedirs(flutter_dir, exist_ok=True)
-    preview = img.resize((120, 120), Image.Resampling.LANCZOS)
-    preview.save(os.path.join(flutter_dir, f'icon_{name}.png'), 'PNG')
-
+    targets = render_plan.platform_targets(project_dir, name,
+                                           render_plan.IOS_FILENAME_LEGACY)
+    render_plan.render(img, targets)
     print(f"  Generated all sizes for {name}")
 
 if __name__ == '__main__':
@@ -180,3 +70,4 @@ if __name__ == '__main__':
     if os.path.exists(input_path):
         result = extract_and_fill(input_path, output_path)
         generate_sizes(result, 'navy_stars', base_dir)
+        output_writer.print_summary()
@@ -5,9 +5,17 @@ This preserves Canva's beautiful design while ensuring no visible seams when dis
 """
 
 from PIL import Image
+import argparse
+import numpy as np
 import os
-import math
-from collections import Counter
+
+import image_analysis
+import image_array
+import output_writer
+import pixel_cache
+import quality
+import render_plan
+import strips
 
 ICON_NAMES = [
     'navy_stars',
@@ -21,94 +29,37 @@ ICON_NAMES = [
     'royal_purple',
 ]
 
-def get_rgb(img, x, y):
-    """Get RGB tuple from pixel."""
-    p = img.getpixel((x, y))
-    return p[:3] if isinstance(p, tuple) else (p, p, p)
-
-def color_distance(c1, c2):
-    """Euclidean color distance."""
-    return math.sqrt(sum((a - b) ** 2 for a, b in zip(c1[:3], c2[:3])))
-
-def find_icon_bounds(img, outer_bg, threshold=30):
-    """Find the bounding box of the icon (non-background area)."""
-    width, height = img.size
-
-    left, top, right, bottom = width, height, 0, 0
-
-    for y in range(height):
-        for x in range(width):
-            if color_distance(get_rgb(img, x, y), outer_bg) > threshold:
-                left = min(left, x)
-                top = min(top, y)
-                right = max(right, x)
-                bottom = max(bottom, y)
-
-    return left, top, right, bottom
-
-def sample_inner_background(img, bounds, margin=80):
-    """Sample the icon's internal background color."""
-    left, top, right, bottom = bounds
-
-    # Sample from edges inside the icon (avoiding the center where the cross is)
-    sample_points = [
-        # Top edge inside
-        (left + margin, top + 20),
-        ((left + right) // 2, top + 20),
-        (right - margin, top + 20),
-        # Left edge inside
-        (left + 20, top + margin),
-        (left + 20, (top + bottom) // 2),
-        # Right edge inside
-        (right - 20, top + margin),
-        (right - 20, (top + bottom) // 2),
-        # Bottom edge inside
-        (left + margin, bottom - 20),
-        (right - margin, bottom - 20),
-    ]
-
-    colors = []
-    for x, y in sample_points:
-        if left < x < right and top < y < bottom:
-            colors.append(get_rgb(img, int(x), int(y)))
-
-    if colors:
-        return Counter(colors).most_common(1)[0][0]
-    return (128, 128, 128)
-
 def fix_icon_background(img):
     """Replace outer background with icon's internal background color."""
-    width, height = img.size
     img = img.convert('RGB')
 
-    # Get outer background color (from corner)
-    outer_bg = get_rgb(img, 5, 5)
-    print(f"    Outer background: {outer_bg}")
-
-    # Find icon bounds
-    bounds = find_icon_bounds(img, outer_bg)
-    left, top, right, bottom = bounds
+    # Logged here rather than in the cached step, so a cache hit prints them too
+    analysis = image_analysis.analyze(img)
+    print(f"    Outer background: {analysis['outer_bg']}")
+    left, top, right, bottom = analysis['bounds_color']
     print(f"    Icon bounds: ({left}, {top}) to ({right}, {bottom})")
+    print(f"    Inner background: {analysis['inner_bg']}")
 
-    # Sample inner background
-    inner_bg = sample_inner_background(img, bounds)
-    print(f"    Inner background: {inner_bg}")
+    return fill_background(img)
 
-    # Create result - replace outer background with inner background
-    result = img.copy()
+@pixel_cache.cached('fix_icon_background', version=1)
+def fill_background(img):
+    """Fill an RGB icon's outer background with its inner background color."""
+    # Get outer background color (from corner) and sample inner background
+    analysis = image_analysis.analyze(img)
+    outer_bg = analysis['outer_bg']
+    inner_bg = analysis['inner_bg']
 
-    for y in range(height):
-        for x in range(width):
-            pixel = get_rgb(img, x, y)
-            # If pixel is similar to outer background, replace with inner background
-            if color_distance(pixel, outer_bg) < 25:
-                result.putpixel((x, y), inner_bg)
+    # Create result - pixels similar to the outer background take the inner background
+    pixels = np.array(img)
+    strips.fill_where(pixels, lambda strip: image_array.color_distance_map(strip, outer_bg) < 25,
+                      inner_bg)
 
-    return result
+    return image_array.to_image(pixels)
 
 def process_grid(grid_path, output_dir):
     """Process 3x3 grid of icons."""
-    grid = Image.open(grid_path).convert('RGB')
+    grid = quality.reduce_source(Image.open(grid_path).convert('RGB'))
     grid_w, grid_h = grid.size
 
     cell_w = grid_w // 3
@@ -132,8 +83,8 @@ def process_grid(grid_path, output_dir):
         fixed = fix_icon_background(cell)
 
         # Save at 1024x1024
-        fixed_1024 = fixed.resize((1024, 1024), Image.Resampling.LANCZOS)
-        fixed_1024.save(os.path.join(output_dir, f'{name}_1024.png'), 'PNG')
+        fixed_1024 = strips.resize(fixed, (1024, 1024), quality.setting('resample'))
+        output_writer.write_png(fixed_1024, os.path.join(output_dir, f'{name}_1024.png'))
 
         results[name] = fixed_1024
 
@@ -143,41 +94,17 @@ def generate_all_sizes(icons, base_dir):
     """Generate all platform sizes."""
     project_dir = os.path.dirname(base_dir)
 
-    ios_assets = os.path.join(project_dir, 'ios', 'Runner', 'Assets.xcassets')
-    android_res = os.path.join(project_dir, 'android', 'app', 'src', 'main', 'res')
-    flutter_icons = os.path.join(project_dir, 'assets', 'icons')
-
-    ios_sizes = [(40, 'Icon-40.png'), (58, 'Icon-58.png'), (60, 'Icon-60.png'),
-                 (80, 'Icon-80.png'), (87, 'Icon-87.png'), (120, 'Icon-120.png'),
-                 (180, 'Icon-180.png')]
-
-    android_sizes = [(48, 'mipmap-mdpi'), (72, 'mipmap-hdpi'), (96, 'mipmap-xhdpi'),
-                     (144, 'mipmap-xxhdpi'), (192, 'mipmap-xxxhdpi')]
-
     for name, img in icons.items():
-        # iOS
-        ios_folder = os.path.join(ios_assets, f'AppIcon-{name}.appiconset')
-        os.makedirs(ios_folder, exist_ok=True)
-
-        for size, filename in ios_sizes:
-            resized = img.resize((size, size), Image.Resampling.LANCZOS)
-            resized.save(os.path.join(ios_folder, filename), 'PNG')
-
-        # Android
-        for size, folder in android_sizes:
-            out_dir = os.path.join(android_res, folder)
-            os.makedirs(out_dir, exist_ok=True)
-            resized = img.resize((size, size), Image.Resampling.LANCZOS)
-            resized.save(os.path.join(out_dir, f'ic_launcher_{name}.png'), 'PNG')
-
-        # Flutter preview
-        os.makedirs(flutter_icons, exist_ok=True)
-        preview = img.resize((120, 120), Image.Resampling.LANCZOS)
-        preview.save(os.path.join(flutter_icons, f'icon_{name}.png'), 'PNG')
-
+        targets = render_plan.platform_targets(project_dir, name,
+                                               render_plan.IOS_FILENAME_LEGACY)
+        render_plan.render(img, targets)
         print(f"    Generated all sizes for {name}")
 
 if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Fix the Canva grid icons' backgrounds")
+    quality.add_quality_argument(parser)
+    quality.set_quality(parser.parse_args().quality)
+
     base_dir = os.path.dirname(os.path.abspath(__file__))
 
     grid_path = os.path.join(base_dir, 'grid_highres.png')
@@ -189,6 +116,8 @@ if __name__ == '__main__':
 
         print("\nGenerating platform sizes...")
         generate_all_sizes(icons, base_dir)
+        pixel_cache.print_summary()
+        output_writer.print_summary()
 
         print("\n✓ Done!")
     else:
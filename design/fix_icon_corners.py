@@ -4,9 +4,19 @@ Fix icon corners by extending edge colors to fill the entire square.
 The Canva grid has gray background showing in corners.
 """
 
-from PIL import Image
+import argparse
+import numpy as np
 import os
 
+import icon_stages
+import image_analysis
+import image_array
+import memory_budget
+import output_writer
+import parallel
+import pixel_cache
+import quality
+
 ICON_NAMES = [
     'navy_stars',
     'cream_olive',
@@ -19,51 +29,11 @@ ICON_NAMES = [
     'royal_purple',
 ]
 
-# iOS required sizes
-IOS_SIZES = [
-    (40, 'Icon-40.png'),
-    (58, 'Icon-58.png'),
-    (60, 'Icon-60.png'),
-    (80, 'Icon-80.png'),
-    (87, 'Icon-87.png'),
-    (120, 'Icon-120.png'),
-    (180, 'Icon-180.png'),
-]
-
-# Android mipmap sizes
-ANDROID_SIZES = [
-    (48, 'mipmap-mdpi'),
-    (72, 'mipmap-hdpi'),
-    (96, 'mipmap-xhdpi'),
-    (144, 'mipmap-xxhdpi'),
-    (192, 'mipmap-xxxhdpi'),
-]
-
-
-def get_edge_color(img, edge='top'):
-    """Sample colors from the middle of an edge to get the true background."""
-    width, height = img.size
-    samples = []
-
-    if edge == 'top':
-        # Sample from top edge, middle third
-        for x in range(width // 3, 2 * width // 3):
-            samples.append(img.getpixel((x, 0)))
-    elif edge == 'bottom':
-        for x in range(width // 3, 2 * width // 3):
-            samples.append(img.getpixel((x, height - 1)))
-    elif edge == 'left':
-        for y in range(height // 3, 2 * height // 3):
-            samples.append(img.getpixel((0, y)))
-    elif edge == 'right':
-        for y in range(height // 3, 2 * height // 3):
-            samples.append(img.getpixel((width - 1, y)))
-
-    # Return the most common color
-    from collections import Counter
-    return Counter(samples).most_common(1)[0][0]
+# What one icon job does, for memory_budget.predict
+ICON_OPS = ('copy', 'array', 'scan', 'resize', 'encode')
 
 
+@pixel_cache.cached('fix_corners', version=1)
 def fix_corners(img):
     """
     Fill corners with the appropriate edge color.
@@ -71,22 +41,19 @@ def fix_corners(img):
     """
     width, height = img.size
     img = img.convert('RGB')
-    result = img.copy()
+    result = np.array(img)
 
-    # Get edge colors
-    top_color = get_edge_color(img, 'top')
-    bottom_color = get_edge_color(img, 'bottom')
-    left_color = get_edge_color(img, 'left')
-    right_color = get_edge_color(img, 'right')
+    # Get edge colors (the middle third of each edge)
+    top_color, bottom_color, left_color, right_color = image_analysis.analyze(img)['edges']
 
     # The gray background color from Canva grid (approximately)
-    # We'll detect it by checking if pixel is grayish
-    def is_gray_background(pixel):
-        r, g, b = pixel[:3]
+    # We'll detect it by checking if pixels are grayish
+    def gray_background_mask(pixels):
+        rgb = pixels.astype(np.float64)
         # Check if it's a grayish color (all channels similar, medium brightness)
-        avg = (r + g + b) / 3
-        spread = max(abs(r - avg), abs(g - avg), abs(b - avg))
-        return spread < 20 and 180 < avg < 240  # Gray range
+        avg = rgb.sum(axis=-1) / 3
+        spread = np.abs(rgb - avg[..., None]).max(axis=-1)
+        return (spread < 20) & (180 < avg) & (avg < 240)  # Gray range
 
     # Corner radius is about 18% of icon size
     radius = int(width * 0.20)
@@ -100,13 +67,6 @@ def fix_corners(img):
     ]
 
     for name, (x1, y1), (x2, y2), color1, color2 in corners:
-        # Blend the two edge colors for corner
-        corner_color = (
-            (color1[0] + color2[0]) // 2,
-            (color1[1] + color2[1]) // 2,
-            (color1[2] + color2[2]) // 2,
-        )
-
         # Determine the corner center for distance calculation
         if 'top-left' in name:
             cx, cy = radius, radius
@@ -117,90 +77,78 @@ def fix_corners(img):
         else:  # bottom-right
             cx, cy = width - radius, height - radius
 
-        # Fill pixels outside the rounded corner
-        for y in range(y1, y2):
-            for x in range(x1, x2):
-                # Distance from corner center
-                dist = ((x - cx) ** 2 + (y - cy) ** 2) ** 0.5
-
-                if dist > radius:
-                    # This pixel is outside the rounded corner
-                    current = result.getpixel((x, y))
-
-                    # Check if it's the gray background
-                    if is_gray_background(current):
-                        # Get the nearest edge color based on position
-                        # Use gradient based on position within corner
-                        if 'top' in name:
-                            edge_y_color = top_color
-                        else:
-                            edge_y_color = bottom_color
+        # Offsets from the corner center for every pixel of the corner box
+        dy, dx = np.ogrid[y1 - cy:y2 - cy, x1 - cx:x2 - cx]
+        corner = result[y1:y2, x1:x2]
 
-                        if 'left' in name:
-                            edge_x_color = left_color
-                        else:
-                            edge_x_color = right_color
+        # Gray background pixels outside the rounded corner
+        outside = dx * dx + dy * dy > radius * radius
+        fill = outside & gray_background_mask(corner)
 
-                        # Blend based on position
-                        dx = abs(x - cx) / radius if radius > 0 else 0
-                        dy = abs(y - cy) / radius if radius > 0 else 0
+        # Get the nearest edge color based on position
+        edge_y_color = top_color if 'top' in name else bottom_color
+        edge_x_color = left_color if 'left' in name else right_color
 
-                        # Simple blend - use the dominant direction's color
-                        if dx > dy:
-                            fill_color = edge_x_color
-                        else:
-                            fill_color = edge_y_color
+        # Simple blend - use the dominant direction's color
+        use_x = np.abs(dx) > np.abs(dy)
+        corner[fill & use_x] = edge_x_color
+        corner[fill & ~use_x] = edge_y_color
 
-                        result.putpixel((x, y), fill_color)
+    return image_array.to_image(result)
 
-    return result
 
+def process_icon(name, raw, project_dir, debug_dir=None):
+    """Fix one extracted icon and generate its sizes."""
+    print(f"Processing {name}...")
 
-def process_all_icons():
-    base_dir = os.path.dirname(os.path.abspath(__file__))
-    project_dir = os.path.dirname(base_dir)
-    extracted_dir = os.path.join(base_dir, 'extracted_icons')
-
-    ios_assets = os.path.join(project_dir, 'ios', 'Runner', 'Assets.xcassets')
-    android_res = os.path.join(project_dir, 'android', 'app', 'src', 'main', 'res')
-    flutter_icons = os.path.join(project_dir, 'assets', 'icons')
-
-    for name in ICON_NAMES:
-        raw_path = os.path.join(extracted_dir, f'{name}_raw.png')
-        if not os.path.exists(raw_path):
-            print(f"Skipping {name} - raw file not found")
-            continue
-
-        print(f"Processing {name}...")
+    # Fix corners
+    fixed = fix_corners(raw)
+    icon_stages.save_intermediates({name: fixed}, debug_dir, 'fixed')
 
-        # Load and fix corners
-        img = Image.open(raw_path)
-        fixed = fix_corners(img)
+    # Generate iOS, Android and Flutter sizes
+    icon_stages.render_platforms(name, fixed, project_dir)
 
-        # Save fixed version
-        fixed_path = os.path.join(extracted_dir, f'{name}_fixed.png')
-        fixed.save(fixed_path, 'PNG')
+    print(f"  ✓ Generated all sizes for {name}")
 
-        # Generate iOS icons
-        ios_folder = os.path.join(ios_assets, f'AppIcon-{name}.appiconset')
-        for size, filename in IOS_SIZES:
-            resized = fixed.resize((size, size), Image.Resampling.LANCZOS)
-            resized.save(os.path.join(ios_folder, filename), 'PNG')
 
-        # Generate Android icons
-        for size, folder in ANDROID_SIZES:
-            output_dir = os.path.join(android_res, folder)
-            resized = fixed.resize((size, size), Image.Resampling.LANCZOS)
-            resized.save(os.path.join(output_dir, f'ic_launcher_{name}.png'), 'PNG')
-
-        # Generate Flutter preview
-        preview = fixed.resize((120, 120), Image.Resampling.LANCZOS)
-        preview.save(os.path.join(flutter_icons, f'icon_{name}.png'), 'PNG')
+def process_all_icons(jobs=1, debug=False):
+    base_dir = os.path.dirname(os.path.abspath(__file__))
+    project_dir = os.path.dirname(base_dir)
+    grid_path = icon_stages.grid_path(project_dir)
+
+    if not os.path.exists(grid_path):
+        print(f"Error: Grid image not found at {grid_path}")
+        return
+
+    # Icons are passed between stages in memory; *_raw.png and
+    # *_fixed.png are only written with --debug-intermediates
+    debug_dir = icon_stages.DEBUG_DIR if debug else None
+    raw_icons = icon_stages.extract(grid_path, ICON_NAMES)
+    icon_stages.save_intermediates(raw_icons, debug_dir, 'raw')
+
+    parallel.run_per_icon(process_icon,
+                          [(name, raw_icons[name], project_dir, debug_dir) for name in ICON_NAMES],
+                          jobs,
+                          memory=[memory_budget.predict(raw_icons[name].size, ICON_OPS)
+                                  for name in ICON_NAMES])
+
+    pixel_cache.print_summary()
+    output_writer.print_summary()
+    print("\n✓ All icons processed!")
 
-        print(f"  ✓ Generated all sizes for {name}")
 
-    print("\n✓ All icons processed!")
+def main():
+    parser = argparse.ArgumentParser(description="Fix icon corners by extending edge colors")
+    parser.add_argument('--debug-intermediates', action='store_true',
+                        help='also write the raw and fixed icons to extracted_icons/')
+    parallel.add_jobs_argument(parser)
+    quality.add_quality_argument(parser)
+    memory_budget.add_memory_argument(parser)
+    args = parser.parse_args()
+    quality.set_quality(args.quality)
+    memory_budget.set_max_memory(args.max_memory)
+    process_all_icons(jobs=args.jobs, debug=args.debug_intermediates)
 
 
 if __name__ == '__main__':
-    process_all_icons()
+    main()
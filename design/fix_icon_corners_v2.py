@@ -4,9 +4,17 @@ Fix icon corners by replacing ALL gray background pixels with edge colors.
 More aggressive approach - detects and replaces the Canva grid background.
 """
 
-from PIL import Image
+import argparse
+import numpy as np
 import os
-from collections import Counter
+
+import icon_stages
+import image_array
+import memory_budget
+import output_writer
+import parallel
+import pixel_cache
+import quality
 
 ICON_NAMES = [
     'navy_stars',
@@ -20,155 +28,149 @@ ICON_NAMES = [
     'royal_purple',
 ]
 
-# iOS required sizes
-IOS_SIZES = [
-    (40, 'Icon-40.png'),
-    (58, 'Icon-58.png'),
-    (60, 'Icon-60.png'),
-    (80, 'Icon-80.png'),
-    (87, 'Icon-87.png'),
-    (120, 'Icon-120.png'),
-    (180, 'Icon-180.png'),
-]
+# What one icon job does, for memory_budget.predict
+ICON_OPS = ('copy', 'array', 'scan', 'resize', 'encode')
 
-# Android mipmap sizes
-ANDROID_SIZES = [
-    (48, 'mipmap-mdpi'),
-    (72, 'mipmap-hdpi'),
-    (96, 'mipmap-xhdpi'),
-    (144, 'mipmap-xxhdpi'),
-    (192, 'mipmap-xxxhdpi'),
-]
 
-
-def is_canva_gray(pixel):
-    """Check if a pixel is the Canva grid background gray."""
-    r, g, b = pixel[:3]
+def canva_gray_mask(pixels):
+    """Mask of the pixels that are the Canva grid background gray."""
+    rgb = pixels[..., :3].astype(np.float64)
     # Canva background is around (226, 226, 231) - light grayish
     # Also check for slightly different grays
-    avg = (r + g + b) / 3
-    spread = max(abs(r - avg), abs(g - avg), abs(b - avg))
+    avg = rgb.sum(axis=-1) / 3
+    spread = np.abs(rgb - avg[..., None]).max(axis=-1)
 
     # Gray: all channels similar (spread < 15) and in the light gray range (200-240)
-    return spread < 15 and 200 <= avg <= 245
-
-
-def get_nearest_non_gray_color(img, x, y, max_search=50):
-    """Find the nearest non-gray pixel color by searching inward."""
-    width, height = img.size
-
-    # Search in a spiral pattern toward center
-    cx, cy = width // 2, height // 2
+    return (spread < 15) & (200 <= avg) & (avg <= 245)
+
+
+def nearest_non_gray_colors(pixels, gray, xs, ys, max_search=50):
+    """
+    Find the nearest non-gray pixel color for each (xs, ys) position by
+    searching inward. All positions take the same step at once.
+    """
+    height, width = gray.shape
+    colors = np.empty((len(xs), 3), dtype=np.uint8)
+    colors[:] = (128, 128, 128)  # Last fallback - a neutral color
+    pending = np.ones(len(xs), dtype=bool)
+
+    def take(nx, ny):
+        # Resolve the pending positions whose candidate pixel is in bounds and not gray
+        idx = np.flatnonzero(pending)
+        cx, cy = nx[idx], ny[idx]
+        inside = (cx >= 0) & (cx < width) & (cy >= 0) & (cy < height)
+        idx, cx, cy = idx[inside], cx[inside], cy[inside]
+        found = ~gray[cy, cx]
+        colors[idx[found]] = pixels[cy[found], cx[found]]
+        pending[idx[found]] = False
 
     # Direction toward center
-    dx = 1 if x < cx else -1
-    dy = 1 if y < cy else -1
+    dx = np.where(xs < width // 2, 1, -1)
+    dy = np.where(ys < height // 2, 1, -1)
 
     # Search along the line toward center
     for i in range(1, max_search):
-        nx = x + dx * i
-        ny = y + dy * i
-
-        if 0 <= nx < width and 0 <= ny < height:
-            pixel = img.getpixel((nx, ny))
-            if not is_canva_gray(pixel):
-                return pixel
+        if not pending.any():
+            break
+        take(xs + dx * i, ys + dy * i)
 
     # Fallback: search horizontally and vertically
     for i in range(1, max_search):
-        # Check horizontal
-        if x + i < width:
-            pixel = img.getpixel((x + i, y))
-            if not is_canva_gray(pixel):
-                return pixel
-        if x - i >= 0:
-            pixel = img.getpixel((x - i, y))
-            if not is_canva_gray(pixel):
-                return pixel
-
-        # Check vertical
-        if y + i < height:
-            pixel = img.getpixel((x, y + i))
-            if not is_canva_gray(pixel):
-                return pixel
-        if y - i >= 0:
-            pixel = img.getpixel((x, y - i))
-            if not is_canva_gray(pixel):
-                return pixel
-
-    # Last fallback - return a neutral color
-    return (128, 128, 128)
+        if not pending.any():
+            break
+        take(xs + i, ys)
+        take(xs - i, ys)
+        take(xs, ys + i)
+        take(xs, ys - i)
 
+    return colors
 
-def fix_gray_pixels(img):
-    """Replace all gray background pixels with the nearest non-gray color."""
-    width, height = img.size
-    img = img.convert('RGB')
-    result = img.copy()
 
-    # First pass: identify all gray pixels
-    gray_pixels = []
-    for y in range(height):
-        for x in range(width):
-            pixel = img.getpixel((x, y))
-            if is_canva_gray(pixel):
-                gray_pixels.append((x, y))
+@pixel_cache.cached('gray_pixel_count', version=1)
+def count_gray_pixels(img):
+    """Number of gray background pixels in an RGB image."""
+    return int(canva_gray_mask(image_array.rgb_array(img)).sum())
 
-    print(f"    Found {len(gray_pixels)} gray pixels to fix")
 
-    # Second pass: replace gray pixels
-    for x, y in gray_pixels:
-        new_color = get_nearest_non_gray_color(img, x, y)
-        result.putpixel((x, y), new_color)
+@pixel_cache.cached('fix_gray_pixels', version=1)
+def replace_gray_pixels(img):
+    """Replace all gray background pixels of an RGB image with the nearest non-gray color."""
+    pixels = image_array.rgb_array(img)
 
-    return result
+    # Identify all gray pixels
+    gray = canva_gray_mask(pixels)
+    ys, xs = np.nonzero(gray)
 
+    # Replace gray pixels
+    result = np.array(pixels)
+    result[ys, xs] = nearest_non_gray_colors(pixels, gray, xs, ys)
 
-def process_all_icons():
-    base_dir = os.path.dirname(os.path.abspath(__file__))
-    project_dir = os.path.dirname(base_dir)
-    extracted_dir = os.path.join(base_dir, 'extracted_icons')
-
-    ios_assets = os.path.join(project_dir, 'ios', 'Runner', 'Assets.xcassets')
-    android_res = os.path.join(project_dir, 'android', 'app', 'src', 'main', 'res')
-    flutter_icons = os.path.join(project_dir, 'assets', 'icons')
+    return image_array.to_image(result)
 
-    for name in ICON_NAMES:
-        raw_path = os.path.join(extracted_dir, f'{name}_raw.png')
-        if not os.path.exists(raw_path):
-            print(f"Skipping {name} - raw file not found")
-            continue
 
-        print(f"Processing {name}...")
+def fix_gray_pixels(img):
+    """
+    Replace all gray background pixels with the nearest non-gray color.
+    Logs outside the cached steps, so a cache hit prints the same lines.
+    """
+    img = img.convert('RGB')
+    print(f"    Found {count_gray_pixels(img)} gray pixels to fix")
+    return replace_gray_pixels(img)
 
-        # Load and fix gray pixels
-        img = Image.open(raw_path)
-        fixed = fix_gray_pixels(img)
 
-        # Save fixed version
-        fixed_path = os.path.join(extracted_dir, f'{name}_fixed_v2.png')
-        fixed.save(fixed_path, 'PNG')
+def process_icon(name, raw, project_dir, debug_dir=None):
+    """Fix one extracted icon and generate its sizes."""
+    print(f"Processing {name}...")
 
-        # Generate iOS icons
-        ios_folder = os.path.join(ios_assets, f'AppIcon-{name}.appiconset')
-        for size, filename in IOS_SIZES:
-            resized = fixed.resize((size, size), Image.Resampling.LANCZOS)
-            resized.save(os.path.join(ios_folder, filename), 'PNG')
+    # Fix gray pixels
+    fixed = fix_gray_pixels(raw)
+    icon_stages.save_intermediates({name: fixed}, debug_dir, 'fixed_v2')
 
-        # Generate Android icons
-        for size, folder in ANDROID_SIZES:
-            output_dir = os.path.join(android_res, folder)
-            resized = fixed.resize((size, size), Image.Resampling.LANCZOS)
-            resized.save(os.path.join(output_dir, f'ic_launcher_{name}.png'), 'PNG')
+    # Generate iOS and Android icons; the Flutter preview keeps the original
+    # rounded corners for a nicer preview
+    icon_stages.render_platforms(name, fixed, project_dir, preview=raw)
 
-        # Generate Flutter preview (keep original with rounded corners for nice preview)
-        preview = img.resize((120, 120), Image.Resampling.LANCZOS)
-        preview.save(os.path.join(flutter_icons, f'icon_{name}.png'), 'PNG')
+    print(f"  ✓ Generated all sizes for {name}")
 
-        print(f"  ✓ Generated all sizes for {name}")
 
+def process_all_icons(jobs=1, debug=False):
+    base_dir = os.path.dirname(os.path.abspath(__file__))
+    project_dir = os.path.dirname(base_dir)
+    grid_path = icon_stages.grid_path(project_dir)
+
+    if not os.path.exists(grid_path):
+        print(f"Error: Grid image not found at {grid_path}")
+        return
+
+    # Icons are passed between stages in memory; *_raw.png and
+    # *_fixed_v2.png are only written with --debug-intermediates
+    debug_dir = icon_stages.DEBUG_DIR if debug else None
+    raw_icons = icon_stages.extract(grid_path, ICON_NAMES)
+    icon_stages.save_intermediates(raw_icons, debug_dir, 'raw')
+
+    parallel.run_per_icon(process_icon,
+                          [(name, raw_icons[name], project_dir, debug_dir) for name in ICON_NAMES],
+                          jobs,
+                          memory=[memory_budget.predict(raw_icons[name].size, ICON_OPS)
+                                  for name in ICON_NAMES])
+
+    pixel_cache.print_summary()
+    output_writer.print_summary()
     print("\n✓ All icons processed!")
 
 
+def main():
+    parser = argparse.ArgumentParser(description="Replace gray background pixels with edge colors")
+    parser.add_argument('--debug-intermediates', action='store_true',
+                        help='also write the raw and fixed icons to extracted_icons/')
+    parallel.add_jobs_argument(parser)
+    quality.add_quality_argument(parser)
+    memory_budget.add_memory_argument(parser)
+    args = parser.parse_args()
+    quality.set_quality(args.quality)
+    memory_budget.set_max_memory(args.max_memory)
+    process_all_icons(jobs=args.jobs, debug=args.debug_intermediates)
+
+
 if __name__ == '__main__':
-    process_all_icons()
+    main()
@@ -0,0 +1,222 @@
+#!/usr/bin/env python3
+"""
+White-label batch mode: full icon sets for many app flavours in one run.
+    python flavours.py flavour_specs/ [--out flavour_output] [-j 4] [--batched]
+    python flavours.py --write-template flavour_specs/sunrise.json
+
+Each *.json spec in the directory is one flavour:
+    {"name": "sunrise",
+     "icons": {"navy_stars": {"gradient": [[15, 25, 55], [35, 55, 100]],
+                              "cross": [212, 175, 85], "stars": [255, 215, 100],
+                              "wave": null}, ...}}
+Icons a spec leaves out keep create_beautiful_icons.ICONS; name defaults to
+the file name. Every flavour's icons are drawn like create_beautiful_icons
+and written under OUT/<flavour>/ in the project's layout (ios/Runner/...,
+android/app/src/main/res/..., assets/icons/, beautiful_icons/).
+
+Work is shared where flavours coincide: every distinct icon config is drawn,
+resized and encoded once, and its PNG bytes are written to every flavour
+that uses it. With --batched the distinct masters are resized together by
+the NumPy resampler, sharing its LANCZOS weights across masters; the
+batches are spread over the -j workers. A spec's name must be a plain
+directory name (no path separators, not . or ..).
+"""
+
+import argparse
+import glob
+import json
+import os
+import sys
+import time
+
+import build_manifest
+import create_beautiful_icons
+import output_writer
+import parallel
+import quality
+import render_plan
+
+
+def _tuples(value):
+    """JSON lists as tuples, as in the ICONS colour configs."""
+    if isinstance(value, list):
+        return tuple(_tuples(item) for item in value)
+    return value
+
+
+def _is_colour(value):
+    """True for a JSON colour: 3 or 4 ints from 0 to 255."""
+    return (isinstance(value, list) and len(value) in (3, 4)
+            and all(isinstance(c, int) and not isinstance(c, bool) and 0 <= c <= 255
+                    for c in value))
+
+
+def _check_colours(path, icon, config):
+    """Raise ValueError unless every colour in an icon's config is well formed."""
+    for key, value in config.items():
+        if key == 'gradient':
+            if not (isinstance(value, list) and len(value) >= 2
+                    and all(_is_colour(colour) for colour in value)):
+                raise ValueError(f"{path}: {icon} gradient must be a list of at least two "
+                                 f"colours of 3 or 4 ints from 0 to 255, not {value!r}")
+        elif not (_is_colour(value) or (value is None and key != 'cross')):
+            raise ValueError(f"{path}: {icon} {key} must be a colour of 3 or 4 ints "
+                             f"from 0 to 255, not {value!r}")
+
+
+def load_spec(path):
+    """(flavour name, dict of icon name -> config) from a spec file."""
+    with open(path) as f:
+        spec = json.load(f)
+    name = spec.get('name') or os.path.splitext(os.path.basename(path))[0]
+    # The name is a directory under OUT
+    if not isinstance(name, str) or name in ('.', '..') or '/' in name or '\\' in name:
+        raise ValueError(f"{path}: flavour name {name!r} is not a plain directory name")
+
+    icons = dict(create_beautiful_icons.ICONS)
+    for icon, config in spec.get('icons', {}).items():
+        if icon not in icons:
+            raise ValueError(f"{path}: unknown icon {icon!r}")
+        if not isinstance(config, dict) or 'gradient' not in config or 'cross' not in config:
+            raise ValueError(f"{path}: {icon} needs at least a gradient and a cross")
+        _check_colours(path, icon, config)
+        icons[icon] = {key: _tuples(value) for key, value in config.items()}
+    return name, icons
+
+
+def load_specs(spec_dir):
+    """Every flavour in spec_dir, in file name order: list of (name, icons)."""
+    flavours = [load_spec(path) for path in sorted(glob.glob(os.path.join(spec_dir, '*.json')))]
+    names = [name for name, _ in flavours]
+    duplicates = sorted({name for name in names if names.count(name) > 1})
+    if duplicates:
+        raise ValueError(f"flavour names used by several specs: {', '.join(duplicates)}")
+    return flavours
+
+
+def write_template(path):
+    """Write a spec with the default palette, to start a new flavour from."""
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    spec = {'name': os.path.splitext(os.path.basename(path))[0],
+            'icons': create_beautiful_icons.ICONS}
+    with open(path, 'w') as f:
+        json.dump(spec, f, indent=2)
+        f.write('\n')
+
+
+def flavour_targets(out_dir, flavour, icon):
+    """Targets of one flavour's icon, in the project's layout under OUT/<flavour>/."""
+    flavour_dir = os.path.join(out_dir, flavour)
+    return (render_plan.platform_targets(flavour_dir, icon, render_plan.IOS_FILENAME_LEGACY)
+            + render_plan.master_targets(flavour_dir, icon, 'beautiful_icons'))
+
+
+def render_master(icon, config, sizes):
+    """Draw one icon config and encode it at every size: dict of px -> PNG bytes."""
+    img = create_beautiful_icons.create_icon(icon, config)
+    resized, _ = render_plan.resize_sizes(img, sizes)
+    return {px: output_writer.encode_png(resized[px]) for px in sizes}
+
+
+def render_batch(masters, sizes):
+    """render_master for a list of (icon, config), resized together by the NumPy resampler."""
+    import batch_resample
+
+    images = [create_beautiful_icons.create_icon(icon, config) for icon, config in masters]
+    resized = batch_resample.resize_all_batched(images, sizes)
+    return [{px: output_writer.encode_png(resized[px][idx]) for px in sizes}
+            for idx in range(len(images))]
+
+
+def render_masters_batched(masters, sizes, jobs=1):
+    """
+    render_master for every (icon, config) in masters, yielded in order.
+    Masters are rendered in batches of BATCH_SIZE, on up to jobs workers.
+    """
+    import batch_resample
+
+    batches = [(masters[start:start + batch_resample.BATCH_SIZE], sizes)
+               for start in range(0, len(masters), batch_resample.BATCH_SIZE)]
+    for pngs in parallel.iter_per_icon(render_batch, batches, jobs):
+        yield from pngs
+
+
+def run_flavours(flavours, out_dir, jobs=1, batched=False):
+    """
+    Render every flavour x icon x size. Each distinct icon config is drawn,
+    resized and encoded once. Returns (icons written, distinct masters).
+    """
+    # Distinct icon configs, keyed by their hash, and the outputs that need each
+    masters = {}
+    outputs = {}
+    for flavour, icons in flavours:
+        for icon, config in icons.items():
+            key = build_manifest.config_hash({'icon': icon, 'config': config})
+            masters.setdefault(key, (icon, config))
+            outputs.setdefault(key, {}).update(
+                dict.fromkeys(flavour_targets(out_dir, flavour, icon)))
+
+    # Each (size, path) once per master: platform sizes can share a file
+    outputs = {key: list(targets) for key, targets in outputs.items()}
+    keys = list(masters)
+    sizes = sorted({px for targets in outputs.values() for px, _ in targets}, reverse=True)
+    # Outputs are written as each master finishes, so only a few are held at once
+    if batched:
+        encoded = render_masters_batched([masters[key] for key in keys], sizes, jobs)
+    else:
+        encoded = parallel.iter_per_icon(render_master,
+                                         [masters[key] + (sizes,) for key in keys], jobs)
+
+    for key, pngs in zip(keys, encoded):
+        for px, path in outputs[key]:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            output_writer.write_bytes(path, pngs[px])
+
+    return sum(len(icons) for _, icons in flavours), len(keys)
+
+
+def main():
+    base_dir = os.path.dirname(os.path.abspath(__file__))
+
+    parser = argparse.ArgumentParser(description="Render icon sets for many app flavours")
+    parser.add_argument('spec_dir', nargs='?', help='directory of flavour spec *.json files')
+    parser.add_argument('--out', default=os.path.join(base_dir, 'flavour_output'),
+                        help='output directory (default: design/flavour_output)')
+    parser.add_argument('--batched', action='store_true',
+                        help='resize the distinct masters together with the NumPy resampler '
+                             '(in batches, spread over --jobs workers)')
+    parser.add_argument('--write-template', metavar='PATH',
+                        help='write a spec with the default palette and exit')
+    parallel.add_jobs_argument(parser)
+    quality.add_quality_argument(parser)
+    args = parser.parse_args()
+    quality.set_quality(args.quality)
+
+    if args.write_template:
+        write_template(args.write_template)
+        print(f"✓ Wrote {args.write_template}")
+        return
+    if not args.spec_dir:
+        parser.error('spec_dir is required')
+
+    try:
+        flavours = load_specs(args.spec_dir)
+    except (OSError, ValueError) as e:
+        print(f"Error: {e}")
+        sys.exit(1)
+    if not flavours:
+        print(f"No flavour specs in {args.spec_dir}")
+        sys.exit(1)
+
+    print(f"Rendering {len(flavours)} flavours: {', '.join(name for name, _ in flavours)}")
+    start = time.perf_counter()
+    icons, distinct = run_flavours(flavours, args.out, args.jobs, args.batched)
+    elapsed = time.perf_counter() - start
+
+    output_writer.print_summary()
+    print(f"\n✓ {icons} icons ({distinct} distinct) for {len(flavours)} flavours "
+          f"in {elapsed:.1f}s, {icons / elapsed:.1f} icons/s")
+
+
+if __name__ == '__main__':
+    main()
@@ -4,10 +4,12 @@ Generate beautiful square app icons without rounded corners.
 iOS will apply its own rounded corners automatically.
 """
 
-from PIL import Image, ImageDraw, ImageFilter
+from PIL import Image, ImageDraw
 import os
 import math
 
+import output_writer
+
 # Icon configurations with gradient colors and design elements
 ICONS = {
     'navy_stars': {
@@ -250,19 +252,20 @@ def main():
 
         for size, suffix in sizes['ios']:
             img = create_icon(name, config, size)
-            img.save(os.path.join(ios_folder, f'icon_{size}.png'), 'PNG')
+            output_writer.write_png(img, os.path.join(ios_folder, f'icon_{size}.png'))
 
         # Android icons
         for size, folder in sizes['android']:
             output_dir = os.path.join(android_res_dir, folder)
             os.makedirs(output_dir, exist_ok=True)
             img = create_icon(name, config, size)
-            img.save(os.path.join(output_dir, f'ic_launcher_{name}.png'), 'PNG')
+            output_writer.write_png(img, os.path.join(output_dir, f'ic_launcher_{name}.png'))
 
         # Flutter preview
         img = create_icon(name, config, 120)
-        img.save(os.path.join(flutter_icons_dir, f'icon_{name}.png'), 'PNG')
+        output_writer.write_png(img, os.path.join(flutter_icons_dir, f'icon_{name}.png'))
 
+    output_writer.print_summary()
     print("\n✓ All icons generated!")
     print("  - iOS icons in Assets.xcassets")
     print("  - Android icons in res/mipmap-*")
@@ -0,0 +1,103 @@
+#!/usr/bin/env python3
+"""
+In-memory stages of the Canva grid pipeline.
+Each stage takes and returns PIL images, so a run can go grid -> extract ->
+fix -> render without writing and re-reading *_raw.png / *_fixed*.png.
+Intermediates are only saved when a debug directory is given
+(--debug-intermediates in the scripts).
+
+    import icon_stages
+    raw = icon_stages.extract(icon_stages.grid_path(project_dir))
+    fixed = icon_stages.fix(raw, fix_icon_corners_v2.fix_gray_pixels)
+    for name in fixed:
+        icon_stages.render_platforms(name, fixed[name], project_dir, preview=raw[name])
+"""
+
+import os
+
+import image_backend
+import output_writer
+import render_plan
+
+# Icon names in order (left to right, top to bottom)
+ICON_NAMES = [
+    'navy_stars',    # Row 1
+    'cream_olive',
+    'gold_luxe',
+    'white_wave',    # Row 2
+    'teal_pink',
+    'ocean_clouds',
+    'night_gold',    # Row 3
+    'sunset_coral',
+    'royal_purple',
+]
+
+# Based on the actual Canva grid layout:
+# The 1024x1024 image has 9 icons in a 3x3 grid
+# Each icon is approximately 290x290 with small gaps
+# Starting position is around (55, 55)
+GRID_FILE = 'test_icon.png'
+GRID_START = 55
+ICON_SIZE = 290
+GAP = 22  # Gap between icons
+
+# Where --debug-intermediates writes *_raw.png and *_fixed*.png
+DEBUG_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'extracted_icons')
+
+
+def grid_path(project_dir):
+    """Path of the Canva-generated grid."""
+    return os.path.join(project_dir, GRID_FILE)
+
+
+def icon_box(idx):
+    """Crop box of the icon at grid position idx."""
+    row = idx // 3
+    col = idx % 3
+    x = GRID_START + col * (ICON_SIZE + GAP)
+    y = GRID_START + row * (ICON_SIZE + GAP)
+    return x, y, x + ICON_SIZE, y + ICON_SIZE
+
+
+def extract(grid, names=None, backend='pillow'):
+    """
+    Crop icons out of the grid (a path, or an image of the given backend).
+    Returns dict of name -> PIL image, for every icon or only those in names.
+    """
+    bk = image_backend.get(backend)
+    if isinstance(grid, str):
+        grid = bk.open(grid)
+    return {name: bk.to_pil(bk.crop(grid, icon_box(idx)))
+            for idx, name in enumerate(ICON_NAMES)
+            if names is None or name in names}
+
+
+def fix(icons, fixer):
+    """Apply a fixer (image -> image) to every icon."""
+    return {name: fixer(img) for name, img in icons.items()}
+
+
+def save_intermediates(icons, debug_dir, suffix):
+    """Write {name}_{suffix}.png for each icon, if debug_dir is set."""
+    if not debug_dir:
+        return
+    os.makedirs(debug_dir, exist_ok=True)
+    for name, img in icons.items():
+        output_writer.write_png(img, os.path.join(debug_dir, f'{name}_{suffix}.png'))
+
+
+def render_platforms(name, fixed, project_dir, preview=None, contents_json=False):
+    """
+    Render iOS and Android sizes from the fixed icon, and the Flutter preview
+    from preview (e.g. the raw icon with its rounded corners) or the fixed one.
+    """
+    targets = (render_plan.ios_targets(project_dir, name, render_plan.IOS_FILENAME_LEGACY)
+               + render_plan.android_targets(project_dir, name))
+    if preview is None:
+        # One plan, so the 120px size is shared with the preview
+        render_plan.render(fixed, targets + render_plan.flutter_targets(project_dir, name))
+    else:
+        render_plan.render(fixed, targets)
+        render_plan.render(preview, render_plan.flutter_targets(project_dir, name))
+    if contents_json:
+        render_plan.write_ios_contents_json(project_dir, name, render_plan.IOS_FILENAME_LEGACY)
@@ -0,0 +1,147 @@
+#!/usr/bin/env python3
+"""
+Single entry point for the icon scripts.
+    cd design
+    python -m iconkit list
+    python -m iconkit grid --force -j 4
+    python -m iconkit nano --quality draft
+
+Arguments after the subcommand go to the script's own parser
+(python -m iconkit grid --help). Nothing heavy is imported at startup: each
+subcommand imports its script (and with it Pillow, NumPy, ...) only when it
+runs, and Pillow loads only its preinit plugins (PNG, JPEG and a few
+others). list reads the icon tables from the scripts' source without
+importing them.
+"""
+
+import argparse
+import ast
+import importlib
+import importlib.util
+import os
+import sys
+
+DESIGN_DIR = os.path.dirname(os.path.abspath(__file__))
+PROJECT_DIR = os.path.dirname(DESIGN_DIR)
+
+# Subcommand -> (script path relative to the project, entry point, description)
+COMMANDS = {
+    'grid': ('design/process_grid_icons.py', 'main',
+             'extract, crop and scale the grid_highres.png icons'),
+    'canva-grid': ('design/process_canva_grid.py', 'main',
+                   'extract the Canva test_icon.png grid and fix its corners'),
+    'fix-corners': ('design/fix_icon_corners_v2.py', 'main',
+                    'replace the gray grid background with edge colours'),
+    'nano': ('design/process_nano_icons.py', 'main',
+             'render the nano_icons sources to every platform size'),
+    'pipeline': ('design/pipeline_dag.py', 'main',
+                 'run Canva pipeline stages by target'),
+    'batch': ('design/batch_icons.py', 'main',
+              'resumable fix-and-resize run over a directory of icons'),
+    'flavours': ('design/flavours.py', 'main',
+                 'render the icon sets of many app flavours from spec files'),
+    'watch': ('design/watch_icons.py', 'main',
+              'regenerate an icon as soon as its source is saved'),
+    'preview': ('design/preview_server.py', 'main',
+                'serve on-demand icon renders for side-by-side previews'),
+    'alternate-icons': ('ios/Runner/generate_alternate_icons.py', 'main',
+                        'generate the iOS alternate app icons'),
+    'android': ('android/generate_android_icons.py', 'generate_icons',
+                'generate the Android mipmaps from the masters'),
+}
+
+# Icon tables shown by list: (label, script, variable)
+ICON_TABLES = [
+    ('grid', 'design/process_grid_icons.py', 'ICON_NAMES'),
+    ('canva grid', 'design/icon_stages.py', 'ICON_NAMES'),
+    ('nano', 'design/process_nano_icons.py', 'ICONS'),
+    ('alternate icons', 'ios/Runner/generate_alternate_icons.py', 'ICONS'),
+    ('android', 'android/generate_android_icons.py', 'ICONS'),
+]
+
+IMAGE_PLUGINS = ['PIL.PngImagePlugin', 'PIL.JpegImagePlugin']
+
+
+def init_pillow():
+    """
+    Import the PNG and JPEG plugins and run Image.preinit, so PNG and JPEG
+    files open and save without Image.init importing all of Pillow's ~45
+    plugins.
+    """
+    from PIL import Image
+
+    for plugin in IMAGE_PLUGINS:
+        importlib.import_module(plugin)
+    Image.preinit()
+
+
+def literal(path, name):
+    """Value of a literal module-level assignment, read without importing the module."""
+    with open(path) as f:
+        tree = ast.parse(f.read(), path)
+    for node in tree.body:
+        if isinstance(node, ast.Assign) and any(
+                isinstance(target, ast.Name) and target.id == name for target in node.targets):
+            return ast.literal_eval(node.value)
+    raise KeyError(f"{name} not found in {path}")
+
+
+def list_icons():
+    """Print every icon table."""
+    for label, script, name in ICON_TABLES:
+        icons = literal(os.path.join(PROJECT_DIR, script), name)
+        print(f"{label}:")
+        if isinstance(icons, dict):
+            for icon, value in icons.items():
+                print(f"  {icon}" + (f"  ({value})" if isinstance(value, str) else ''))
+        else:
+            for icon in icons:
+                print(f"  {icon}")
+
+
+def load_script(script):
+    """Import a script by path (the platform scripts live outside design/)."""
+    path = os.path.join(PROJECT_DIR, script)
+    name = os.path.splitext(os.path.basename(path))[0]
+    if os.path.dirname(path) == DESIGN_DIR:
+        return importlib.import_module(name)
+    spec = importlib.util.spec_from_file_location(name, path)
+    module = importlib.util.module_from_spec(spec)
+    # Registered first, so --jobs workers can unpickle its functions
+    sys.modules[name] = module
+    spec.loader.exec_module(module)
+    return module
+
+
+def run(command, args):
+    """Run a subcommand's entry point with args as its command line."""
+    script, entry, _ = COMMANDS[command]
+    init_pillow()
+    module = load_script(script)
+    sys.argv = [f'iconkit {command}'] + args
+    return getattr(module, entry)()
+
+
+def main():
+    commands = '\n'.join(f'  {name:<16} {description}'
+                         for name, (_, _, description) in COMMANDS.items())
+    parser = argparse.ArgumentParser(
+        prog='iconkit', description="Icon pipeline commands",
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+        epilog=f"commands:\n  {'list':<16} list the icons of each pipeline\n{commands}")
+    parser.add_argument('command', choices=['list'] + list(COMMANDS), metavar='command')
+    parser.add_argument('args', nargs=argparse.REMAINDER,
+                        help="the command's own arguments")
+    args = parser.parse_args()
+
+    if DESIGN_DIR not in sys.path:
+        sys.path.insert(0, DESIGN_DIR)
+
+    if args.command == 'list':
+        list_icons()
+    else:
+        run(args.command, args.args)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,269 @@
+#!/usr/bin/env python3
+"""
+One-sweep analysis of a Canva icon source, shared by the strategies.
+    python image_analysis.py exported_navy_stars.png   (print a source's analysis)
+
+The Canva strategies used to scan a source for the same few statistics, each
+with a loop of its own. analyze(img) computes all of them together: the
+whole-image bounds come from quality.mask_bounds (coarse to fine, reading
+only the margins around the icon), one strip-wise pass over the pixels takes
+the channel differences to the outer background once per strip for the
+banded and sampled scans, and the colour samples are read from small crops.
+The result is stored as a pixel_cache JSON entry keyed by the image's pixel
+hash, so a source is analysed once, by whichever strategy asks first, and
+later runs read it back.
+
+Each strategy keeps its own detection rule, so its output is unchanged:
+    outer_bg, outer_bg_10  pixels (5, 5) and (10, 10), the Canva background
+    bounds           channel-sum distance > 30 to outer_bg (extract_and_fill)
+    bounds_color     colour distance > 30 (fix_canva_icons)
+    bounds_mid       colour distance > 35 in the middle half of the rows and
+                     columns, skipping the first and last line (extract_icon_content)
+    region           not similar (25) on every 10th row and column (process_canva_icon)
+    inner_bounds     middle row and column not similar (40) to outer_bg_10,
+                     less CORNER_RADIUS (fill_canvas_from_icon)
+    inner_bg         sampled inside bounds_color (fix_canva_icons)
+    inner_bg_mid     sampled inside bounds_mid (extract_icon_content)
+    region_bg        dominant colour below the top-left of region (process_canva_icon)
+    inner_corner_bg  sampled at the corners of inner_bounds (fill_canvas_from_icon)
+    edges            middle third of each image edge (fix_icon_corners)
+    inner_edges      EDGE_DEPTH deep along inner_bounds (fill_canvas_from_icon)
+    icon_edges       just inside bounds (extract_and_fill)
+Edge colours are in EDGES order.
+"""
+
+from PIL import Image
+import sys
+
+import numpy as np
+
+import image_array
+import pixel_cache
+import quality
+import strips
+
+EDGES = ('top', 'bottom', 'left', 'right')
+
+# fill_canvas_from_icon's allowance for the rounded corners, and how deep
+# its edge colours are sampled
+CORNER_RADIUS = 80
+EDGE_DEPTH = 30
+
+# Per-pixel measures of the channel differences to the outer background
+MEASURES = {
+    'max': lambda diff: diff.max(axis=-1),             # channel_distance_map
+    'square': lambda diff: (diff * diff).sum(axis=-1),  # color_distance_map, squared
+}
+
+
+def bounds_masks(width, height):
+    """
+    The swept bounds scans of a width x height image: dict of name ->
+    (measure, threshold, col_band, row_band, step). A pixel is set where its
+    measure exceeds threshold; the column profile only counts every step-th
+    row within col_band, the row profile every step-th column within row_band.
+    """
+    middle_rows = (height // 4, 3 * height // 4)
+    middle_cols = (width // 4, 3 * width // 4)
+    return {
+        'bounds_mid': ('square', 35 * 35, middle_rows, middle_cols, 1),
+        'region': ('max', 25 - 1, None, None, 10),
+    }
+
+
+def sweep(img, color, masks):
+    """
+    Column and row profiles of every mask in one pass over img's strips:
+    dict of name -> (cols, rows).
+    """
+    width, height = img.size
+    color = np.asarray(color[:3], dtype=np.int32)
+    profiles = {name: (np.zeros(width, dtype=bool), np.zeros(height, dtype=bool))
+                for name in masks}
+
+    for top, pixels in strips.rgb_strips(img):
+        bottom = top + pixels.shape[0]
+        diff = np.abs(pixels.astype(np.int32) - color)
+        measured = {}
+        for name, (measure, threshold, col_band, row_band, step) in masks.items():
+            if measure not in measured:
+                measured[measure] = MEASURES[measure](diff)
+            mask = measured[measure] > threshold
+            cols, rows = profiles[name]
+
+            col_top, col_bottom = col_band or (0, height)
+            first = max(col_top, top)
+            first += -first % step
+            last = min(col_bottom, bottom)
+            if first < last:
+                cols |= mask[first - top:last - top:step].any(axis=0)
+            row_left, row_right = row_band or (0, width)
+            rows[top:bottom] = mask[:, row_left:row_right:step].any(axis=1)
+    return profiles
+
+
+def _pixel(img, x, y):
+    p = img.getpixel((x, y))
+    return p[:3] if isinstance(p, tuple) else (p, p, p)
+
+
+def _samples(img, xs, ys):
+    """Pixels at the (broadcast) coordinates xs, ys as (N, 3) samples, read from one crop."""
+    xs, ys = np.broadcast_arrays(np.asarray(xs), np.asarray(ys))
+    if not xs.size:
+        return np.zeros((0, 3), dtype=np.uint8)
+    left, top = int(xs.min()), int(ys.min())
+    pixels = image_array.rgb_array(img.crop((left, top, int(xs.max()) + 1, int(ys.max()) + 1)))
+    return pixels[ys - top, xs - left].reshape(-1, 3)
+
+
+def _most_common(samples, default=(128, 128, 128)):
+    return image_array.most_common_color(samples) if len(samples) else default
+
+
+def _inside_samples(img, bounds, points):
+    """Samples at the points strictly inside bounds."""
+    left, top, right, bottom = bounds
+    inside = [(x, y) for x, y in points if left < x < right and top < y < bottom]
+    if not inside:
+        return np.zeros((0, 3), dtype=np.uint8)
+    return _samples(img, [x for x, _ in inside], [y for _, y in inside])
+
+
+def _inner_bounds(img, outer_bg):
+    """fill_canvas_from_icon's area inside the rounded corners."""
+    width, height = img.size
+    row = ~image_array.similar_mask(_samples(img, np.arange(width), height // 2), outer_bg, 40)
+    col = ~image_array.similar_mask(_samples(img, width // 2, np.arange(height)), outer_bg, 40)
+
+    left = image_array.first_true(row, 0)
+    right = image_array.first_true(row, width - 1, reverse=True)
+    top = image_array.first_true(col, 0)
+    bottom = image_array.first_true(col, height - 1, reverse=True)
+    return (left + CORNER_RADIUS, top + CORNER_RADIUS,
+            right - CORNER_RADIUS, bottom - CORNER_RADIUS)
+
+
+def _mid_bounds(profiles, width, height):
+    """extract_icon_content's bounds, which skip a hit in the first or last line."""
+    cols, rows = profiles
+    return (image_array.first_true(cols[1:], -1) + 1,
+            image_array.first_true(rows[1:], -1) + 1,
+            image_array.first_true(cols[:-1], width - 1, reverse=True),
+            image_array.first_true(rows[:-1], height - 1, reverse=True))
+
+
+def _region(profiles, width, height):
+    """process_canva_icon's region, the whole image if nothing differs."""
+    cols, rows = profiles
+    return (image_array.first_true(cols, 0), image_array.first_true(rows, 0),
+            image_array.first_true(cols, width - 1, reverse=True),
+            image_array.first_true(rows, height - 1, reverse=True))
+
+
+def _edges(img):
+    """Most common colour of the middle third of each image edge."""
+    width, height = img.size
+    xs = np.arange(width // 3, 2 * width // 3)
+    ys = np.arange(height // 3, 2 * height // 3)
+    return tuple(image_array.most_common_color(_samples(img, x, y))
+                 for x, y in ((xs, 0), (xs, height - 1), (0, ys), (width - 1, ys)))
+
+
+def _inner_edges(img, inner_bounds):
+    """
+    Most common colour EDGE_DEPTH deep along each edge of inner_bounds, every
+    5 pixels, leaving out very dark and very bright samples.
+    """
+    left, top, right, bottom = inner_bounds
+    depth = np.arange(EDGE_DEPTH)[None, :]
+    xs = np.arange(left, right, 5)[:, None]
+    ys = np.arange(top, bottom, 5)[:, None]
+
+    colors = []
+    for x, y in ((xs, top + depth), (xs, bottom - depth), (left + depth, ys), (right - depth, ys)):
+        samples = _samples(img, x, y)
+        brightness = image_array.brightness_map(samples)
+        filtered = samples[(brightness > 0.05) & (brightness < 0.95)]
+        colors.append(_most_common(filtered if len(filtered) else samples))
+    return tuple(colors)
+
+
+def _icon_edges(img, bounds):
+    """Most common colour 5 pixels inside each edge of bounds, every 5 pixels."""
+    left, top, right, bottom = bounds
+    xs = np.arange(left + 10, right - 9, 5)
+    ys = np.arange(top + 10, bottom - 9, 5)
+    return tuple(_most_common(_samples(img, x, y))
+                 for x, y in ((xs, top + 5), (xs, bottom - 4), (left + 5, ys), (right - 4, ys)))
+
+
+@pixel_cache.cached('image_analysis', version=1)
+def analyze(img):
+    """Every statistic listed above for img: dict of name -> bounds, colour or edge colours."""
+    width, height = img.size
+    outer_bg = _pixel(img, 5, 5)
+    outer_bg_10 = _pixel(img, 10, 10)
+    profiles = sweep(img, outer_bg, bounds_masks(width, height))
+
+    bounds = quality.mask_bounds(
+        img, lambda pixels: image_array.channel_sum_distance_map(pixels, outer_bg) > 30
+    ) or (width, height, 0, 0)
+    bounds_color = quality.mask_bounds(
+        img, lambda pixels: image_array.color_distance_map(pixels, outer_bg) > 30
+    ) or (width, height, 0, 0)
+    bounds_mid = _mid_bounds(profiles['bounds_mid'], width, height)
+    region = _region(profiles['region'], width, height)
+    inner_bounds = _inner_bounds(img, outer_bg_10)
+
+    left, top, right, bottom = bounds_color
+    inner_bg = _most_common(_inside_samples(img, bounds_color, [
+        (left + 80, top + 20), ((left + right) // 2, top + 20), (right - 80, top + 20),
+        (left + 20, top + 80), (left + 20, (top + bottom) // 2),
+        (right - 20, top + 80), (right - 20, (top + bottom) // 2),
+        (left + 80, bottom - 20), (right - 80, bottom - 20),
+    ]))
+
+    left, top, right, bottom = bounds_mid
+    inner_bg_mid = _most_common(_inside_samples(img, bounds_mid, [
+        (left + 100, top + 30), (right - 100, top + 30),
+        (left + 30, top + 100), (left + 30, bottom - 100),
+        (right - 30, top + 100), (right - 30, bottom - 100),
+        (left + 100, bottom - 30), (right - 100, bottom - 30),
+    ]))
+
+    left, top = region[:2]
+    region_bg = _most_common(_samples(img, np.arange(left + 100, min(left + 200, width), 2)[None, :],
+                                      np.arange(top + 50, min(top + 100, height), 2)[:, None]))
+
+    inner_edges = _inner_edges(img, inner_bounds)
+    left, top, right, bottom = inner_bounds
+    inner_corner_bg = _most_common(_inside_samples(img, inner_bounds, [
+        (left + 20, top + 20), (right - 20, top + 20),
+        (left + 20, bottom - 20), (right - 20, bottom - 20),
+    ]), default=inner_edges[0])
+
+    return {
+        'outer_bg': outer_bg,
+        'outer_bg_10': outer_bg_10,
+        'bounds': bounds,
+        'bounds_color': bounds_color,
+        'bounds_mid': bounds_mid,
+        'region': region,
+        'inner_bounds': inner_bounds,
+        'inner_bg': inner_bg,
+        'inner_bg_mid': inner_bg_mid,
+        'region_bg': region_bg,
+        'inner_corner_bg': inner_corner_bg,
+        'edges': _edges(img),
+        'inner_edges': inner_edges,
+        'icon_edges': _icon_edges(img, bounds),
+    }
+
+
+if __name__ == '__main__':
+    for path in sys.argv[1:]:
+        print(path)
+        for name, value in analyze(Image.open(path).convert('RGB')).items():
+            print(f"  {name}: {value}")
+    pixel_cache.print_summary()
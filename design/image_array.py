@@ -0,0 +1,114 @@
+#!/usr/bin/env python3
+"""
+NumPy bridge for the pixel-level helpers.
+The design scripts used to walk images one pixel at a time with getpixel and
+putpixel. These helpers work on whole arrays instead; each one is the
+vectorized counterpart of a per-pixel helper and gives the same answer:
+
+    get_pixel_rgb / get_rgb       -> rgb_array
+    color_distance                -> color_distance_map
+    sum of channel differences    -> channel_sum_distance_map
+    is_similar_color              -> similar_mask
+    Counter(...).most_common(1)   -> most_common_color
+    min/max over matching pixels  -> mask_bounds
+    putpixel in a loop            -> arr[mask] = color, then to_image
+
+Copies: np.asarray(img) goes through Pillow's array interface, which hands
+NumPy one contiguous copy of the pixels (Pillow keeps RGB as 4 bytes per
+pixel internally, so there is no layout NumPy could view directly). Everything
+after that (channel slices, masks, broadcasting L to RGB) is a view.
+to_image wraps the array with Image.frombuffer, which shares the buffer for
+L, RGBA and RGBX arrays and needs a single packing copy for RGB.
+"""
+
+from PIL import Image
+import numpy as np
+
+
+def as_array(img):
+    """Pixels of img as a read-only (H, W) or (H, W, C) uint8 array."""
+    return np.asarray(img)
+
+
+def rgb_array(img):
+    """
+    (H, W, 3) view of an image's colour channels, like get_pixel_rgb.
+    Alpha is dropped and single-band images are broadcast to three channels.
+    """
+    if img.mode not in ('RGB', 'RGBA', 'L'):
+        img = img.convert('RGB')
+    pixels = np.asarray(img)
+    if pixels.ndim == 2:
+        return np.broadcast_to(pixels[..., None], pixels.shape + (3,))
+    return pixels[..., :3]
+
+
+def to_image(pixels, mode=None):
+    """Wrap an (H, W) or (H, W, C) uint8 array as an image."""
+    pixels = np.ascontiguousarray(pixels, dtype=np.uint8)
+    if mode is None:
+        mode = 'L' if pixels.ndim == 2 else {3: 'RGB', 4: 'RGBA'}[pixels.shape[2]]
+    height, width = pixels.shape[:2]
+    return Image.frombuffer(mode, (width, height), pixels, 'raw', mode, 0, 1)
+
+
+def color_distance_map(pixels, color):
+    """Euclidean RGB distance of every pixel to color (float64, like math.sqrt)."""
+    diff = pixels[..., :3].astype(np.int32) - np.asarray(color[:3], dtype=np.int32)
+    return np.sqrt((diff * diff).sum(axis=-1).astype(np.float64))
+
+
+def channel_distance_map(pixels, color):
+    """Largest per-channel difference of every pixel to color."""
+    diff = pixels[..., :3].astype(np.int16) - np.asarray(color[:3], dtype=np.int16)
+    return np.abs(diff).max(axis=-1)
+
+
+def channel_sum_distance_map(pixels, color):
+    """Sum of the per-channel differences of every pixel to color."""
+    diff = pixels[..., :3].astype(np.int16) - np.asarray(color[:3], dtype=np.int16)
+    return np.abs(diff).sum(axis=-1)
+
+
+def similar_mask(pixels, color, threshold=30):
+    """Pixels whose every channel is within threshold of color (is_similar_color)."""
+    return channel_distance_map(pixels, color) < threshold
+
+
+def brightness_map(pixels):
+    """Perceived brightness (0-1) of every pixel."""
+    rgb = pixels[..., :3].astype(np.float64)
+    return (rgb[..., 0] * 0.299 + rgb[..., 1] * 0.587 + rgb[..., 2] * 0.114) / 255
+
+
+def mask_bounds(mask):
+    """
+    Inclusive (left, top, right, bottom) of the True pixels in a 2-D mask,
+    or None if there are none.
+    """
+    cols = np.flatnonzero(mask.any(axis=0))
+    if cols.size == 0:
+        return None
+    rows = np.flatnonzero(mask.any(axis=1))
+    return int(cols[0]), int(rows[0]), int(cols[-1]), int(rows[-1])
+
+
+def first_true(values, default, reverse=False):
+    """Index of the first True in a 1-D array (scanning from the end if reverse)."""
+    hits = np.flatnonzero(values)
+    if hits.size == 0:
+        return default
+    return int(hits[-1] if reverse else hits[0])
+
+
+def most_common_color(pixels):
+    """
+    Most common colour in an (N, C) array of samples, as a tuple.
+    Ties go to the colour seen first, matching Counter.most_common.
+    """
+    pixels = np.asarray(pixels)
+    pixels = pixels.reshape(-1, pixels.shape[-1])
+    colors, first, counts = np.unique(pixels, axis=0, return_index=True, return_counts=True)
+    best = counts == counts.max()
+    idx = np.flatnonzero(best)[np.argmin(first[best])]
+    return tuple(int(v) for v in colors[idx])
@@ -0,0 +1,172 @@
+#!/usr/bin/env python3
+"""
+Pluggable image backends for the crop / scale / encode path.
+    pillow  PIL.Image (default)
+    vips    libvips through pyvips; decoding, cropping and resizing are
+            demand-driven, so a crop of a large grid only computes the
+            pixels it needs (pip install pyvips, plus the libvips library)
+
+Each backend is a module with the same functions:
+    open(path, rgb=False)           decode (or lazily open) an image
+    crop(img, box)                  (left, top, right, bottom) box
+    size(img)                       (width, height)
+    resize(img, size)               Lanczos resize to an exact (width, height)
+    composite(base, overlay, pos)   overlay (with its alpha) at pos
+    encode(img, path)               write a PNG
+    render(img, targets)            like render_plan.render
+    to_pil(img) / from_pil(img)     convert at the edges
+
+Backend images stay inside one function; anything returned to callers,
+pickled to --jobs workers or hashed by pixel_cache is a Pillow image (to_pil
+is free for the pillow backend). The pixel analysis (bounds detection,
+corner fills) stays on Pillow + NumPy.
+
+Pick a backend with --backend or the ICON_BACKEND environment variable.
+
+Run directly to benchmark the installed backends (wall time and peak RSS,
+each workload in a fresh process):
+    grid         process_grid_icons on grid_highres.png (3072x3072): crop,
+                 scale and encode 9 masters, then render their platform sizes
+    backgrounds  decode every assets/images/backgrounds PNG and encode a
+                 512px wide preview
+"""
+
+import argparse
+import contextlib
+import importlib
+import io
+import json
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+
+BACKENDS = {
+    'pillow': 'backend_pillow',
+    'vips': 'backend_vips',
+}
+
+DEFAULT_BACKEND = os.environ.get('ICON_BACKEND', 'pillow')
+
+
+def get(name):
+    """The backend module for name. Raises ImportError if it is not installed."""
+    return importlib.import_module(BACKENDS[name])
+
+
+def available():
+    """Names of the backends that can be imported here."""
+    names = []
+    for name in BACKENDS:
+        try:
+            get(name)
+        except ImportError:
+            continue
+        names.append(name)
+    return names
+
+
+def backend_name(value):
+    """argparse type for --backend: a known backend that is installed."""
+    if value not in BACKENDS:
+        raise argparse.ArgumentTypeError(
+            f"unknown backend '{value}' (choose from {', '.join(BACKENDS)})")
+    try:
+        get(value)
+    except ImportError as e:
+        raise argparse.ArgumentTypeError(f"backend '{value}' is not available: {e}")
+    return value
+
+
+def add_backend_argument(parser):
+    """Add the shared --backend option to an argparse parser."""
+    parser.add_argument('--backend', type=backend_name, default=DEFAULT_BACKEND,
+                        help=f"image backend for crop/scale/encode ({', '.join(BACKENDS)}; "
+                             f"default {DEFAULT_BACKEND})")
+
+
+def bench_grid(backend, out_dir):
+    """Workload: the process_grid_icons crop / scale / encode path."""
+    import process_grid_icons
+
+    base_dir = os.path.dirname(os.path.abspath(__file__))
+    icons = process_grid_icons.extract_icons_from_grid(
+        os.path.join(base_dir, 'grid_highres.png'), os.path.join(out_dir, 'processed_icons'),
+        backend=backend)
+    process_grid_icons.generate_all_sizes(icons, os.path.join(out_dir, 'design'), backend=backend)
+
+
+def bench_backgrounds(backend, out_dir, width=512):
+    """Workload: decode each background and encode a preview."""
+    bk = get(backend)
+    project_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    backgrounds_dir = os.path.join(project_dir, 'assets', 'images', 'backgrounds')
+    for filename in sorted(os.listdir(backgrounds_dir)):
+        if not filename.endswith('.png'):
+            continue
+        img = bk.open(os.path.join(backgrounds_dir, filename))
+        src_w, src_h = bk.size(img)
+        preview = bk.resize(img, (width, max(1, round(src_h * width / src_w))))
+        bk.encode(preview, os.path.join(out_dir, filename))
+
+
+WORKLOADS = {
+    'grid': bench_grid,
+    'backgrounds': bench_backgrounds,
+}
+
+
+def measure(backend, workload):
+    """Run one workload in a fresh process; returns (seconds, peak RSS in MB)."""
+    with tempfile.TemporaryDirectory() as out_dir:
+        env = dict(os.environ, ICON_CACHE='0')
+        result = subprocess.run(
+            [sys.executable, os.path.abspath(__file__), '--child', backend, workload, out_dir],
+            env=env, capture_output=True, text=True, check=True)
+    stats = json.loads(result.stdout.splitlines()[-1])
+    return stats['seconds'], stats['peak_rss_mb']
+
+
+def run_child(backend, workload, out_dir):
+    """Body of a measured process: prints its time and peak RSS as JSON."""
+    start = time.perf_counter()
+    with contextlib.redirect_stdout(io.StringIO()):
+        WORKLOADS[workload](backend, out_dir)
+    seconds = time.perf_counter() - start
+    # ru_maxrss is in kilobytes on Linux
+    peak_kb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    print(json.dumps({'seconds': seconds, 'peak_rss_mb': peak_kb / 1024}))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the image backends")
+    parser.add_argument('workloads', nargs='*',
+                        help=f"workloads to run ({', '.join(WORKLOADS)}; default: all)")
+    parser.add_argument('--child', nargs=3, metavar=('BACKEND', 'WORKLOAD', 'OUT_DIR'),
+                        help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        run_child(*args.child)
+        return
+
+    unknown = [w for w in args.workloads if w not in WORKLOADS]
+    if unknown:
+        parser.error(f"unknown workload: {', '.join(unknown)}")
+
+    backends = available()
+    for name in BACKENDS:
+        if name not in backends:
+            print(f"{name}: not installed, skipped")
+
+    print(f"{'workload':<12} {'backend':<8} {'time':>8} {'peak RSS':>10}")
+    for workload in args.workloads or WORKLOADS:
+        for backend in backends:
+            seconds, peak_mb = measure(backend, workload)
+            print(f"{workload:<12} {backend:<8} {seconds:>7.2f}s {peak_mb:>7.0f} MB")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,146 @@
+#!/usr/bin/env python3
+"""
+Memory budget for --jobs runs.
+Each job's peak memory is predicted from its input's size (read from the
+image header, without decoding) and the operations it performs, and
+parallel.run_per_icon only starts a job while the predictions of the
+running jobs, plus WORKER_BASE_MB per worker, fit under the budget. After
+the run, each job's observed peak (the growth of its worker's RSS during
+the job) is reported next to its prediction.
+
+    --max-memory 2048   (or ICON_MAX_MEMORY_MB=2048; 0 = no budget)
+
+A job larger than the whole budget still runs, alone.
+"""
+
+from PIL import Image
+import os
+import resource
+
+import strips
+
+MAX_MEMORY_MB = float(os.environ.get('ICON_MAX_MEMORY_MB', 0))
+
+# Resident size of an idle worker (interpreter, Pillow, NumPy)
+WORKER_BASE_MB = 60
+
+# Growth of a job that does not scale with its input (allocator arenas,
+# modules imported on first use, small output buffers)
+JOB_BASE_MB = 8
+
+# Bytes each operation keeps alive per input pixel. Pillow stores RGB as
+# 4 bytes per pixel; 'scan' is the bounds/mask temporaries of image_array
+# (int32 channel differences, a float64 distance and a mask), which are not
+# all alive at once. Deliberately on the high side: a process_grid_icons
+# cell job (1024x1024) is predicted at 37 MB and observed at 19 MB.
+OP_BYTES = {
+    'decode': 4,      # decoded source
+    'convert': 4,     # convert('RGB' / 'RGBA') copy
+    'copy': 4,        # copy() or a crop kept alongside its source
+    'array': 4,       # NumPy array of the pixels
+    'scan': 12,       # bounds detection / background mask
+    'resize': 8,      # scale-to-fill output (up to ~1.4x the input) + kernel buffers
+    'encode': 1,      # PNG encoder buffers
+}
+
+MB = 1024 * 1024
+
+
+def add_memory_argument(parser):
+    """Add the shared --max-memory option to an argparse parser."""
+    parser.add_argument('--max-memory', type=float, default=MAX_MEMORY_MB, metavar='MB',
+                        help='only start --jobs work while the predicted peak memory of the '
+                             'running jobs fits in this many MB (0 = no limit)')
+
+
+def set_max_memory(mb):
+    """Set the budget for this process."""
+    global MAX_MEMORY_MB
+    MAX_MEMORY_MB = max(0.0, mb)
+    os.environ['ICON_MAX_MEMORY_MB'] = str(MAX_MEMORY_MB)
+
+
+def budget_bytes():
+    """The budget in bytes, or None without one."""
+    return int(MAX_MEMORY_MB * MB) if MAX_MEMORY_MB else None
+
+
+def header_size(path):
+    """(width, height) of an image file, from its header only."""
+    with Image.open(path) as img:
+        return img.size
+
+
+def predict(size, ops):
+    """
+    Predicted peak memory in bytes of a job running ops on a size image,
+    on top of its worker's idle RSS. Scans run strip by strip in strip
+    mode, so only a strip counts.
+    """
+    width, height = size
+    per_pixel = 0
+    for op in ops:
+        op_bytes = OP_BYTES[op]
+        if op == 'scan' and strips.STRIP_ROWS and strips.STRIP_ROWS < height:
+            op_bytes *= strips.STRIP_ROWS / height
+        per_pixel += op_bytes
+    return int(JOB_BASE_MB * MB + width * height * per_pixel)
+
+
+def predict_file(path, ops):
+    """predict for an image file, from its header; 0 if it cannot be read."""
+    try:
+        return predict(header_size(path), ops)
+    except OSError:
+        return 0
+
+
+def admits(running, in_flight, job):
+    """True if a job predicted at job bytes fits next to the running ones."""
+    if not running:
+        # A job larger than the whole budget still runs, alone
+        return True
+    return in_flight + job + (running + 1) * WORKER_BASE_MB * MB <= budget_bytes()
+
+
+def _status(field):
+    """A kB field of /proc/self/status in bytes, or None off Linux."""
+    try:
+        with open('/proc/self/status') as f:
+            for line in f:
+                if line.startswith(field + ':'):
+                    return int(line.split()[1]) * 1024
+    except OSError:
+        pass
+    return None
+
+
+def reset_peak():
+    """
+    Start measuring this process's peak RSS afresh. Returns the current RSS
+    to subtract from observed_peak (0 where the peak cannot be reset).
+    """
+    try:
+        with open('/proc/self/clear_refs', 'w') as f:
+            f.write('5')
+    except OSError:
+        return 0
+    return _status('VmRSS') or 0
+
+
+def observed_peak():
+    """This process's peak RSS in bytes since reset_peak (or since it started)."""
+    peak = _status('VmHWM')
+    if peak is not None:
+        return peak
+    # ru_maxrss is in kilobytes on Linux, bytes on macOS
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak if os.uname().sysname == 'Darwin' else peak * 1024
+
+
+def print_report(labels, predicted, observed, max_running):
+    """Print predicted and observed peaks per job."""
+    print(f"\nMemory (budget {MAX_MEMORY_MB:.0f} MB, at most {max_running / MB:.0f} MB "
+          f"predicted in flight, plus {WORKER_BASE_MB} MB per worker):")
+    for label, pred, obs in zip(labels, predicted, observed):
+        print(f"  {label}: predicted {pred / MB:.0f} MB, observed {obs / MB:.0f} MB")
@@ -0,0 +1,129 @@
+#!/usr/bin/env python3
+"""
+Write-avoiding, deterministic output files.
+Every generated PNG (and Contents.json) goes through write_png / write_bytes.
+A file whose content is already on disk is left alone: an existing PNG is
+decoded and compared pixel for pixel (mode, size, palette, ICC profile), so
+a rerun does not bump mtimes under Assets.xcassets, mipmap-* and
+assets/icons (which would trigger full Xcode and Gradle asset recompiles) or
+produce noisy diffs.
+
+PNGs are encoded with fixed settings (the quality preset's zlib level, 6 for
+release; no optimize pass, no text or time chunks), so the same pixels
+always give the same bytes. Changed files are written to a temporary name and renamed over the
+target, so a reader never sees a partial file.
+"""
+
+from PIL import Image
+import contextlib
+import io
+import os
+import threading
+
+import quality
+
+# Files written and skipped because their content was unchanged
+STATS = {'written': 0, 'unchanged': 0}
+_stats_lock = threading.Lock()
+
+
+def _count(field):
+    with _stats_lock:
+        STATS[field] += 1
+
+
+def encode_png(img):
+    """PNG bytes of img, with settings that depend only on its pixels."""
+    buffer = io.BytesIO()
+    img.save(buffer, 'PNG', compress_level=quality.setting('compress_level'), optimize=False)
+    return buffer.getvalue()
+
+
+def same_pixels(img, path):
+    """True if path is an image with exactly img's pixels."""
+    try:
+        with Image.open(path) as existing:
+            if existing.mode != img.mode or existing.size != img.size:
+                return False
+            if existing.info.get('icc_profile') != img.info.get('icc_profile'):
+                return False
+            if img.mode == 'P' and existing.getpalette() != img.getpalette():
+                return False
+            return existing.tobytes() == img.tobytes()
+    except (OSError, ValueError):
+        return False
+
+
+def _fsync_dir(path):
+    """Persist a rename in directory path (not supported on every platform)."""
+    try:
+        fd = os.open(path, os.O_RDONLY)
+    except OSError:
+        return
+    try:
+        os.fsync(fd)
+    except OSError:
+        pass
+    finally:
+        os.close(fd)
+
+
+def replace_file(path, data, durable=False):
+    """
+    Write data to path via a temporary file and a rename.
+    With durable, the file (and the rename) are fsynced first.
+    """
+    folder = os.path.dirname(path) or '.'
+    tmp_path = os.path.join(
+        folder, f'.{os.path.basename(path)}.{os.getpid()}.{threading.get_ident()}.tmp')
+    try:
+        with open(tmp_path, 'wb') as f:
+            f.write(data)
+            if durable:
+                f.flush()
+                os.fsync(f.fileno())
+        os.replace(tmp_path, path)
+    except BaseException:
+        with contextlib.suppress(OSError):
+            os.remove(tmp_path)
+        raise
+    if durable:
+        _fsync_dir(folder)
+
+
+def write_png(img, path, durable=False):
+    """Save img as a PNG at path unless it already holds the same pixels. Returns True if written."""
+    if same_pixels(img, path):
+        _count('unchanged')
+        return False
+    replace_file(path, encode_png(img), durable)
+    _count('written')
+    return True
+
+
+def write_bytes(path, data, durable=False):
+    """Write data to path unless the file already has exactly these bytes. Returns True if written."""
+    try:
+        with open(path, 'rb') as f:
+            if f.read() == data:
+                _count('unchanged')
+                return False
+    except OSError:
+        pass
+    replace_file(path, data, durable)
+    _count('written')
+    return True
+
+
+def merge_stats(stats):
+    """Add another process's counters to STATS."""
+    with _stats_lock:
+        for field, value in stats.items():
+            STATS[field] += value
+
+
+def print_summary():
+    """Print how many outputs were written and skipped, if any."""
+    if STATS['written'] or STATS['unchanged']:
+        print(f"\nOutputs: {STATS['written']} written, "
+              f"{STATS['unchanged']} unchanged (write skipped)")
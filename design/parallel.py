@@ -0,0 +1,194 @@
+#!/usr/bin/env python3
+"""
+Per-icon process pool for the design scripts.
+The pure-Python pixel loops hold the GIL, so icons are dispatched to worker
+processes instead of threads. Each worker's output is captured and printed in
+submission order, so logs and results are the same as a sequential run.
+
+Large sources (e.g. the 3072x3072 grid_highres.png) are placed in
+multiprocessing.shared_memory once; workers get a small picklable handle and
+crop their cell from a NumPy view of the shared buffer instead of receiving
+a pickled copy of the whole image.
+"""
+
+from PIL import Image
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from multiprocessing import shared_memory
+import contextlib
+import io
+import os
+import sys
+
+import numpy as np
+
+import memory_budget
+import output_writer
+import pixel_cache
+
+
+def add_jobs_argument(parser):
+    """Add the shared --jobs option to an argparse parser."""
+    parser.add_argument('--jobs', '-j', type=int, default=1,
+                        help='worker processes for per-icon work (0 = all cores)')
+
+
+def resolve_jobs(jobs):
+    """Number of workers for a --jobs value (0 means every core)."""
+    if jobs == 0:
+        return os.cpu_count() or 1
+    return max(1, jobs)
+
+
+def run_captured(func, args):
+    """Run func in a worker, capturing its output, cache and write counters."""
+    pixel_cache.STATS.clear()
+    writes_before = dict(output_writer.STATS)
+    buffer = io.StringIO()
+    with contextlib.redirect_stdout(buffer):
+        result = func(*args)
+    writes = {field: value - writes_before[field]
+              for field, value in output_writer.STATS.items()}
+    return result, buffer.getvalue(), {'cache': dict(pixel_cache.STATS), 'writes': writes}
+
+
+def run_measured(func, args):
+    """run_captured, also returning how far the worker's RSS grew during the call."""
+    idle = memory_budget.reset_peak()
+    result, output, stats = run_captured(func, args)
+    return result, output, stats, memory_budget.observed_peak() - idle
+
+
+def merge_stats(stats):
+    """Add a worker's pixel-cache and write counters to this process's."""
+    for op, counts in stats.get('cache', {}).items():
+        merged = pixel_cache.STATS.setdefault(op, {'hits': 0, 'misses': 0})
+        for field, value in counts.items():
+            merged[field] += value
+    output_writer.merge_stats(stats.get('writes', {}))
+
+
+def run_per_icon(func, items, jobs=1, memory=None):
+    """
+    Call func(*args) for each args tuple in items.
+    With jobs > 1 the calls run in a process pool; output is printed in the
+    same order as the items. Returns the results in item order.
+    memory, if given, is each call's predicted peak in bytes (see
+    memory_budget.predict); with a --max-memory budget, calls then only
+    start while the running calls' predictions fit in it.
+    """
+    jobs = resolve_jobs(jobs)
+    if jobs == 1 or len(items) <= 1:
+        return [func(*args) for args in items]
+    if memory is not None and memory_budget.budget_bytes():
+        return run_within_budget(func, items, jobs, memory)
+    return list(iter_per_icon(func, items, jobs))
+
+
+def iter_per_icon(func, items, jobs=1):
+    """
+    run_per_icon as a generator: yields each call's result, in item order,
+    as soon as it and every call before it have finished, so the caller can
+    record progress while later calls still run. Calls not yet started are
+    cancelled if the caller stops early (or on Ctrl-C).
+    """
+    jobs = resolve_jobs(jobs)
+    if jobs == 1 or len(items) <= 1:
+        for args in items:
+            yield func(*args)
+        return
+
+    with ProcessPoolExecutor(max_workers=min(jobs, len(items))) as pool:
+        futures = [pool.submit(run_captured, func, args) for args in items]
+        try:
+            for idx, future in enumerate(futures):
+                result, output, stats = future.result()
+                # Drop the finished call, so results are not all held until the end
+                futures[idx] = None
+                sys.stdout.write(output)
+                sys.stdout.flush()
+                merge_stats(stats)
+                yield result
+        finally:
+            for future in futures:
+                if future is not None:
+                    future.cancel()
+
+
+def run_within_budget(func, items, jobs, memory):
+    """
+    run_per_icon admitting calls in item order while the predicted peaks of
+    the running calls fit in the memory budget (a call larger than the
+    budget runs alone). Reports predicted and observed peaks.
+    """
+    results = [None] * len(items)
+    outputs = [None] * len(items)
+    observed = [0] * len(items)
+    running = {}
+    in_flight = max_in_flight = 0
+    next_item = next_output = 0
+
+    with ProcessPoolExecutor(max_workers=min(jobs, len(items))) as pool:
+        while next_item < len(items) or running:
+            while (next_item < len(items) and len(running) < jobs
+                   and memory_budget.admits(len(running), in_flight, memory[next_item])):
+                future = pool.submit(run_measured, func, items[next_item])
+                running[future] = next_item
+                in_flight += memory[next_item]
+                max_in_flight = max(max_in_flight, in_flight)
+                next_item += 1
+
+            done, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in done:
+                idx = running.pop(future)
+                in_flight -= memory[idx]
+                results[idx], outputs[idx], stats, observed[idx] = future.result()
+                merge_stats(stats)
+
+            # Print output in item order as soon as it is complete
+            while next_output < len(items) and outputs[next_output] is not None:
+                sys.stdout.write(outputs[next_output])
+                sys.stdout.flush()
+                next_output += 1
+
+    labels = [next((arg for arg in args if isinstance(arg, str)), str(idx))
+              for idx, args in enumerate(items)]
+    memory_budget.print_report(labels, memory, observed, max_in_flight)
+    return results
+
+
+@contextlib.contextmanager
+def shared_image(img):
+    """
+    Copy an image into shared memory for the duration of the block.
+    Yields a small picklable handle that workers pass to crop_shared or
+    load_shared; the segment is unlinked when the block exits.
+    """
+    data = np.asarray(img)
+    shm = shared_memory.SharedMemory(create=True, size=data.nbytes)
+    try:
+        np.ndarray(data.shape, dtype=np.uint8, buffer=shm.buf)[...] = data
+        del data
+        yield (shm.name, img.mode, img.size)
+    finally:
+        shm.close()
+        shm.unlink()
+
+
+def crop_shared(handle, box=None):
+    """
+    Crop a region of a shared image (the whole image if box is None).
+    Only the region is copied out of shared memory.
+    """
+    name, mode, (width, height) = handle
+    left, top, right, bottom = box or (0, 0, width, height)
+
+    shm = shared_memory.SharedMemory(name=name)
+    try:
+        bands = Image.getmodebands(mode)
+        shape = (height, width) if bands == 1 else (height, width, bands)
+        pixels = np.ndarray(shape, dtype=np.uint8, buffer=shm.buf)
+        region = pixels[top:bottom, left:right].copy()
+        del pixels
+    finally:
+        shm.close()
+    return Image.fromarray(region, mode)
@@ -0,0 +1,318 @@
+#!/usr/bin/env python3
+"""
+DAG executor for the Canva icon pipeline.
+Each stage declares the files it reads and writes, and dependencies follow
+from those paths. Asking for a target runs only the stages it needs and skips
+any stage whose outputs are newer than its inputs and were made with the
+same settings (the quality preset and render plan, stamped per stage in
+design/.pipeline_dag.json). With --jobs, independent
+stages (different icons, or the iOS/Android/Flutter emitters of one icon)
+run concurrently.
+
+    test_icon.png       -> extract/<name> -> extracted_icons/<name>_raw.png
+    <name>_raw.png      -> fix/<name>     -> extracted_icons/<name>_fixed_v2.png
+    <name>_fixed_v2.png -> ios/<name>, android/<name>
+    <name>_raw.png      -> flutter/<name>  (keeps the rounded corners)
+
+Targets are stage names or shell-style patterns:
+    python pipeline_dag.py android/teal_pink
+    python pipeline_dag.py 'ios/*' '*/navy_stars' --jobs 4
+    python pipeline_dag.py --list
+"""
+
+from PIL import Image
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+import argparse
+import contextlib
+import fnmatch
+import os
+import sys
+import time
+
+import build_manifest
+import fix_icon_corners_v2
+import icon_stages
+import output_writer
+import parallel
+import pixel_cache
+import quality
+import render_plan
+
+STAMP_NAME = '.pipeline_dag.json'
+
+
+def stage(name, func, args, inputs, outputs, config):
+    """
+    A pipeline stage: func(*args) reads inputs and writes outputs. config
+    holds the settings its outputs depend on besides the inputs.
+    """
+    return {'name': name, 'func': func, 'args': args,
+            'inputs': list(dict.fromkeys(inputs)), 'outputs': list(dict.fromkeys(outputs)),
+            'config': config}
+
+
+def extract_icon(grid_path, idx, raw_path):
+    """Crop one icon out of the Canva grid."""
+    os.makedirs(os.path.dirname(raw_path), exist_ok=True)
+    icon = Image.open(grid_path).crop(icon_stages.icon_box(idx))
+    output_writer.write_png(icon, raw_path)
+
+
+def fix_icon(raw_path, fixed_path):
+    """Replace the gray grid background around one icon."""
+    fixed = fix_icon_corners_v2.fix_gray_pixels(Image.open(raw_path))
+    output_writer.write_png(fixed, fixed_path)
+
+
+def render_icon(source_path, targets):
+    """Render one source image to a list of (px, path) targets."""
+    render_plan.render(Image.open(source_path), targets)
+
+
+def render_ios(source_path, project_dir, name):
+    """Render an iOS appiconset, including its Contents.json."""
+    render_icon(source_path, render_plan.ios_targets(project_dir, name,
+                                                     render_plan.IOS_FILENAME_LEGACY))
+    render_plan.write_ios_contents_json(project_dir, name, render_plan.IOS_FILENAME_LEGACY)
+
+
+def canva_stages(base_dir, project_dir):
+    """Stages of the Canva grid pipeline for every icon."""
+    grid_path = icon_stages.grid_path(project_dir)
+    extracted_dir = os.path.join(base_dir, 'extracted_icons')
+    config = {'quality': quality.QUALITY}
+    render_config = dict(config, plan=render_plan.plan_config())
+
+    stages = []
+    for idx, name in enumerate(icon_stages.ICON_NAMES):
+        raw_path = os.path.join(extracted_dir, f'{name}_raw.png')
+        fixed_path = os.path.join(extracted_dir, f'{name}_fixed_v2.png')
+
+        ios = render_plan.ios_targets(project_dir, name, render_plan.IOS_FILENAME_LEGACY)
+        contents_path = os.path.join(render_plan.ios_folder(project_dir, name), 'Contents.json')
+        android = render_plan.android_targets(project_dir, name)
+        flutter = render_plan.flutter_targets(project_dir, name)
+
+        stages += [
+            stage(f'extract/{name}', extract_icon, (grid_path, idx, raw_path),
+                  [grid_path], [raw_path], config),
+            stage(f'fix/{name}', fix_icon, (raw_path, fixed_path),
+                  [raw_path], [fixed_path], config),
+            stage(f'ios/{name}', render_ios, (fixed_path, project_dir, name),
+                  [fixed_path], [path for _, path in ios] + [contents_path], render_config),
+            stage(f'android/{name}', render_icon, (fixed_path, android),
+                  [fixed_path], [path for _, path in android], render_config),
+            stage(f'flutter/{name}', render_icon, (raw_path, flutter),
+                  [raw_path], [path for _, path in flutter], render_config),
+        ]
+    return stages
+
+
+def dependencies(stages):
+    """Map of stage name -> names of the stages producing its inputs."""
+    producers = {}
+    for s in stages:
+        for path in s['outputs']:
+            if path in producers:
+                raise ValueError(f"{path} is written by both {producers[path]} and {s['name']}")
+            producers[path] = s['name']
+    return {s['name']: sorted({producers[path] for path in s['inputs'] if path in producers})
+            for s in stages}
+
+
+def select(stages, patterns):
+    """
+    Stages needed to materialise the targets matching patterns, in
+    dependency order. With no patterns every stage is selected.
+    """
+    by_name = {s['name']: s for s in stages}
+    deps = dependencies(stages)
+
+    if patterns:
+        wanted = []
+        for pattern in patterns:
+            matches = [s['name'] for s in stages if fnmatch.fnmatchcase(s['name'], pattern)]
+            if not matches:
+                raise ValueError(f"No stage matches '{pattern}'")
+            wanted += matches
+    else:
+        wanted = list(by_name)
+
+    # Depth-first topological order, stable in declaration order
+    ordered, visiting, done = [], set(), set()
+
+    def visit(name):
+        if name in done:
+            return
+        if name in visiting:
+            raise ValueError(f"Dependency cycle through {name}")
+        visiting.add(name)
+        for dep in deps[name]:
+            visit(dep)
+        visiting.discard(name)
+        done.add(name)
+        ordered.append(by_name[name])
+
+    for name in wanted:
+        visit(name)
+    return ordered
+
+
+def stamp_path(base_dir):
+    """Default stamp file location (design/.pipeline_dag.json)."""
+    return os.path.join(base_dir, STAMP_NAME)
+
+
+def load_stamps(path):
+    """Config stamps of the stages that last ran: items of stage name -> config hash."""
+    return build_manifest.load_manifest(path)
+
+
+def is_fresh(s, stamps):
+    """
+    True if the stage last ran with its current config, and every output
+    exists and is newer than every input.
+    """
+    if stamps['items'].get(s['name']) != build_manifest.config_hash(s['config']):
+        return False
+    try:
+        newest_input = max((os.stat(path).st_mtime_ns for path in s['inputs']), default=0)
+        oldest_output = min(os.stat(path).st_mtime_ns for path in s['outputs'])
+    except (OSError, ValueError):
+        return False
+    return oldest_output >= newest_input
+
+
+def mark_fresh(s, stamps):
+    """
+    Touch a stage's outputs once it has run, and stamp its config. output_writer
+    leaves outputs with unchanged pixels alone, so without this their mtimes stay
+    older than a touched input and the stage would never count as up to date again.
+    """
+    for path in s['outputs']:
+        with contextlib.suppress(OSError):
+            os.utime(path)
+    stamps['items'][s['name']] = build_manifest.config_hash(s['config'])
+
+
+def timed(func, *args):
+    """Run func(*args) and return the elapsed seconds."""
+    start = time.perf_counter()
+    func(*args)
+    return time.perf_counter() - start
+
+
+def run(stages, stamps, jobs=1, force=False):
+    """
+    Run stages (in dependency order, as returned by select), each once its
+    dependencies have finished, stamping each one that succeeds in stamps.
+    Stops scheduling new stages after a failure.
+    Returns (ran, up_to_date, failed) lists of stage names.
+    """
+    deps = dependencies(stages)
+    pending = {s['name']: s for s in stages}
+    ran, up_to_date, failed = [], [], []
+    finished = set()
+
+    def needs_run(s):
+        del pending[s['name']]
+        if not force and is_fresh(s, stamps):
+            print(f"  {s['name']}: up to date")
+            up_to_date.append(s['name'])
+            finished.add(s['name'])
+            return False
+        return True
+
+    def report(s, call):
+        name = s['name']
+        try:
+            elapsed, output, stats = call()
+        except Exception as e:
+            print(f"✗ {name}: {e}")
+            failed.append(name)
+            return
+        mark_fresh(s, stamps)
+        parallel.merge_stats(stats)
+        print(f"✓ {name} ({elapsed:.2f}s)")
+        for line in output.splitlines():
+            print(f"    {line}")
+        ran.append(name)
+        finished.add(name)
+
+    if parallel.resolve_jobs(jobs) == 1:
+        for s in stages:
+            if failed:
+                break
+            if needs_run(s):
+                # Output is printed live; nothing to capture in-process
+                report(s, lambda: (timed(s['func'], *s['args']), '', {}))
+        return ran, up_to_date, failed
+
+    with ProcessPoolExecutor(max_workers=parallel.resolve_jobs(jobs)) as pool:
+        running = {}
+        while pending or running:
+            if not failed:
+                for s in list(pending.values()):
+                    if all(dep in finished or dep not in deps for dep in deps[s['name']]):
+                        if needs_run(s):
+                            future = pool.submit(parallel.run_captured, timed,
+                                                 (s['func'],) + s['args'])
+                            running[future] = s
+            if not running:
+                break
+            done, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in done:
+                report(running.pop(future), future.result)
+
+    return ran, up_to_date, failed
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run the Canva icon pipeline")
+    parser.add_argument('targets', nargs='*',
+                        help="stage names or patterns, e.g. android/teal_pink or 'ios/*'")
+    parser.add_argument('--list', action='store_true',
+                        help='list the selected stages and their state without running them')
+    parser.add_argument('--force', action='store_true',
+                        help='rerun stages even if their outputs are up to date')
+    parallel.add_jobs_argument(parser)
+    quality.add_quality_argument(parser)
+    args = parser.parse_args()
+    quality.set_quality(args.quality)
+
+    base_dir = os.path.dirname(os.path.abspath(__file__))
+    project_dir = os.path.dirname(base_dir)
+    stamp_file = stamp_path(base_dir)
+    stamps = load_stamps(stamp_file)
+
+    try:
+        selected = select(canva_stages(base_dir, project_dir), args.targets)
+    except ValueError as e:
+        print(f"Error: {e}")
+        sys.exit(1)
+
+    if args.list:
+        deps = dependencies(selected)
+        for s in selected:
+            state = 'up to date' if is_fresh(s, stamps) else 'stale'
+            after = f" (after {', '.join(deps[s['name']])})" if deps[s['name']] else ''
+            print(f"  {s['name']}: {state}{after}")
+        return
+
+    start = time.perf_counter()
+    try:
+        ran, up_to_date, failed = run(selected, stamps, jobs=args.jobs, force=args.force)
+    finally:
+        build_manifest.save_manifest(stamps, stamp_file)
+    elapsed = time.perf_counter() - start
+    pixel_cache.print_summary()
+    output_writer.print_summary()
+
+    if failed:
+        print(f"\n✗ Failed: {', '.join(failed)}")
+        sys.exit(1)
+    print(f"\n✓ Ran {len(ran)} stages ({len(up_to_date)} up to date) in {elapsed:.1f}s")
+
+
+if __name__ == '__main__':
+    main()
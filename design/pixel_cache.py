@@ -0,0 +1,263 @@
+#!/usr/bin/env python3
+"""
+Persistent content-addressed cache for expensive pixel operations.
+Results are keyed by (operation name, operation version, input pixel hash,
+parameters, and the quality preset outside release), so iterating on one
+step only recomputes that step. Image
+results are stored as raw pixel bytes behind a small JSON header (no PNG
+encode/decode), other results as JSON.
+
+The cache lives in design/.pixelcache and is capped in size; the least
+recently used entries are evicted every EVICT_EVERY stores and when the
+process exits, so a store does not rescan the whole directory.
+    ICON_CACHE_DIR     cache directory
+    ICON_CACHE_MAX_MB  size cap in megabytes (default 512)
+    ICON_CACHE=0       disable the cache
+
+Run directly to print cache usage, or with --clear to empty it.
+"""
+
+from PIL import Image
+import atexit
+import contextlib
+import functools
+import hashlib
+import inspect
+import json
+import os
+import sys
+import threading
+
+import quality
+
+DEFAULT_MAX_MB = 512
+
+CACHE_DIR = os.environ.get(
+    'ICON_CACHE_DIR',
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), '.pixelcache'))
+MAX_BYTES = int(float(os.environ.get('ICON_CACHE_MAX_MB', DEFAULT_MAX_MB)) * 1024 * 1024)
+ENABLED = os.environ.get('ICON_CACHE', '1') != '0'
+
+# Stores between evictions; the cap may be exceeded by this many entries
+EVICT_EVERY = 64
+
+# Hit and miss counters per operation
+STATS = {}
+_stats_lock = threading.Lock()
+
+# load's default, so a cached None is told apart from a miss
+_MISSING = object()
+
+# Stores since the last eviction
+_unevicted = 0
+_evict_lock = threading.Lock()
+
+
+def pixel_hash(img):
+    """Hash of an image's mode, size and pixel data."""
+    digest = hashlib.sha256()
+    digest.update(f'{img.mode}:{img.size[0]}x{img.size[1]}:'.encode('utf-8'))
+    digest.update(img.tobytes())
+    return digest.hexdigest()
+
+
+def cache_key(op_name, version, input_hash, params):
+    """Key for one operation applied to one input."""
+    text = json.dumps([op_name, version, input_hash, params], sort_keys=True, default=str)
+    return hashlib.sha256(text.encode('utf-8')).hexdigest()
+
+
+def _count(op_name, field):
+    with _stats_lock:
+        stats = STATS.setdefault(op_name, {'hits': 0, 'misses': 0})
+        stats[field] += 1
+
+
+def _entry_path(key):
+    return os.path.join(CACHE_DIR, key[:2], key)
+
+
+def load(key, default=None):
+    """Return the cached result for key, or default if there is none."""
+    path = _entry_path(key)
+    try:
+        with open(path, 'rb') as f:
+            header = json.loads(f.readline())
+            data = f.read()
+    except (OSError, ValueError):
+        return default
+
+    # A truncated or otherwise corrupt entry is a miss, and is overwritten
+    try:
+        if header.get('kind') == 'image':
+            result = Image.frombytes(header['mode'], tuple(header['size']), data)
+        else:
+            result = _from_json(json.loads(data))
+    except (ValueError, TypeError, KeyError, AttributeError):
+        return default
+
+    # Touch the entry so eviction sees it as recently used
+    try:
+        os.utime(path)
+    except OSError:
+        pass
+    return result
+
+
+def store(key, result):
+    """Store a result (an image or JSON-serialisable value) under key."""
+    global _unevicted
+    if isinstance(result, Image.Image):
+        header = {'kind': 'image', 'mode': result.mode, 'size': list(result.size)}
+        data = result.tobytes()
+    else:
+        header = {'kind': 'json'}
+        data = json.dumps(_to_json(result)).encode('utf-8')
+
+    path = _entry_path(key)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    # Unique per thread, as threads of one process (the preview server) may
+    # store the same key at once
+    tmp_path = f'{path}.{os.getpid()}.{threading.get_ident()}.tmp'
+    try:
+        with open(tmp_path, 'wb') as f:
+            f.write(json.dumps(header).encode('utf-8') + b'\n')
+            f.write(data)
+        os.replace(tmp_path, path)
+    except BaseException:
+        with contextlib.suppress(OSError):
+            os.remove(tmp_path)
+        raise
+
+    with _evict_lock:
+        _unevicted += 1
+        due = _unevicted >= EVICT_EVERY
+        if due:
+            _unevicted = 0
+    if due:
+        evict()
+
+
+@atexit.register
+def _evict_at_exit():
+    # Pool workers exit without running atexit; their misses are merged into
+    # the parent's STATS (parallel.merge_stats), so the parent evicts for them
+    global _unevicted
+    if _unevicted or any(counts['misses'] for counts in STATS.values()):
+        _unevicted = 0
+        evict()
+
+
+def _to_json(value):
+    """Tuples become tagged lists so they round-trip (also inside lists and dicts)."""
+    if isinstance(value, tuple):
+        return {'__tuple__': [_to_json(v) for v in value]}
+    if isinstance(value, list):
+        return [_to_json(v) for v in value]
+    if isinstance(value, dict):
+        return {key: _to_json(v) for key, v in value.items()}
+    return value
+
+
+def _from_json(value):
+    if isinstance(value, dict) and '__tuple__' in value:
+        return tuple(_from_json(v) for v in value['__tuple__'])
+    if isinstance(value, list):
+        return [_from_json(v) for v in value]
+    if isinstance(value, dict):
+        return {key: _from_json(v) for key, v in value.items()}
+    return value
+
+
+def _entries():
+    """All cache entries as (mtime, size, path)."""
+    entries = []
+    if not os.path.isdir(CACHE_DIR):
+        return entries
+    for sub in os.scandir(CACHE_DIR):
+        if not sub.is_dir():
+            continue
+        for entry in os.scandir(sub.path):
+            if entry.name.endswith('.tmp'):
+                continue
+            st = entry.stat()
+            entries.append((st.st_mtime_ns, st.st_size, entry.path))
+    return entries
+
+
+def evict(max_bytes=None):
+    """Remove least recently used entries until the cache fits max_bytes."""
+    max_bytes = MAX_BYTES if max_bytes is None else max_bytes
+    entries = _entries()
+    total = sum(size for _, size, _ in entries)
+    for _, size, path in sorted(entries):
+        if total <= max_bytes:
+            break
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+        total -= size
+    return total
+
+
+def cached(op_name, version=1):
+    """
+    Decorator for an operation whose first argument is an image.
+    The remaining arguments (defaults included) are the operation's parameters
+    and must be JSON-serialisable. Bump version when the operation's code changes.
+    """
+    def decorator(func):
+        signature = inspect.signature(func)
+
+        @functools.wraps(func)
+        def wrapper(img, *args, **kwargs):
+            if not ENABLED:
+                return func(img, *args, **kwargs)
+
+            bound = signature.bind(img, *args, **kwargs)
+            bound.apply_defaults()
+            params = list(bound.arguments.items())[1:]
+            if not quality.is_exact():
+                params.append(('quality', quality.QUALITY))
+
+            key = cache_key(op_name, version, pixel_hash(img), params)
+            result = load(key, _MISSING)
+            if result is not _MISSING:
+                _count(op_name, 'hits')
+                return result
+
+            _count(op_name, 'misses')
+            result = func(img, *args, **kwargs)
+            store(key, result)
+            return result
+
+        wrapper.uncached = func
+        return wrapper
+    return decorator
+
+
+def summary():
+    """One line per operation with hit and miss counts."""
+    return [f"{op}: {s['hits']} hits, {s['misses']} misses"
+            for op, s in sorted(STATS.items())]
+
+
+def print_summary():
+    """Print cache counters, if any operation used the cache."""
+    if STATS:
+        print("\nPixel cache:")
+        for line in summary():
+            print(f"  {line}")
+
+
+if __name__ == '__main__':
+    if '--clear' in sys.argv:
+        evict(0)
+        print(f"✓ Cleared {CACHE_DIR}")
+    else:
+        entries = _entries()
+        total = sum(size for _, size, _ in entries)
+        print(f"Cache: {CACHE_DIR}")
+        print(f"  {len(entries)} entries, {total / 1024 / 1024:.1f} MB "
+              f"of {MAX_BYTES / 1024 / 1024:.0f} MB")
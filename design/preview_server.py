@@ -0,0 +1,351 @@
+#!/usr/bin/env python3
+"""
+Local preview server that renders icons on demand, without writing files.
+    python preview_server.py [--port 8765] [--cache-mb 64]
+    (or python -m iconkit preview)
+
+    /                                   every icon, strategies side by side
+    /icon/navy_stars?size=87&strategy=fix_corners_v2&source=grid
+    /stats                              cache usage (JSON)
+
+source is where the icon comes from:
+    nano   nano_icons/ (an ICONS name, or any file stem)
+    grid   a cell of grid_highres.png (process_grid_icons)
+    canva  a cell of the Canva test_icon.png grid (icon_stages)
+and defaults to nano for the nano_icons names, grid otherwise.
+strategy is applied at full size before resizing (see STRATEGIES).
+
+Decoded sources, strategy results and encoded PNGs share one LRU cache
+capped in megabytes (--cache-mb or ICON_PREVIEW_CACHE_MB); entries are keyed
+by the source file's size and mtime, so an edited source is picked up on
+the next request, and concurrent requests for one entry render it once. Responses carry an ETag (304 for If-None-Match) and a
+Server-Timing header with the render time, which is also logged per request.
+"""
+
+from PIL import Image
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+import argparse
+import collections
+import hashlib
+import html
+import json
+import os
+import threading
+import time
+
+import output_writer
+import quality
+import render_plan
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+PROJECT_DIR = os.path.dirname(BASE_DIR)
+
+DEFAULT_PORT = 8765
+CACHE_MB = float(os.environ.get('ICON_PREVIEW_CACHE_MB', 64))
+
+MIN_SIZE = 16
+MAX_SIZE = 2048
+
+# Strategy -> (module, function) applied to the full-size source; imported on first use
+STRATEGIES = {
+    'raw': None,
+    'crop_and_scale': ('process_grid_icons', 'crop_and_scale_single'),
+    'fix_corners': ('fix_icon_corners', 'fix_corners'),
+    'fix_corners_v2': ('fix_icon_corners_v2', 'fix_gray_pixels'),
+    'fix_background': ('fix_canva_icons', 'fix_icon_background'),
+}
+
+SOURCES = ('nano', 'grid', 'canva')
+
+_cache = collections.OrderedDict()
+_cache_lock = threading.Lock()
+# Key -> lock held while that key is being computed
+_computing = {}
+STATS = {'bytes': 0, 'entries': 0, 'hits': 0, 'misses': 0, 'evictions': 0}
+
+
+def set_cache_mb(mb):
+    """Set the cache cap for this process."""
+    global CACHE_MB
+    CACHE_MB = max(0.0, mb)
+
+
+def _lookup(key):
+    """(value, True) for a cached key, moved to the recent end, else (None, False)."""
+    if key in _cache:
+        _cache.move_to_end(key)
+        STATS['hits'] += 1
+        return _cache[key][0], True
+    return None, False
+
+
+def cached(key, compute):
+    """
+    Value of compute() for key, from the LRU cache if present.
+    compute returns (value, size in bytes). Returns (value, hit).
+    Concurrent requests for the same missing key compute it once: the others
+    wait for it and count as hits.
+    """
+    with _cache_lock:
+        value, hit = _lookup(key)
+        if hit:
+            return value, True
+        key_lock = _computing.setdefault(key, threading.Lock())
+
+    with key_lock:
+        with _cache_lock:
+            value, hit = _lookup(key)
+            if hit:
+                return value, True
+            STATS['misses'] += 1
+        try:
+            value, nbytes = compute()
+        except BaseException:
+            with _cache_lock:
+                _computing.pop(key, None)
+            raise
+
+        with _cache_lock:
+            _computing.pop(key, None)
+            if key not in _cache:
+                _cache[key] = (value, nbytes)
+                STATS['bytes'] += nbytes
+            # Evict least recently used entries past the cap
+            while STATS['bytes'] > CACHE_MB * 1024 * 1024 and len(_cache) > 1:
+                _, (_, evicted) = _cache.popitem(last=False)
+                STATS['bytes'] -= evicted
+                STATS['evictions'] += 1
+            STATS['entries'] = len(_cache)
+    return value, False
+
+
+def image_bytes(img):
+    """Memory held by a decoded image."""
+    return img.size[0] * img.size[1] * len(img.getbands())
+
+
+def nano_files():
+    """Nano sources: dict of name -> file (ICONS names, then any other file stem)."""
+    import process_nano_icons
+
+    files = dict(process_nano_icons.ICONS)
+    nano_dir = os.path.join(BASE_DIR, 'nano_icons')
+    for filename in sorted(os.listdir(nano_dir)):
+        stem, ext = os.path.splitext(filename)
+        if ext.lower() in ('.jpg', '.jpeg', '.png'):
+            files.setdefault(stem, filename)
+    return files
+
+
+def source_path(source, name):
+    """File an icon is read from, or None if the icon does not exist there."""
+    import icon_stages
+    import process_grid_icons
+
+    if source == 'nano':
+        filename = nano_files().get(name)
+        return os.path.join(BASE_DIR, 'nano_icons', filename) if filename else None
+    if source == 'grid' and name in process_grid_icons.ICON_NAMES:
+        return os.path.join(BASE_DIR, 'grid_highres.png')
+    if source == 'canva' and name in icon_stages.ICON_NAMES:
+        return icon_stages.grid_path(PROJECT_DIR)
+    return None
+
+
+def default_source(name):
+    """nano for the nano_icons sources, the grid for the rest."""
+    return 'nano' if name in nano_files() else 'grid'
+
+
+def load_source(source, name, path):
+    """Decode an icon's full-size source as RGB."""
+    import icon_stages
+    import process_grid_icons
+
+    if source == 'nano':
+        return quality.reduce_source(Image.open(path).convert('RGB'))
+    if source == 'canva':
+        return icon_stages.extract(path, [name])[name].convert('RGB')
+
+    grid = quality.reduce_source(Image.open(path).convert('RGB'))
+    cell_w, cell_h = grid.size[0] // 3, grid.size[1] // 3
+    idx = process_grid_icons.ICON_NAMES.index(name)
+    x, y = idx % 3 * cell_w, idx // 3 * cell_h
+    return grid.crop((x, y, x + cell_w, y + cell_h))
+
+
+def apply_strategy(strategy, img):
+    """The full-size icon produced by a strategy."""
+    if STRATEGIES[strategy] is None:
+        return img
+    module, function = STRATEGIES[strategy]
+    return getattr(__import__(module), function)(img).convert('RGB')
+
+
+def render_icon(name, size, strategy, source):
+    """
+    PNG bytes of an icon, and whether they came from the cache.
+    Raises KeyError for an unknown icon.
+    """
+    path = source_path(source, name)
+    if path is None or not os.path.exists(path):
+        raise KeyError(name)
+    st = os.stat(path)
+    version = (path, st.st_size, st.st_mtime_ns, quality.QUALITY)
+
+    def fixed():
+        def decoded():
+            img = load_source(source, name, path)
+            return img, image_bytes(img)
+
+        img, _ = cached(('source', name, source) + version, decoded)
+        result = apply_strategy(strategy, img)
+        return result, image_bytes(result)
+
+    def encoded():
+        img, _ = cached(('strategy', name, source, strategy) + version, fixed)
+        resized, _ = render_plan.resize_sizes(img, [size])
+        data = output_writer.encode_png(resized[size])
+        return data, len(data)
+
+    return cached(('png', name, source, strategy, size) + version, encoded)
+
+
+def etag(data):
+    """Strong ETag of a response body."""
+    return '"' + hashlib.sha256(data).hexdigest()[:32] + '"'
+
+
+def index_page(size, source_filter=None):
+    """HTML page with every icon rendered with every strategy."""
+    import process_grid_icons
+
+    names = list(dict.fromkeys(list(nano_files()) + process_grid_icons.ICON_NAMES))
+    header = ''.join(f'<th>{html.escape(strategy)}</th>' for strategy in STRATEGIES)
+    rows = []
+    for name in names:
+        source = source_filter or default_source(name)
+        if source_path(source, name) is None:
+            continue
+        cells = ''.join(
+            f'<td><img src="/icon/{html.escape(name)}?size={size}&amp;strategy={strategy}'
+            f'&amp;source={source}" width="{size}" height="{size}" loading="lazy"></td>'
+            for strategy in STRATEGIES)
+        rows.append(f'<tr><th>{html.escape(name)}<br><small>{source}</small></th>{cells}</tr>')
+
+    return f"""<!DOCTYPE html>
+<html>
+<head>
+    <title>Icon strategy preview</title>
+    <style>
+        body {{ font-family: -apple-system, BlinkMacSystemFont, 'Segoe UI', Roboto, sans-serif;
+               background: #1a1a2e; color: white; padding: 40px; margin: 0; }}
+        th {{ color: #8892b0; font-weight: normal; padding: 8px; }}
+        td {{ padding: 8px; text-align: center; }}
+        img {{ border-radius: 22%; box-shadow: 0 4px 20px rgba(0,0,0,0.3); }}
+    </style>
+</head>
+<body>
+    <h1>Icons at {size}px ({quality.QUALITY})</h1>
+    <table>
+        <tr><th></th>{header}</tr>
+        {''.join(rows)}
+    </table>
+</body>
+</html>
+"""
+
+
+class PreviewHandler(BaseHTTPRequestHandler):
+    """Routes /, /icon/<name> and /stats."""
+
+    def do_GET(self):
+        url = urlparse(self.path)
+        query = {key: values[-1] for key, values in parse_qs(url.query).items()}
+        start = time.perf_counter()
+        try:
+            size = int(query.get('size', render_plan.FLUTTER_PREVIEW_SIZE))
+        except ValueError:
+            return self.send_error(400, 'size must be an integer')
+        if not MIN_SIZE <= size <= MAX_SIZE:
+            return self.send_error(400, f'size must be between {MIN_SIZE} and {MAX_SIZE}')
+
+        if url.path == '/':
+            source = query.get('source')
+            if source is not None and source not in SOURCES:
+                return self.send_error(404, f'unknown source {source}')
+            return self.send_body(index_page(size, source).encode('utf-8'),
+                                  'text/html; charset=utf-8')
+        if url.path == '/stats':
+            with _cache_lock:
+                stats = dict(STATS, cache_mb=CACHE_MB)
+            return self.send_body(json.dumps(stats, indent=2).encode('utf-8'),
+                                  'application/json')
+        if not url.path.startswith('/icon/'):
+            return self.send_error(404)
+
+        name = url.path[len('/icon/'):]
+        strategy = query.get('strategy', 'raw')
+        source = query.get('source') or default_source(name)
+        if strategy not in STRATEGIES:
+            return self.send_error(404, f'unknown strategy {strategy}')
+        if source not in SOURCES:
+            return self.send_error(404, f'unknown source {source}')
+        try:
+            data, hit = render_icon(name, size, strategy, source)
+        except KeyError:
+            return self.send_error(404, f'no icon {name} in {source}')
+
+        elapsed_ms = (time.perf_counter() - start) * 1000
+        print(f"{name} {size}px {strategy} ({source}): {elapsed_ms:.1f}ms "
+              f"{'cached' if hit else 'rendered'}")
+        tag = etag(data)
+        if tag in self.headers.get('If-None-Match', ''):
+            self.send_response(304)
+            self.send_header('ETag', tag)
+            self.end_headers()
+            return
+        self.send_body(data, 'image/png', tag, elapsed_ms)
+
+    def send_body(self, data, content_type, tag=None, elapsed_ms=None):
+        self.send_response(200)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(data)))
+        if tag:
+            self.send_header('ETag', tag)
+            self.send_header('Cache-Control', 'no-cache')
+        if elapsed_ms is not None:
+            self.send_header('Server-Timing', f'render;dur={elapsed_ms:.1f}')
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, format, *args):
+        # Icon requests are logged with their render time instead
+        pass
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Render icons on demand for previews")
+    parser.add_argument('--port', type=int, default=DEFAULT_PORT)
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--cache-mb', type=float, default=CACHE_MB,
+                        help='size of the in-memory render cache in MB')
+    quality.add_quality_argument(parser)
+    args = parser.parse_args()
+    quality.set_quality(args.quality)
+    set_cache_mb(args.cache_mb)
+
+    server = ThreadingHTTPServer((args.host, args.port), PreviewHandler)
+    print(f"Serving icon previews on http://{args.host}:{args.port}/ "
+          f"({CACHE_MB:.0f} MB cache); Ctrl-C to stop")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        print("\n✓ Stopped")
+    finally:
+        server.server_close()
+
+
+if __name__ == '__main__':
+    main()
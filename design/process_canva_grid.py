@@ -4,85 +4,43 @@ Process the Canva-generated 3x3 icon grid.
 Extract each icon and generate all required sizes for iOS and Android.
 """
 
-from PIL import Image
+import argparse
+import numpy as np
 import os
 
-# Icon names in order (left to right, top to bottom)
-ICON_NAMES = [
-    'navy_stars',    # Row 1
-    'cream_olive',
-    'gold_luxe',
-    'white_wave',    # Row 2
-    'teal_pink',
-    'ocean_clouds',
-    'night_gold',    # Row 3
-    'sunset_coral',
-    'royal_purple',
-]
-
-# iOS required sizes for alternate icons
-IOS_SIZES = [
-    (40, '20x20@2x'),
-    (60, '20x20@3x'),
-    (58, '29x29@2x'),
-    (87, '29x29@3x'),
-    (80, '40x40@2x'),
-    (120, '40x40@3x'),
-    (120, '60x60@2x'),
-    (180, '60x60@3x'),
-]
-
-# Android mipmap sizes
-ANDROID_SIZES = [
-    (48, 'mipmap-mdpi'),
-    (72, 'mipmap-hdpi'),
-    (96, 'mipmap-xhdpi'),
-    (144, 'mipmap-xxhdpi'),
-    (192, 'mipmap-xxxhdpi'),
-]
-
-
-def extract_icons_from_grid(grid_path, output_dir):
-    """Extract 9 icons from the 3x3 grid image."""
-    img = Image.open(grid_path)
-    width, height = img.size
+import icon_stages
+import image_array
+import image_backend
+import output_writer
+import pixel_cache
+import quality
+import render_plan
 
-    print(f"Grid image size: {width}x{height}")
+ICON_NAMES = icon_stages.ICON_NAMES
 
-    # Based on the actual Canva grid layout:
-    # The 1024x1024 image has 9 icons in a 3x3 grid
-    # Each icon is approximately 290x290 with small gaps
-    # Starting position is around (55, 55)
 
-    start_x = 55
-    start_y = 55
-    icon_size = 290
-    gap = 22  # Gap between icons
+def extract_icons_from_grid(grid_path, output_dir=None, backend='pillow'):
+    """
+    Extract 9 icons from the 3x3 grid image.
+    The raw icons are only saved to output_dir if one is given.
+    """
+    bk = image_backend.get(backend)
+    img = bk.open(grid_path)
+    width, height = bk.size(img)
 
-    print(f"Icon size: {icon_size}, gap: {gap}")
+    print(f"Grid image size: {width}x{height}")
+    print(f"Icon size: {icon_stages.ICON_SIZE}, gap: {icon_stages.GAP}")
 
-    icons = {}
+    icons = icon_stages.extract(img, backend=backend)
+    icon_stages.save_intermediates(icons, output_dir, 'raw')
     for idx, name in enumerate(ICON_NAMES):
-        row = idx // 3
-        col = idx % 3
-
-        # Calculate position
-        x = start_x + col * (icon_size + gap)
-        y = start_y + row * (icon_size + gap)
-
-        # Crop the icon
-        box = (x, y, x + icon_size, y + icon_size)
-        icon = img.crop(box)
-
-        # Save the extracted icon at max size
-        icon_path = os.path.join(output_dir, f'{name}_raw.png')
-        icon.save(icon_path, 'PNG')
-        icons[name] = icon
+        x, y = icon_stages.icon_box(idx)[:2]
         print(f"Extracted {name} at position ({x}, {y})")
 
     return icons
 
 
+@pixel_cache.cached('remove_rounded_corners', version=1)
 def remove_rounded_corners(img, corner_radius_percent=0.18):
     """
     The Canva icons have rounded corners. We need to fill them with the
@@ -92,187 +50,105 @@ def remove_rounded_corners(img, corner_radius_percent=0.18):
 
     # Sample colors from the edges (away from corners) to get the actual icon background
     # Take multiple samples along each edge and find the dominant color
-    samples = []
-
-    # Top edge (middle section)
-    for x in range(width // 3, 2 * width // 3, 5):
-        samples.append(img.getpixel((x, 5)))
-
-    # Bottom edge (middle section)
-    for x in range(width // 3, 2 * width // 3, 5):
-        samples.append(img.getpixel((x, height - 6)))
-
-    # Left edge (middle section)
-    for y in range(height // 3, 2 * height // 3, 5):
-        samples.append(img.getpixel((5, y)))
-
-    # Right edge (middle section)
-    for y in range(height // 3, 2 * height // 3, 5):
-        samples.append(img.getpixel((width - 6, y)))
+    pixels = image_array.as_array(img)
+    samples = np.concatenate([
+        # Top edge (middle section)
+        pixels[5, width // 3:2 * width // 3:5],
+        # Bottom edge (middle section)
+        pixels[height - 6, width // 3:2 * width // 3:5],
+        # Left edge (middle section)
+        pixels[height // 3:2 * height // 3:5, 5],
+        # Right edge (middle section)
+        pixels[height // 3:2 * height // 3:5, width - 6],
+    ])
 
     # Find the most common color (this is likely the background)
-    from collections import Counter
-    bg_color = Counter(samples).most_common(1)[0][0]
+    bg_color = image_array.most_common_color(samples)
 
     # Convert to RGB if necessary
     if len(bg_color) == 4:
         bg_color = bg_color[:3]
 
-    # Create a new image with the background color filling everything
-    result = Image.new('RGB', (width, height), bg_color)
-
     # The rounded corner radius - Canva uses about 18% of icon size
     radius = int(width * corner_radius_percent)
 
-    # Create a mask for the rounded rectangle
-    # We want to KEEP the center and fill corners with bg_color
-
-    # Copy pixels from original, but for corners, extend the edge color
-    img_rgb = img.convert('RGB')
-
-    for y in range(height):
-        for x in range(width):
-            # Determine if this pixel is in a corner region
-            in_corner = False
-            corner_center = None
-
-            # Top-left corner
-            if x < radius and y < radius:
-                in_corner = True
-                corner_center = (radius, radius)
-
-            # Top-right corner
-            elif x >= width - radius and y < radius:
-                in_corner = True
-                corner_center = (width - radius, radius)
-
-            # Bottom-left corner
-            elif x < radius and y >= height - radius:
-                in_corner = True
-                corner_center = (radius, height - radius)
-
-            # Bottom-right corner
-            elif x >= width - radius and y >= height - radius:
-                in_corner = True
-                corner_center = (width - radius, height - radius)
-
-            if in_corner:
-                # Check if outside the rounded corner
-                dist = ((x - corner_center[0]) ** 2 + (y - corner_center[1]) ** 2) ** 0.5
-                if dist > radius:
-                    # Outside the rounded corner - use background color
-                    result.putpixel((x, y), bg_color)
-                else:
-                    # Inside the rounded area - use original pixel
-                    result.putpixel((x, y), img_rgb.getpixel((x, y)))
-            else:
-                # Not in a corner - use original pixel
-                result.putpixel((x, y), img_rgb.getpixel((x, y)))
-
-    return result
-
-
-def generate_ios_icons(icons, output_base):
-    """Generate all required iOS icon sizes."""
-    ios_assets = os.path.join(output_base, 'ios', 'Runner', 'Assets.xcassets')
-
-    for name, icon in icons.items():
-        # Make icon square (fill corners)
-        square_icon = remove_rounded_corners(icon)
+    # Copy pixels from original, but fill the parts of the corner regions
+    # outside the rounded corners with the background color
+    result = np.array(img.convert('RGB'))
 
-        # Create appiconset folder
-        folder = os.path.join(ios_assets, f'AppIcon-{name}.appiconset')
-        os.makedirs(folder, exist_ok=True)
-
-        # Generate each size
-        for size, size_name in IOS_SIZES:
-            resized = square_icon.resize((size, size), Image.Resampling.LANCZOS)
-            filename = f'Icon-{size}.png'
-            resized.save(os.path.join(folder, filename), 'PNG')
-
-        # Generate Contents.json
-        contents = generate_ios_contents_json()
-        with open(os.path.join(folder, 'Contents.json'), 'w') as f:
-            import json
-            json.dump(contents, f, indent=2)
-
-        print(f"Generated iOS icons for {name}")
-
-
-def generate_ios_contents_json():
-    """Generate Contents.json for iOS alternate icon."""
-    images = [
-        {"size": "20x20", "idiom": "iphone", "filename": "Icon-40.png", "scale": "2x"},
-        {"size": "20x20", "idiom": "iphone", "filename": "Icon-60.png", "scale": "3x"},
-        {"size": "29x29", "idiom": "iphone", "filename": "Icon-58.png", "scale": "2x"},
-        {"size": "29x29", "idiom": "iphone", "filename": "Icon-87.png", "scale": "3x"},
-        {"size": "40x40", "idiom": "iphone", "filename": "Icon-80.png", "scale": "2x"},
-        {"size": "40x40", "idiom": "iphone", "filename": "Icon-120.png", "scale": "3x"},
-        {"size": "60x60", "idiom": "iphone", "filename": "Icon-120.png", "scale": "2x"},
-        {"size": "60x60", "idiom": "iphone", "filename": "Icon-180.png", "scale": "3x"},
+    # Corner boxes as (left, top) and the center of each rounded corner
+    corners = [
+        ((0, 0), (radius, radius)),
+        ((width - radius, 0), (width - radius, radius)),
+        ((0, height - radius), (radius, height - radius)),
+        ((width - radius, height - radius), (width - radius, height - radius)),
     ]
-    return {
-        "images": images,
-        "info": {"version": 1, "author": "xcode"}
-    }
+    for (x1, y1), (cx, cy) in corners:
+        dy, dx = np.ogrid[y1 - cy:y1 + radius - cy, x1 - cx:x1 + radius - cx]
+        outside = dx * dx + dy * dy > radius * radius
+        result[y1:y1 + radius, x1:x1 + radius][outside] = bg_color
 
+    return image_array.to_image(result)
 
-def generate_android_icons(icons, output_base):
-    """Generate Android mipmap icons."""
-    android_res = os.path.join(output_base, 'android', 'app', 'src', 'main', 'res')
 
+def generate_platform_icons(icons, output_base, backend='pillow'):
+    """Generate iOS appiconsets and Android mipmaps from one squared master."""
+    bk = image_backend.get(backend)
     for name, icon in icons.items():
-        # Make icon square (fill corners)
+        # Make icon square (fill corners) once for both platforms
         square_icon = remove_rounded_corners(icon)
 
-        for size, folder in ANDROID_SIZES:
-            output_dir = os.path.join(android_res, folder)
-            os.makedirs(output_dir, exist_ok=True)
-
-            resized = square_icon.resize((size, size), Image.Resampling.LANCZOS)
-            resized.save(os.path.join(output_dir, f'ic_launcher_{name}.png'), 'PNG')
+        targets = (render_plan.ios_targets(output_base, name,
+                                           render_plan.IOS_FILENAME_LEGACY)
+                   + render_plan.android_targets(output_base, name))
+        bk.render(square_icon, targets)
+        render_plan.write_ios_contents_json(output_base, name,
+                                            render_plan.IOS_FILENAME_LEGACY)
 
-        print(f"Generated Android icons for {name}")
+        print(f"Generated iOS and Android icons for {name}")
 
 
-def generate_flutter_preview(icons, output_base):
+def generate_flutter_preview(icons, output_base, backend='pillow'):
     """Generate preview icons for Flutter app."""
-    preview_dir = os.path.join(output_base, 'assets', 'icons')
-    os.makedirs(preview_dir, exist_ok=True)
-
+    bk = image_backend.get(backend)
     for name, icon in icons.items():
         # For preview, keep the rounded corners (looks nicer in the app)
-        resized = icon.resize((120, 120), Image.Resampling.LANCZOS)
-        resized.save(os.path.join(preview_dir, f'icon_{name}.png'), 'PNG')
+        bk.render(icon, render_plan.flutter_targets(output_base, name))
         print(f"Generated Flutter preview for {name}")
 
 
 def main():
+    parser = argparse.ArgumentParser(description="Process the Canva-generated icon grid")
+    parser.add_argument('--debug-intermediates', action='store_true',
+                        help='also write the extracted raw icons to extracted_icons/')
+    image_backend.add_backend_argument(parser)
+    quality.add_quality_argument(parser)
+    args = parser.parse_args()
+    quality.set_quality(args.quality)
+
     base_dir = os.path.dirname(os.path.abspath(__file__))
     project_dir = os.path.dirname(base_dir)
 
     # Input: the Canva-generated grid
-    grid_path = os.path.join(project_dir, 'test_icon.png')
+    grid_path = icon_stages.grid_path(project_dir)
 
     if not os.path.exists(grid_path):
         print(f"Error: Grid image not found at {grid_path}")
         return
 
-    # Create temp dir for extracted icons
-    temp_dir = os.path.join(base_dir, 'extracted_icons')
-    os.makedirs(temp_dir, exist_ok=True)
+    # Icons stay in memory; raw PNGs are only written for debugging
+    debug_dir = icon_stages.DEBUG_DIR if args.debug_intermediates else None
 
     print("Extracting icons from grid...")
-    icons = extract_icons_from_grid(grid_path, temp_dir)
-
-    print("\nGenerating iOS icons...")
-    generate_ios_icons(icons, project_dir)
+    icons = extract_icons_from_grid(grid_path, debug_dir, backend=args.backend)
 
-    print("\nGenerating Android icons...")
-    generate_android_icons(icons, project_dir)
+    print("\nGenerating iOS and Android icons...")
+    generate_platform_icons(icons, project_dir, backend=args.backend)
 
     print("\nGenerating Flutter previews...")
-    generate_flutter_preview(icons, project_dir)
+    generate_flutter_preview(icons, project_dir, backend=args.backend)
+    pixel_cache.print_summary()
+    output_writer.print_summary()
 
     print("\n✓ All icons processed successfully!")
 
@@ -4,9 +4,28 @@ Process the 3x3 grid of Canva icons.
 Extract each icon, crop inside the rounded corners, and scale to fill canvas.
 """
 
-from PIL import Image
 import os
-import math
+import argparse
+
+import build_manifest
+import image_array
+import image_backend
+import memory_budget
+import output_writer
+import parallel
+import pixel_cache
+import quality
+import render_plan
+import sharding
+import strips
+
+# Inner rect detection settings
+MARGIN_RATIO = 0.18
+BG_THRESHOLD = 25
+
+# What one cell job and one render job do, for memory_budget.predict
+CELL_OPS = ('copy', 'scan', 'copy', 'resize', 'encode')
+RENDER_OPS = ('copy', 'resize', 'encode')
 
 # Icon names in order (top-left to bottom-right, row by row)
 ICON_NAMES = [
@@ -26,11 +45,8 @@ def get_pixel_rgb(img, x, y):
     p = img.getpixel((x, y))
     return p[:3] if isinstance(p, tuple) else (p, p, p)
 
-def color_distance(c1, c2):
-    """Euclidean color distance."""
-    return math.sqrt(sum((a - b) ** 2 for a, b in zip(c1[:3], c2[:3])))
-
-def find_icon_inner_rect(img, margin_ratio=0.18):
+@pixel_cache.cached('find_icon_inner_rect', version=1)
+def find_icon_inner_rect(img, margin_ratio=MARGIN_RATIO, threshold=BG_THRESHOLD):
     """
     Find the inner rectangular region of a single icon (inside rounded corners).
     """
@@ -40,15 +56,9 @@ def find_icon_inner_rect(img, margin_ratio=0.18):
     bg_color = get_pixel_rgb(img, 2, 2)
 
     # Find icon bounds
-    left, top, right, bottom = width, height, 0, 0
-
-    for y in range(height):
-        for x in range(width):
-            if color_distance(get_pixel_rgb(img, x, y), bg_color) > 25:
-                left = min(left, x)
-                top = min(top, y)
-                right = max(right, x)
-                bottom = max(bottom, y)
+    left, top, right, bottom = quality.mask_bounds(
+        img, lambda pixels: image_array.color_distance_map(pixels, bg_color) > threshold
+    ) or (width, height, 0, 0)
 
     if left >= right or top >= bottom:
         # No icon found, return center region
@@ -63,37 +73,67 @@ def find_icon_inner_rect(img, margin_ratio=0.18):
 
     return left + margin_x, top + margin_y, right - margin_x, bottom - margin_y
 
-def crop_and_scale_single(img, output_size=1024):
-    """Crop inner region and scale to fill canvas."""
+def crop_and_scale_single(img, output_size=1024, backend='pillow'):
+    """Crop inner region and scale to fill canvas (img is a backend image)."""
+    bk = image_backend.get(backend)
+
     # Find inner rectangle
-    inner_rect = find_icon_inner_rect(img)
+    inner_rect = find_icon_inner_rect(bk.to_pil(img))
     inner_left, inner_top, inner_right, inner_bottom = inner_rect
 
     # Crop
-    cropped = img.crop((inner_left, inner_top, inner_right + 1, inner_bottom + 1))
-    crop_w, crop_h = cropped.size
+    crop_w = inner_right + 1 - inner_left
+    crop_h = inner_bottom + 1 - inner_top
 
     if crop_w <= 0 or crop_h <= 0:
-        return img.resize((output_size, output_size), Image.Resampling.LANCZOS)
+        return bk.resize(img, (output_size, output_size))
+
+    cropped = bk.crop(img, (inner_left, inner_top, inner_right + 1, inner_bottom + 1))
 
     # Scale to fill
     scale = max(output_size / crop_w, output_size / crop_h)
     new_w = int(crop_w * scale)
     new_h = int(crop_h * scale)
 
-    scaled = cropped.resize((new_w, new_h), Image.Resampling.LANCZOS)
+    scaled = bk.resize(cropped, (new_w, new_h))
 
     # Center crop to exact size
     start_x = (new_w - output_size) // 2
     start_y = (new_h - output_size) // 2
-    result = scaled.crop((start_x, start_y, start_x + output_size, start_y + output_size))
+    result = bk.crop(scaled, (start_x, start_y, start_x + output_size, start_y + output_size))
 
     return result
 
-def extract_icons_from_grid(grid_path, output_dir, output_size=1024):
-    """Extract individual icons from a 3x3 grid."""
-    grid = Image.open(grid_path).convert('RGB')
-    grid_w, grid_h = grid.size
+def process_cell(cell, name, output_path, output_size=1024, backend='pillow'):
+    """Crop and scale one grid cell, save its master and return it as a PIL image."""
+    bk = image_backend.get(backend)
+    processed = crop_and_scale_single(cell, output_size, backend)
+    bk.encode(processed, output_path)
+    print(f"  Processed {name}")
+    return bk.to_pil(processed)
+
+def process_shared_cell(grid_handle, box, name, output_path, output_size=1024, backend='pillow'):
+    """process_cell in a worker, cropping the cell from the shared grid."""
+    cell = image_backend.get(backend).from_pil(parallel.crop_shared(grid_handle, box))
+    return process_cell(cell, name, output_path, output_size, backend)
+
+def process_file_cell(grid_path, box, name, output_path, output_size=1024, backend='pillow'):
+    """process_cell reading just its cell from the grid file, strip by strip."""
+    cell = image_backend.get(backend).from_pil(strips.crop_file(grid_path, box))
+    return process_cell(cell, name, output_path, output_size, backend)
+
+def extract_icons_from_grid(grid_path, output_dir, output_size=1024, names=None, jobs=1,
+                            backend='pillow'):
+    """Extract individual icons from a 3x3 grid (only those in names, if given)."""
+    bk = image_backend.get(backend)
+    # In strip mode each cell is read from the file on its own, so the grid
+    # is never decoded whole (sources reduced on open still need the grid)
+    from_file = strips.STRIP_ROWS and quality.setting('source_reduce') == 1
+    if from_file:
+        grid_w, grid_h = strips.file_size(grid_path)
+    else:
+        grid = bk.open(grid_path, rgb=True)
+        grid_w, grid_h = bk.size(grid)
 
     # Calculate cell size (3x3 grid)
     cell_w = grid_w // 3
@@ -104,84 +144,170 @@ def extract_icons_from_grid(grid_path, output_dir, output_size=1024):
 
     os.makedirs(output_dir, exist_ok=True)
 
-    results = {}
-
+    cells = []
     for idx, name in enumerate(ICON_NAMES):
+        if names is not None and name not in names:
+            continue
+
         row = idx // 3
         col = idx % 3
 
-        # Extract cell
+        # Cell box
         x1 = col * cell_w
         y1 = row * cell_h
         x2 = x1 + cell_w
         y2 = y1 + cell_h
 
-        cell = grid.crop((x1, y1, x2, y2))
-
-        # Process the cell
-        processed = crop_and_scale_single(cell, output_size)
-
-        # Save
         output_path = os.path.join(output_dir, f'{name}_1024.png')
-        processed.save(output_path, 'PNG')
-
-        results[name] = processed
-        print(f"  Processed {name}")
-
-    return results
-
-def generate_all_sizes(icons_dict, base_dir):
+        cells.append((name, (x1, y1, x2, y2), output_path))
+
+    memory = [memory_budget.predict((box[2] - box[0], box[3] - box[1]), CELL_OPS)
+              for _, box, _ in cells]
+    if from_file:
+        processed = parallel.run_per_icon(
+            process_file_cell,
+            [(grid_path, box, name, output_path, output_size, backend)
+             for name, box, output_path in cells],
+            jobs, memory=memory)
+    elif parallel.resolve_jobs(jobs) == 1:
+        processed = [process_cell(bk.crop(grid, box), name, output_path, output_size, backend)
+                     for name, box, output_path in cells]
+    else:
+        # Workers crop their cell from one shared copy of the grid
+        with parallel.shared_image(bk.to_pil(grid)) as grid_handle:
+            processed = parallel.run_per_icon(
+                process_shared_cell,
+                [(grid_handle, box, name, output_path, output_size, backend)
+                 for name, box, output_path in cells],
+                jobs, memory=memory)
+
+    return {name: img for (name, _, _), img in zip(cells, processed)}
+
+def generate_icon_sizes(name, img, project_dir, backend='pillow'):
+    """Generate all platform sizes for one icon."""
+    targets = render_plan.platform_targets(project_dir, name,
+                                           render_plan.IOS_FILENAME_LEGACY)
+    image_backend.get(backend).render(img, targets)
+    print(f"  Generated all sizes for {name}")
+
+def generate_all_sizes(icons_dict, base_dir, batched=False, jobs=1, backend='pillow'):
     """Generate all platform sizes for each icon."""
     project_dir = os.path.dirname(base_dir)
 
-    ios_assets = os.path.join(project_dir, 'ios', 'Runner', 'Assets.xcassets')
-    android_res = os.path.join(project_dir, 'android', 'app', 'src', 'main', 'res')
-    flutter_icons = os.path.join(project_dir, 'assets', 'icons')
-
-    ios_sizes = [(40, 'Icon-40.png'), (58, 'Icon-58.png'), (60, 'Icon-60.png'),
-                 (80, 'Icon-80.png'), (87, 'Icon-87.png'), (120, 'Icon-120.png'),
-                 (180, 'Icon-180.png')]
+    if batched:
+        targets = {name: render_plan.platform_targets(project_dir, name,
+                                                      render_plan.IOS_FILENAME_LEGACY)
+                   for name in icons_dict}
+        render_plan.render_batch(icons_dict, targets)
+        print(f"  Generated all sizes for {len(icons_dict)} icons (batched)")
+        return
+
+    parallel.run_per_icon(generate_icon_sizes,
+                          [(name, img, project_dir, backend) for name, img in icons_dict.items()],
+                          jobs,
+                          memory=[memory_budget.predict(img.size, RENDER_OPS)
+                                  for img in icons_dict.values()])
+
+def grid_config(idx, output_size=1024, backend='pillow', batched=False):
+    """Effective settings for one grid cell, recorded in the build manifest."""
+    return {
+        'grid': [3, 3],
+        'cell': idx,
+        'margin_ratio': MARGIN_RATIO,
+        'bg_threshold': BG_THRESHOLD,
+        'output_size': output_size,
+        'backend': backend,
+        'batched': batched,
+        'plan': render_plan.plan_config(),
+    }
+
+def icon_outputs(name, output_dir, project_dir):
+    """Every file written for a grid icon."""
+    targets = render_plan.platform_targets(project_dir, name,
+                                           render_plan.IOS_FILENAME_LEGACY)
+    return [os.path.join(output_dir, f'{name}_1024.png')] + [path for _, path in targets]
+
+def main():
+    parser = argparse.ArgumentParser(description="Process the 3x3 grid of Canva icons")
+    parser.add_argument('--batched', action='store_true',
+                        help='resize all icons together with the NumPy resampler')
+    parser.add_argument('--force', action='store_true',
+                        help='rebuild every icon, ignoring the build manifest')
+    parallel.add_jobs_argument(parser)
+    image_backend.add_backend_argument(parser)
+    strips.add_strip_argument(parser)
+    quality.add_quality_argument(parser)
+    memory_budget.add_memory_argument(parser)
+    sharding.add_shard_argument(parser)
+    args = parser.parse_args()
+    strips.set_strip_rows(args.strip_rows)
+    quality.set_quality(args.quality)
+    memory_budget.set_max_memory(args.max_memory)
+    sharding.set_shard(args.shard)
 
-    android_sizes = [(48, 'mipmap-mdpi'), (72, 'mipmap-hdpi'), (96, 'mipmap-xhdpi'),
-                     (144, 'mipmap-xxhdpi'), (192, 'mipmap-xxxhdpi')]
-
-    for name, img in icons_dict.items():
-        # iOS
-        ios_folder = os.path.join(ios_assets, f'AppIcon-{name}.appiconset')
-        os.makedirs(ios_folder, exist_ok=True)
-
-        for size, filename in ios_sizes:
-            resized = img.resize((size, size), Image.Resampling.LANCZOS)
-            resized.save(os.path.join(ios_folder, filename), 'PNG')
-
-        # Android
-        for size, folder in android_sizes:
-            out_dir = os.path.join(android_res, folder)
-            os.makedirs(out_dir, exist_ok=True)
-            resized = img.resize((size, size), Image.Resampling.LANCZOS)
-            resized.save(os.path.join(out_dir, f'ic_launcher_{name}.png'), 'PNG')
-
-        # Flutter preview
-        os.makedirs(flutter_icons, exist_ok=True)
-        preview = img.resize((120, 120), Image.Resampling.LANCZOS)
-        preview.save(os.path.join(flutter_icons, f'icon_{name}.png'), 'PNG')
-
-        print(f"  Generated all sizes for {name}")
-
-if __name__ == '__main__':
     base_dir = os.path.dirname(os.path.abspath(__file__))
+    project_dir = os.path.dirname(base_dir)
 
     # Use high resolution grid
     grid_path = os.path.join(base_dir, 'grid_highres.png')
     output_dir = os.path.join(base_dir, 'processed_icons')
 
-    if os.path.exists(grid_path):
-        print("Extracting icons from grid...")
-        icons = extract_icons_from_grid(grid_path, output_dir)
+    if not os.path.exists(grid_path):
+        print(f"Grid file not found: {grid_path}")
+        return
+
+    # Skip icons whose grid, settings and outputs are unchanged
+    manifest_file = build_manifest.manifest_path(base_dir)
+    manifest = build_manifest.load_manifest(manifest_file)
+    sources = build_manifest.relative_paths([grid_path], project_dir)
+
+    names = sharding.select(ICON_NAMES)
+    if args.shard:
+        print(sharding.describe(names, ICON_NAMES))
+
+    stale = []
+    for name in names:
+        if not args.force and build_manifest.is_up_to_date(
+                manifest, f'grid/{name}', sources,
+                grid_config(ICON_NAMES.index(name), backend=args.backend, batched=args.batched),
+                project_dir):
+            print(f"{name}: up to date")
+            continue
+        stale.append(name)
+
+    if not stale:
+        if args.shard:
+            sharding.write_partial(manifest_file, 'grid', manifest,
+                                   [(name, f'grid/{name}') for name in ICON_NAMES])
+        elif manifest.get('dirty'):
+            # Keep the file stats refreshed by is_up_to_date
+            build_manifest.save_manifest(manifest, manifest_file)
+        print("\n✓ All icons up to date!")
+        return
+
+    print("Extracting icons from grid...")
+    icons = extract_icons_from_grid(grid_path, output_dir, names=stale, jobs=args.jobs,
+                                    backend=args.backend)
+
+    print("\nGenerating platform sizes...")
+    generate_all_sizes(icons, base_dir, batched=args.batched, jobs=args.jobs,
+                       backend=args.backend)
+
+    for name in icons:
+        outputs = build_manifest.relative_paths(icon_outputs(name, output_dir, project_dir),
+                                                project_dir)
+        build_manifest.record(manifest, f'grid/{name}', sources, outputs,
+                              grid_config(ICON_NAMES.index(name), backend=args.backend,
+                                          batched=args.batched), project_dir)
+    if args.shard:
+        sharding.write_partial(manifest_file, 'grid', manifest,
+                               [(name, f'grid/{name}') for name in ICON_NAMES])
+    else:
+        build_manifest.save_manifest(manifest, manifest_file)
+    pixel_cache.print_summary()
+    output_writer.print_summary()
 
-        print("\nGenerating platform sizes...")
-        generate_all_sizes(icons, base_dir)
+    print("\n✓ All icons processed!")
 
-        print("\n✓ All icons processed!")
-    else:
-        print(f"Grid file not found: {grid_path}")
+if __name__ == '__main__':
+    main()
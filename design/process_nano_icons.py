@@ -6,8 +6,19 @@ since iOS will clip them anyway.
 """
 
 from PIL import Image
+import argparse
 import os
-import json
+import sys
+
+import build_manifest
+import memory_budget
+import output_writer
+import parallel
+import quality
+import render_plan
+import resize_pyramid
+import sharding
+import write_behind
 
 # Icon mapping: name -> source file
 ICONS = {
@@ -22,120 +33,166 @@ ICONS = {
     'royal_purple': 'royal_purple_v2.jpg',
 }
 
-# iOS icon sizes for iPhone
-IOS_SIZES = [
-    (20, 2),   # 40x40 - Notification 2x
-    (20, 3),   # 60x60 - Notification 3x
-    (29, 2),   # 58x58 - Settings 2x
-    (29, 3),   # 87x87 - Settings 3x
-    (40, 2),   # 80x80 - Spotlight 2x
-    (40, 3),   # 120x120 - Spotlight 3x
-    (60, 2),   # 120x120 - App 2x
-    (60, 3),   # 180x180 - App 3x
-]
-
-# Android mipmap sizes
-ANDROID_SIZES = [
-    (48, 'mipmap-mdpi'),
-    (72, 'mipmap-hdpi'),
-    (96, 'mipmap-xhdpi'),
-    (144, 'mipmap-xxhdpi'),
-    (192, 'mipmap-xxxhdpi'),
-]
-
-def create_ios_contents_json(icon_name):
-    """Create Contents.json for iOS alternate icon."""
-    images = []
-    for size, scale in IOS_SIZES:
-        pixel_size = size * scale
-        filename = f"icon_{pixel_size}.png"
-        images.append({
-            "size": f"{size}x{size}",
-            "idiom": "iphone",
-            "filename": filename,
-            "scale": f"{scale}x"
-        })
-
-    return {
-        "images": images,
-        "info": {
-            "version": 1,
-            "author": "xcode"
-        }
-    }
-
-def process_icon(name, source_file, base_dir, project_dir):
-    """Process a single icon into all required sizes."""
+# What one icon job does, for memory_budget.predict: the pyramid octaves and
+# the write-behind queue each hold about one more copy
+ICON_OPS = ('decode', 'convert', 'copy', 'copy', 'resize', 'encode')
+
+def icon_targets(name, base_dir, project_dir):
+    """Every platform target plus the 1024x1024 master copy."""
+    return (render_plan.platform_targets(project_dir, name)
+            + render_plan.master_targets(base_dir, name))
+
+def icon_outputs(name, base_dir, project_dir):
+    """Every file written for an icon, including Contents.json."""
+    contents_path = os.path.join(render_plan.ios_folder(project_dir, name), 'Contents.json')
+    return [path for _, path in icon_targets(name, base_dir, project_dir)] + [contents_path]
+
+def nano_config(batched=False):
+    """Effective settings for a nano icon, recorded in the build manifest."""
+    return {'batched': batched, 'plan': render_plan.plan_config()}
+
+def process_icon(name, source_file, base_dir, project_dir, save=None):
+    """
+    Process a single icon into all required sizes.
+    Outputs go to save (a write_behind.writer queue), or to a queue of the
+    icon's own if none is given.
+    """
+    if save is None:
+        with write_behind.writer() as save:
+            return process_icon(name, source_file, base_dir, project_dir, save)
+
     source_path = os.path.join(base_dir, 'nano_icons', source_file)
+    print(f"Processing {name}...")
 
     if not os.path.exists(source_path):
-        print(f"  Warning: {source_path} not found, skipping")
+        print(f"  Warning: {source_path} not found, skipping\n")
         return False
 
-    img = Image.open(source_path).convert('RGB')
-    print(f"  Source: {img.size[0]}x{img.size[1]}")
-
-    # iOS - create complete appiconset
-    ios_folder = os.path.join(project_dir, 'ios', 'Runner', 'Assets.xcassets',
-                              f'AppIcon-{name}.appiconset')
-    os.makedirs(ios_folder, exist_ok=True)
-
-    for size, scale in IOS_SIZES:
-        pixel_size = size * scale
-        resized = img.resize((pixel_size, pixel_size), Image.Resampling.LANCZOS)
-        output_path = os.path.join(ios_folder, f'icon_{pixel_size}.png')
-        resized.save(output_path, 'PNG')
-
-    # Write Contents.json
-    contents = create_ios_contents_json(name)
-    contents_path = os.path.join(ios_folder, 'Contents.json')
-    with open(contents_path, 'w') as f:
-        json.dump(contents, f, indent=2)
-
-    print(f"  iOS: Created {len(IOS_SIZES)} sizes + Contents.json")
-
-    # Android
-    android_res = os.path.join(project_dir, 'android', 'app', 'src', 'main', 'res')
-    for pixel_size, folder in ANDROID_SIZES:
-        out_dir = os.path.join(android_res, folder)
-        os.makedirs(out_dir, exist_ok=True)
-        resized = img.resize((pixel_size, pixel_size), Image.Resampling.LANCZOS)
-        resized.save(os.path.join(out_dir, f'ic_launcher_{name}.png'), 'PNG')
-
-    print(f"  Android: Created {len(ANDROID_SIZES)} mipmap sizes")
-
-    # Flutter preview icons
-    flutter_dir = os.path.join(project_dir, 'assets', 'icons')
-    os.makedirs(flutter_dir, exist_ok=True)
-    preview = img.resize((120, 120), Image.Resampling.LANCZOS)
-    preview.save(os.path.join(flutter_dir, f'icon_{name}.png'), 'PNG')
-    print(f"  Flutter: Created preview icon")
+    with Image.open(source_path) as img:
+        print(f"  Source: {img.size[0]}x{img.size[1]}")
 
-    # Save 1024x1024 master copy
-    master_dir = os.path.join(base_dir, 'master_icons')
-    os.makedirs(master_dir, exist_ok=True)
-    master = img.resize((1024, 1024), Image.Resampling.LANCZOS)
-    master.save(os.path.join(master_dir, f'{name}_1024.png'), 'PNG')
+    # One plan for every platform plus the 1024x1024 master copy; small
+    # sizes come from DCT-scaled decodes of the JPEG
+    targets = icon_targets(name, base_dir, project_dir)
+    resamples = render_plan.render_file(source_path, targets, save=save)
+    render_plan.write_ios_contents_json(project_dir, name)
+
+    print(f"  iOS: Created {len(render_plan.IOS_SIZES)} sizes + Contents.json")
+    print(f"  Android: Created {len(render_plan.ANDROID_SIZES)} mipmap sizes")
+    print(f"  Flutter: Created preview icon")
+    print(f"  Resamples: {resamples} for {len(targets)} outputs")
+    print()
 
     return True
 
+def process_all_batched(names, base_dir, project_dir):
+    """Decode every master, then resize all icons together per size."""
+    images = {}
+    targets = {}
+    for name in names:
+        source_path = os.path.join(base_dir, 'nano_icons', ICONS[name])
+        if not os.path.exists(source_path):
+            print(f"  Warning: {source_path} not found, skipping")
+            continue
+        images[name] = Image.open(source_path).convert('RGB')
+        targets[name] = icon_targets(name, base_dir, project_dir)
+
+    if images:
+        with write_behind.writer() as save:
+            render_plan.render_batch(images, targets, save=save)
+    for name in images:
+        render_plan.write_ios_contents_json(project_dir, name)
+        print(f"Processed {name}")
+
+    return list(images)
+
 def main():
+    parser = argparse.ArgumentParser(description="Process Nano Banana icons")
+    parser.add_argument('--batched', action='store_true',
+                        help='resize all icons together with the NumPy resampler')
+    parser.add_argument('--force', action='store_true',
+                        help='rebuild every icon, ignoring the build manifest')
+    parallel.add_jobs_argument(parser)
+    quality.add_quality_argument(parser)
+    memory_budget.add_memory_argument(parser)
+    sharding.add_shard_argument(parser)
+    resize_pyramid.add_check_argument(parser)
+    args = parser.parse_args()
+    quality.set_quality(args.quality)
+    memory_budget.set_max_memory(args.max_memory)
+    sharding.set_shard(args.shard)
+
     base_dir = os.path.dirname(os.path.abspath(__file__))
     project_dir = os.path.dirname(base_dir)
 
     print("Processing Nano Banana icons...")
     print(f"Base dir: {base_dir}")
     print(f"Project dir: {project_dir}")
+    names = sharding.select(ICONS)
+    if args.shard:
+        print(sharding.describe(names, ICONS))
     print()
 
-    success_count = 0
-    for name, source_file in ICONS.items():
-        print(f"Processing {name}...")
-        if process_icon(name, source_file, base_dir, project_dir):
-            success_count += 1
+    # Skip icons whose sources, config and outputs are unchanged
+    manifest_file = build_manifest.manifest_path(base_dir)
+    manifest = build_manifest.load_manifest(manifest_file)
+    config = nano_config(args.batched)
+
+    sources = {}
+    stale = []
+    for name in names:
+        source_path = os.path.join(base_dir, 'nano_icons', ICONS[name])
+        sources[name] = build_manifest.relative_paths([source_path], project_dir)
+        if (not args.force and os.path.exists(source_path)
+                and build_manifest.is_up_to_date(manifest, f'nano/{name}',
+                                                 sources[name], config, project_dir)):
+            print(f"{name}: up to date")
+            continue
+        stale.append(name)
+
+    if args.batched:
+        processed = process_all_batched(stale, base_dir, project_dir)
         print()
-
-    print(f"✓ Processed {success_count}/{len(ICONS)} icons")
+    elif parallel.resolve_jobs(args.jobs) == 1:
+        # One write-behind queue, so encoding overlaps the next icon's resizes
+        with write_behind.writer() as save:
+            results = [process_icon(name, ICONS[name], base_dir, project_dir, save)
+                       for name in stale]
+        processed = [name for name, ok in zip(stale, results) if ok]
+    else:
+        results = parallel.run_per_icon(
+            process_icon, [(name, ICONS[name], base_dir, project_dir) for name in stale],
+            args.jobs,
+            memory=[memory_budget.predict_file(
+                        os.path.join(base_dir, 'nano_icons', ICONS[name]), ICON_OPS)
+                    for name in stale])
+        processed = [name for name, ok in zip(stale, results) if ok]
+
+    for name in processed:
+        outputs = build_manifest.relative_paths(icon_outputs(name, base_dir, project_dir),
+                                                project_dir)
+        build_manifest.record(manifest, f'nano/{name}', sources[name], outputs,
+                              config, project_dir)
+    if args.shard:
+        sharding.write_partial(manifest_file, 'nano', manifest,
+                               [(name, f'nano/{name}') for name in ICONS])
+    else:
+        build_manifest.save_manifest(manifest, manifest_file)
+
+    up_to_date = len(names) - len(stale)
+    print(f"✓ Processed {len(processed)}/{len(names)} icons ({up_to_date} up to date)")
+    output_writer.print_summary()
+
+    if args.check_error and processed:
+        # The bounds are measured for release's Lanczos octaves
+        if not quality.is_exact():
+            print(f"\nError check skipped at {quality.QUALITY} quality")
+        elif resize_pyramid.check_error([os.path.join(base_dir, 'nano_icons', ICONS[name])
+                                         for name in processed]):
+            print(f"\n✓ Resize pyramid and DCT-scaled decoding within error bounds")
+        else:
+            print(f"\n✗ Resize error bound exceeded")
+            sys.exit(1)
 
     # Summary
     print("\nGenerated files:")
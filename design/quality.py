@@ -0,0 +1,101 @@
+#!/usr/bin/env python3
+"""
+Quality presets for design iteration.
+    draft    sources reduced 2x on open, bounds detection on a further 2x
+             BOX-reduced copy, BILINEAR resizes, fast PNG compression
+    preview  full-size sources, detection on a 2x BOX-reduced copy,
+             BICUBIC resizes
+    release  full-resolution detection and LANCZOS, the exact output (default)
+
+Draft and preview write the same files at the same sizes, close enough to
+judge margins, thresholds and colours; build manifests and pixel_cache keys
+record the preset, so a later release run rebuilds everything exactly.
+
+Pick a preset with --quality or the ICON_QUALITY environment variable.
+"""
+
+from PIL import Image
+import os
+
+import coarse_bounds
+
+PRESETS = {
+    'draft': {
+        'source_reduce': 2,
+        'detect_reduce': 2,
+        'resample': Image.Resampling.BILINEAR,
+        'pyramid': 'reduce',
+        'compress_level': 1,
+    },
+    'preview': {
+        'source_reduce': 1,
+        'detect_reduce': 2,
+        'resample': Image.Resampling.BICUBIC,
+        'pyramid': 'reduce',
+        'compress_level': 6,
+    },
+    'release': {
+        'source_reduce': 1,
+        'detect_reduce': 1,
+        'resample': Image.Resampling.LANCZOS,
+        'pyramid': 'lanczos',
+        'compress_level': 6,
+    },
+}
+
+QUALITY = os.environ.get('ICON_QUALITY', 'release')
+if QUALITY not in PRESETS:
+    raise ValueError(f"ICON_QUALITY must be one of {', '.join(PRESETS)}, not '{QUALITY}'")
+
+
+def add_quality_argument(parser):
+    """Add the shared --quality option to an argparse parser."""
+    parser.add_argument('--quality', choices=list(PRESETS), default=QUALITY,
+                        help=f'draft / preview trade accuracy for speed while iterating '
+                             f'(default {QUALITY})')
+
+
+def set_quality(name):
+    """Set the preset for this process and any workers it starts."""
+    global QUALITY
+    QUALITY = name
+    os.environ['ICON_QUALITY'] = name
+
+
+def setting(key):
+    """A setting of the current preset."""
+    return PRESETS[QUALITY][key]
+
+
+def is_exact():
+    """True for release, whose output is the exact full-resolution path."""
+    return QUALITY == 'release'
+
+
+def reduce_source(img):
+    """A decoded source at the preset's working resolution."""
+    factor = setting('source_reduce')
+    return img.reduce(factor) if factor > 1 else img
+
+
+def mask_bounds(img, mask_fn):
+    """
+    coarse_bounds.mask_bounds, run on a BOX-reduced copy of img outside
+    release. The bounds are scaled back to img's coordinates, so they are
+    accurate to the reduction factor.
+    """
+    factor = setting('detect_reduce')
+    if factor == 1:
+        return coarse_bounds.mask_bounds(img, mask_fn)
+
+    bounds = coarse_bounds.mask_bounds(img.reduce(factor), mask_fn)
+    return scale_bounds(bounds, factor, img.size) if bounds else None
+
+
+def scale_bounds(bounds, factor, size):
+    """Inclusive bounds found on a copy reduced by factor, in the coordinates of size."""
+    left, top, right, bottom = bounds
+    width, height = size
+    return (left * factor, top * factor,
+            min(right * factor + factor - 1, width - 1),
+            min(bottom * factor + factor - 1, height - 1))
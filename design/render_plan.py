@@ -0,0 +1,232 @@
+#!/usr/bin/env python3
+"""
+Shared render plan for app icon outputs.
+Takes one decoded master plus a list of (pixel_size, output_path) targets,
+resamples each distinct pixel size only once and writes the result to every
+path that needs it (appiconset, mipmap-*, assets/icons, master copies).
+"""
+
+from PIL import Image
+import os
+import json
+
+import output_writer
+import quality
+import resize_pyramid
+
+# iOS icon sizes for iPhone (points, scale)
+IOS_SIZES = [
+    (20, 2),   # 40x40 - Notification 2x
+    (20, 3),   # 60x60 - Notification 3x
+    (29, 2),   # 58x58 - Settings 2x
+    (29, 3),   # 87x87 - Settings 3x
+    (40, 2),   # 80x80 - Spotlight 2x
+    (40, 3),   # 120x120 - Spotlight 3x
+    (60, 2),   # 120x120 - App 2x
+    (60, 3),   # 180x180 - App 3x
+]
+
+# Android mipmap sizes
+ANDROID_SIZES = [
+    (48, 'mipmap-mdpi'),
+    (72, 'mipmap-hdpi'),
+    (96, 'mipmap-xhdpi'),
+    (144, 'mipmap-xxhdpi'),
+    (192, 'mipmap-xxxhdpi'),
+]
+
+# Flutter preview and master copy sizes
+FLUTTER_PREVIEW_SIZE = 120
+MASTER_SIZE = 1024
+
+# Filename patterns used for the appiconset PNGs
+IOS_FILENAME = 'icon_{px}.png'
+IOS_FILENAME_LEGACY = 'Icon-{px}.png'
+
+
+def ios_folder(project_dir, name):
+    """Path of the alternate icon appiconset for an icon."""
+    return os.path.join(project_dir, 'ios', 'Runner', 'Assets.xcassets',
+                        f'AppIcon-{name}.appiconset')
+
+
+def ios_targets(project_dir, name, filename=IOS_FILENAME):
+    """Targets for the iOS appiconset."""
+    folder = ios_folder(project_dir, name)
+    return [(size * scale, os.path.join(folder, filename.format(px=size * scale)))
+            for size, scale in IOS_SIZES]
+
+
+def android_targets(project_dir, name):
+    """Targets for the Android mipmap folders."""
+    android_res = os.path.join(project_dir, 'android', 'app', 'src', 'main', 'res')
+    return [(px, os.path.join(android_res, folder, f'ic_launcher_{name}.png'))
+            for px, folder in ANDROID_SIZES]
+
+
+def flutter_targets(project_dir, name):
+    """Target for the Flutter preview icon."""
+    flutter_dir = os.path.join(project_dir, 'assets', 'icons')
+    return [(FLUTTER_PREVIEW_SIZE, os.path.join(flutter_dir, f'icon_{name}.png'))]
+
+
+def master_targets(base_dir, name, folder='master_icons'):
+    """Target for the 1024x1024 master copy."""
+    return [(MASTER_SIZE, os.path.join(base_dir, folder, f'{name}_{MASTER_SIZE}.png'))]
+
+
+def platform_targets(project_dir, name, ios_filename=IOS_FILENAME):
+    """iOS, Android and Flutter targets for one icon."""
+    return (ios_targets(project_dir, name, ios_filename)
+            + android_targets(project_dir, name)
+            + flutter_targets(project_dir, name))
+
+
+def plan_config(pyramid=None):
+    """Effective render settings, recorded in build manifests."""
+    config = {
+        'ios_sizes': IOS_SIZES,
+        'android_sizes': ANDROID_SIZES,
+        'flutter_preview_size': FLUTTER_PREVIEW_SIZE,
+        'master_size': MASTER_SIZE,
+        'resample': quality.setting('resample').name.lower(),
+        'pyramid': pyramid or quality.setting('pyramid'),
+        'min_level_ratio': resize_pyramid.MIN_LEVEL_RATIO,
+        'jpeg_draft_scales': resize_pyramid.DRAFT_SCALES,
+    }
+    if not quality.is_exact():
+        config['quality'] = quality.QUALITY
+    return config
+
+
+def build_plan(targets):
+    """
+    Group targets by pixel size.
+    Returns a list of (pixel_size, [paths]) from largest to smallest, with
+    duplicate paths removed.
+    """
+    plan = {}
+    for px, path in targets:
+        paths = plan.setdefault(px, [])
+        if path not in paths:
+            paths.append(path)
+    return sorted(plan.items(), reverse=True)
+
+
+def render(img, targets, resample=None, pyramid=None, post=None,
+           save=output_writer.write_png):
+    """
+    Resample img once per distinct size and save it to every target path.
+    Sizes are derived through a resize pyramid (see resize_pyramid.py);
+    pass pyramid='direct' to resample every size directly from img.
+    resample and pyramid default to the quality preset (LANCZOS through
+    LANCZOS octaves for release).
+    post, if given, is applied to each resized image before it is saved
+    (e.g. a point-wise colour op moved after the resize, see color_plan.py).
+    save(img, path) writes each output; by default inline, skipping files
+    whose pixels are unchanged (output_writer), or e.g. a write_behind.writer
+    queue.
+    Returns the number of resamples performed.
+    """
+    plan = build_plan(targets)
+    resized_by_size, resamples = resize_sizes(img, [px for px, _ in plan], resample, pyramid)
+
+    if post:
+        resized_by_size = {px: post(resized) for px, resized in resized_by_size.items()}
+
+    for px, paths in plan:
+        for path in paths:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            save(resized_by_size[px], path)
+
+    return resamples
+
+
+def resize_sizes(img, sizes, resample=None, pyramid=None):
+    """
+    img resampled to every square size in sizes, as render does (resample
+    and pyramid default to the quality preset).
+    Returns (dict of px -> Image, number of resamples performed).
+    """
+    if resample is None:
+        resample = quality.setting('resample')
+    pyramid = pyramid or quality.setting('pyramid')
+
+    if pyramid != 'direct':
+        return resize_pyramid.resize_all(img, sizes, pyramid, resample)
+
+    resized_by_size, resamples = {}, 0
+    for px in sizes:
+        if img.size == (px, px):
+            resized_by_size[px] = img
+        else:
+            resized_by_size[px] = img.resize((px, px), resample)
+            resamples += 1
+    return resized_by_size, resamples
+
+
+def render_file(path, targets, resample=None, pyramid=None, post=None,
+                save=output_writer.write_png):
+    """
+    render for a source file, decoded as RGB. A JPEG is decoded once per
+    DCT scale some target needs (see resize_pyramid.draft_scale), so
+    libjpeg does the coarse reduction instead of a full decode and LANCZOS
+    octaves; other formats are decoded once in full.
+    Returns the number of resamples performed.
+    """
+    with Image.open(path) as img:
+        source_size, is_jpeg = img.size, img.format == 'JPEG'
+    scales = {px: resize_pyramid.draft_scale(source_size, px) if is_jpeg else 1
+              for px, _ in targets}
+
+    resamples = 0
+    for scale in sorted(set(scales.values())):
+        group = [(px, target) for px, target in targets if scales[px] == scale]
+        resamples += render(resize_pyramid.open_draft(path, scale), group,
+                            resample, pyramid, post, save)
+    return resamples
+
+
+def render_batch(images, targets, save=output_writer.write_png):
+    """
+    Render several icons at once with the batched NumPy resampler.
+    images: dict of name -> master, targets: dict of name -> target list.
+    All masters must share one size and mode (RGB or L).
+    Returns the number of batched resize passes performed.
+    """
+    import batch_resample
+
+    names = list(images)
+    plans = {name: build_plan(targets[name]) for name in names}
+    sizes = sorted({px for plan in plans.values() for px, _ in plan}, reverse=True)
+
+    resized = batch_resample.resize_all_batched([images[name] for name in names], sizes)
+
+    for idx, name in enumerate(names):
+        for px, paths in plans[name]:
+            for path in paths:
+                os.makedirs(os.path.dirname(path), exist_ok=True)
+                save(resized[px][idx], path)
+
+    return len(sizes)
+
+
+def create_ios_contents_json(filename=IOS_FILENAME):
+    """Create Contents.json for an iOS alternate icon."""
+    images = []
+    for size, scale in IOS_SIZES:
+        images.append({
+            "size": f"{size}x{size}",
+            "idiom": "iphone",
+            "filename": filename.format(px=size * scale),
+            "scale": f"{scale}x"
+        })
+    return {"images": images, "info": {"version": 1, "author": "xcode"}}
+
+
+def write_ios_contents_json(project_dir, name, filename=IOS_FILENAME):
+    """Write Contents.json into the icon's appiconset."""
+    folder = ios_folder(project_dir, name)
+    os.makedirs(folder, exist_ok=True)
+    text = json.dumps(create_ios_contents_json(filename), indent=2)
+    output_writer.write_bytes(os.path.join(folder, 'Contents.json'), text.encode('utf-8'))
@@ -0,0 +1,273 @@
+#!/usr/bin/env python3
+"""
+Resize pyramid for icon downscaling.
+Instead of running LANCZOS from the full-resolution master for every target,
+the master is halved into octaves (1024 -> 512 -> 256 -> ...) and each final
+size is resampled from the smallest octave that is still at least twice its
+size. Kernel cost then scales with the output size rather than the master size.
+
+JPEG sources can skip the first octaves altogether: libjpeg decodes at 1/2,
+1/4 or 1/8 scale in the DCT domain (Image.draft), so each size is resampled
+from the smallest scaled decode that is still MIN_LEVEL_RATIO times its size
+(see draft_scale and render_plan.render_file).
+
+check_error compares both against the direct LANCZOS and full-decode paths
+and reports any source past MAX_ERROR / MAX_MEAN_ERROR. process_nano_icons
+runs it on the icons it rebuilds with --check-error (or ICON_CHECK_ERROR=1,
+e.g. on CI) and fails the build if a bound is exceeded. Run directly to
+check, with timings:
+    python resize_pyramid.py [image ...]
+"""
+
+from PIL import Image, ImageChops, ImageStat
+import os
+import sys
+import time
+
+# Final sizes are taken from a level at least this many times larger
+MIN_LEVEL_RATIO = 2
+
+# Error bound against the direct LANCZOS path (per-channel, 0-255).
+# Measured over design/nano_icons with 'lanczos' octaves: worst single pixel 17
+# (on a hard edge), worst mean 0.41.
+MAX_ERROR = 20
+MAX_MEAN_ERROR = 1.0
+
+# Reduced DCT scales libjpeg can decode at directly.
+# Against the full-decode pyramid over design/nano_icons: worst single pixel
+# 11, worst mean 0.71, within the same bounds.
+DRAFT_SCALES = (2, 4, 8)
+
+CHECK_ERROR = os.environ.get('ICON_CHECK_ERROR', '0') != '0'
+
+
+def add_check_argument(parser):
+    """Add the shared --check-error option to an argparse parser."""
+    parser.add_argument('--check-error', action='store_true', default=CHECK_ERROR,
+                        help='check the resize pyramid and DCT-scaled decoding of the '
+                             'rebuilt sources against their error bounds, and fail if '
+                             'exceeded (release quality only)')
+
+
+def build_pyramid(img, smallest, method='lanczos'):
+    """
+    Halve img into octaves until the next level would be smaller than
+    MIN_LEVEL_RATIO * smallest. Returns levels from largest to smallest.
+    method: 'lanczos' for an exact LANCZOS halving, 'reduce' for Image.reduce(2)
+    """
+    levels = [img]
+    while True:
+        width, height = levels[-1].size
+        if min(width, height) // 2 < MIN_LEVEL_RATIO * smallest:
+            break
+        if method == 'reduce':
+            levels.append(levels[-1].reduce(2))
+        else:
+            levels.append(levels[-1].resize((width // 2, height // 2),
+                                            Image.Resampling.LANCZOS))
+    return levels
+
+
+def level_for(levels, px):
+    """Smallest level that is still at least MIN_LEVEL_RATIO times px."""
+    for level in reversed(levels):
+        if min(level.size) >= MIN_LEVEL_RATIO * px:
+            return level
+    return levels[0]
+
+
+def resize_all(img, sizes, method='lanczos', resample=Image.Resampling.LANCZOS):
+    """
+    Resize img to every square size in sizes through the pyramid.
+    Returns (dict of px -> Image, number of resamples performed).
+    """
+    sizes = sorted(set(sizes), reverse=True)
+    if not sizes:
+        return {}, 0
+
+    levels = build_pyramid(img, sizes[-1], method)
+    resamples = len(levels) - 1
+
+    results = {}
+    for px in sizes:
+        if img.size == (px, px):
+            results[px] = img
+            continue
+        source = level_for(levels, px)
+        results[px] = source.resize((px, px), resample)
+        resamples += 1
+
+    return results, resamples
+
+
+def draft_scale(source_size, px):
+    """
+    Largest DRAFT_SCALES factor whose decode of a source_size image is still
+    at least MIN_LEVEL_RATIO times px, or 1 for a full decode.
+    """
+    for scale in reversed(DRAFT_SCALES):
+        # libjpeg rounds scaled dimensions up
+        if min(-(-side // scale) for side in source_size) >= MIN_LEVEL_RATIO * px:
+            return scale
+    return 1
+
+
+def draft_groups(source_size, sizes):
+    """Sizes grouped by the draft_scale they are resampled from: dict of scale -> [px]."""
+    groups = {}
+    for px in sorted(set(sizes), reverse=True):
+        groups.setdefault(draft_scale(source_size, px), []).append(px)
+    return groups
+
+
+def open_draft(path, scale=1):
+    """
+    Decode an image as RGB; a JPEG at 1/scale of its size via libjpeg's
+    scaled DCT. Other formats are always decoded in full.
+    """
+    img = Image.open(path)
+    if scale > 1 and img.format == 'JPEG':
+        width, height = img.size
+        img.draft('RGB', (-(-width // scale), -(-height // scale)))
+    return img.convert('RGB')
+
+
+def measure_error(img, sizes, method='lanczos'):
+    """
+    Compare the pyramid against direct LANCZOS from img.
+    Returns dict of px -> (max abs difference, mean abs difference).
+    """
+    pyramid, _ = resize_all(img, sizes, method)
+    errors = {}
+    for px in sorted(set(sizes)):
+        direct = img.resize((px, px), Image.Resampling.LANCZOS)
+        diff = ImageChops.difference(direct, pyramid[px])
+        stat = ImageStat.Stat(diff)
+        errors[px] = (max(high for _, high in stat.extrema),
+                      sum(stat.mean) / len(stat.mean))
+    return errors
+
+
+def measure_draft_error(path, sizes):
+    """
+    Compare DCT-scaled decoding (as in render_plan.render_file) against the
+    pyramid from a full decode.
+    Returns dict of px -> (max abs difference, mean abs difference).
+    """
+    full = open_draft(path)
+    reference, _ = resize_all(full, sizes)
+    errors = {}
+    for scale, group in draft_groups(full.size, sizes).items():
+        resized, _ = resize_all(open_draft(path, scale), group)
+        for px in group:
+            diff = ImageChops.difference(reference[px], resized[px])
+            stat = ImageStat.Stat(diff)
+            errors[px] = (max(high for _, high in stat.extrema),
+                          sum(stat.mean) / len(stat.mean))
+    return errors
+
+
+def _worst(errors):
+    """(max, mean) error over every size."""
+    return (max(e[0] for e in errors.values()), max(e[1] for e in errors.values()))
+
+
+def within_bounds(error):
+    """True if a (max, mean) error is within MAX_ERROR and MAX_MEAN_ERROR."""
+    return error[0] <= MAX_ERROR and error[1] <= MAX_MEAN_ERROR
+
+
+def platform_sizes():
+    """Every distinct platform size."""
+    import render_plan
+
+    return sorted({px for px, _ in render_plan.platform_targets('', 'x')})
+
+
+def measure_bounds(path, sizes):
+    """
+    Worst (max, mean) error of the image at path: dict with 'pyramid' (against
+    direct LANCZOS) and, for a JPEG, 'dct' (against a full decode).
+    """
+    bounds = {'pyramid': _worst(measure_error(Image.open(path).convert('RGB'), sizes))}
+    if Image.open(path).format == 'JPEG':
+        bounds['dct'] = _worst(measure_draft_error(path, sizes))
+    return bounds
+
+
+def check_error(paths, sizes=None):
+    """
+    Check every image's pyramid and DCT-scaled error against the bounds,
+    printing a line for each one exceeded. Returns True if all are within.
+    """
+    sizes = sizes or platform_sizes()
+    ok = True
+    for path in paths:
+        for kind, (worst, worst_mean) in measure_bounds(path, sizes).items():
+            if not within_bounds((worst, worst_mean)):
+                label = 'pyramid' if kind == 'pyramid' else 'DCT-scaled'
+                print(f"  ✗ {os.path.basename(path)}: {label} error {worst} "
+                      f"(mean {worst_mean:.2f}) exceeds bound ({MAX_ERROR}, {MAX_MEAN_ERROR})")
+                ok = False
+    return ok
+
+
+def main(paths):
+    sizes = platform_sizes()
+
+    ok = True
+    for path in paths:
+        img = Image.open(path).convert('RGB')
+        print(f"{os.path.basename(path)} ({img.size[0]}x{img.size[1]})")
+
+        start = time.perf_counter()
+        for px in sizes:
+            img.resize((px, px), Image.Resampling.LANCZOS)
+        direct_ms = (time.perf_counter() - start) * 1000
+
+        start = time.perf_counter()
+        resize_all(img, sizes)
+        pyramid_ms = (time.perf_counter() - start) * 1000
+
+        bounds = measure_bounds(path, sizes)
+        worst, worst_mean = bounds['pyramid']
+        print(f"  direct: {direct_ms:.1f}ms  pyramid: {pyramid_ms:.1f}ms  "
+              f"max error: {worst}  mean error: {worst_mean:.2f}")
+
+        if not within_bounds(bounds['pyramid']):
+            print(f"  ✗ Error exceeds bound ({MAX_ERROR}, {MAX_MEAN_ERROR})")
+            ok = False
+
+        if 'dct' not in bounds:
+            continue
+
+        start = time.perf_counter()
+        resize_all(open_draft(path), sizes)
+        full_ms = (time.perf_counter() - start) * 1000
+
+        start = time.perf_counter()
+        for scale, group in draft_groups(img.size, sizes).items():
+            resize_all(open_draft(path, scale), group)
+        draft_ms = (time.perf_counter() - start) * 1000
+
+        worst, worst_mean = bounds['dct']
+        print(f"  full decode: {full_ms:.1f}ms  DCT-scaled: {draft_ms:.1f}ms  "
+              f"max error: {worst}  mean error: {worst_mean:.2f}")
+
+        if not within_bounds(bounds['dct']):
+            print(f"  ✗ DCT-scaled error exceeds bound ({MAX_ERROR}, {MAX_MEAN_ERROR})")
+            ok = False
+
+    return ok
+
+
+if __name__ == '__main__':
+    base_dir = os.path.dirname(os.path.abspath(__file__))
+    paths = sys.argv[1:]
+    if not paths:
+        nano_dir = os.path.join(base_dir, 'nano_icons')
+        paths = [os.path.join(nano_dir, f) for f in sorted(os.listdir(nano_dir))]
+
+    if not main(paths):
+        sys.exit(1)
+    print("\n✓ Pyramid and DCT-scaled decoding within error bound")
@@ -0,0 +1,235 @@
+#!/usr/bin/env python3
+"""
+Sharded generator runs for several build agents.
+    python process_nano_icons.py --shard 1/4      (agent 1 of 4, and so on)
+    python sharding.py merge .iconbuild.*.shard-*.json
+
+Icons are assigned to shards by a stable hash of their name (SHA-256, not
+Python's per-process salted hash), so every agent computes the same
+partition without coordinating: the names are ordered by hash and dealt
+round-robin, so shards differ by at most one icon even for a nine-icon
+table (hash modulo n would often leave one agent with most of them).
+
+A sharded run processes only its icons and writes their build-manifest
+entries to a partial manifest next to the build manifest
+(.iconbuild.<generator>.shard-1of4.json) instead of the manifest itself.
+
+merge combines the partials into the build manifest. It fails, without
+writing, if a shard is missing or duplicated, if an icon was recorded by
+no shard or by several, or if an output was recorded by two icons or is
+missing on disk (checked against its recorded hash). Once merged, the partials
+are deleted, so a later run with a different shard count does not pick up
+this run's partials.
+
+    --shard 2/4   (or ICON_SHARD=2/4; shards are numbered from 1)
+"""
+
+import argparse
+import contextlib
+import glob
+import hashlib
+import json
+import os
+import sys
+
+import build_manifest
+
+SHARD = os.environ.get('ICON_SHARD', '')
+
+
+def parse_shard(text):
+    """(index, count) of an 'i/n' shard, or None for an empty string."""
+    if not text:
+        return None
+    try:
+        index, count = (int(part) for part in text.split('/'))
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"shard must look like i/n, not {text!r}")
+    if not 1 <= index <= count:
+        raise argparse.ArgumentTypeError(
+            f"shard {text} is not between 1/{count} and {count}/{count}")
+    return index, count
+
+
+def add_shard_argument(parser):
+    """Add the shared --shard option to an argparse parser."""
+    parser.add_argument('--shard', type=parse_shard, default=parse_shard(SHARD), metavar='I/N',
+                        help='only process the icons of shard I of N and write a partial '
+                             'manifest (merge with sharding.py merge)')
+
+
+def set_shard(shard):
+    """Set this process's shard, (index, count) or None."""
+    global SHARD
+    SHARD = f'{shard[0]}/{shard[1]}' if shard else ''
+    os.environ['ICON_SHARD'] = SHARD
+
+
+def name_hash(name):
+    """Stable hash of an icon name."""
+    return hashlib.sha256(name.encode('utf-8')).hexdigest()
+
+
+def assign(names, count):
+    """Shard (1..count) of each name: dict of name -> shard."""
+    ordered = sorted(names, key=name_hash)
+    return {name: rank % count + 1 for rank, name in enumerate(ordered)}
+
+
+def select(names):
+    """The names in this process's shard, in order (every name when unsharded)."""
+    shard = parse_shard(SHARD)
+    if shard is None:
+        return list(names)
+    index, count = shard
+    shards = assign(names, count)
+    return [name for name in names if shards[name] == index]
+
+
+def describe(selected, names):
+    """Short note of the shard's share, for the scripts' headers."""
+    return f"Shard {SHARD}: {len(selected)} of {len(names)} icons"
+
+
+def partial_path(manifest_file, generator, shard):
+    """Partial manifest of one generator's shard, next to the build manifest."""
+    root, ext = os.path.splitext(manifest_file)
+    index, count = shard
+    return f'{root}.{generator}.shard-{index}of{count}{ext}'
+
+
+def write_partial(manifest_file, generator, manifest, keys):
+    """
+    Write this shard's entries of manifest as a partial manifest.
+    keys are the generator's manifest keys for every icon, in all shards;
+    merge uses them to find icons that no shard recorded.
+    """
+    index, count = parse_shard(SHARD)
+    names = dict(keys)
+    mine = set(select(names))
+    partial = {
+        'version': build_manifest.MANIFEST_VERSION,
+        'items': {key: manifest['items'][key] for name, key in keys
+                  if name in mine and key in manifest['items']},
+        'shard': {'generator': generator, 'index': index, 'count': count,
+                  'keys': sorted(key for _, key in keys)},
+    }
+    path = partial_path(manifest_file, generator, (index, count))
+    build_manifest.save_manifest(partial, path)
+    print(f"Partial manifest: {os.path.basename(path)} ({len(partial['items'])} icons)")
+    return path
+
+
+def _check_outputs(items, root):
+    """Outputs recorded by several items, and outputs missing or changed on disk."""
+    problems = []
+    owners = {}
+    for key, item in sorted(items.items()):
+        for rel_path, entry in item['outputs'].items():
+            owners.setdefault(rel_path, []).append(key)
+            path = os.path.join(root, rel_path)
+            if not os.path.exists(path):
+                problems.append(f"missing output {rel_path} ({key})")
+            elif build_manifest.file_hash(path) != entry.get('hash'):
+                problems.append(f"output {rel_path} differs from what {key} recorded")
+    for rel_path, keys in sorted(owners.items()):
+        if len(keys) > 1:
+            problems.append(f"duplicate output {rel_path} ({', '.join(keys)})")
+    return problems
+
+
+def merge(paths, manifest_file, root, check_files=True):
+    """
+    Merge partial manifests into the build manifest at manifest_file.
+    Returns the problems found; the manifest is only written, and the
+    partials deleted, if there are none.
+    """
+    problems = []
+    generators = {}
+    for path in paths:
+        with open(path) as f:
+            partial = json.load(f)
+        shard = partial.get('shard')
+        if partial.get('version') != build_manifest.MANIFEST_VERSION or not shard:
+            problems.append(f"{path} is not a partial manifest")
+            continue
+        generators.setdefault(shard['generator'], []).append((path, partial))
+
+    items = {}
+    for generator, partials in sorted(generators.items()):
+        counts = {partial['shard']['count'] for _, partial in partials}
+        if len(counts) > 1:
+            problems.append(f"{generator}: partials from runs with {sorted(counts)} shards")
+            continue
+        count = counts.pop()
+
+        seen = {}
+        for path, partial in partials:
+            seen.setdefault(partial['shard']['index'], []).append(path)
+        for index in range(1, count + 1):
+            if index not in seen:
+                problems.append(f"{generator}: shard {index}/{count} missing")
+            elif len(seen[index]) > 1:
+                problems.append(f"{generator}: shard {index}/{count} given twice")
+
+        owners = {}
+        expected = set()
+        for path, partial in partials:
+            expected.update(partial['shard']['keys'])
+            for key, item in partial['items'].items():
+                owners.setdefault(key, []).append(path)
+                items[key] = item
+        for key in sorted(expected):
+            if key not in owners:
+                problems.append(f"{generator}: {key} recorded by no shard")
+        for key, owner_paths in sorted(owners.items()):
+            if len(owner_paths) > 1:
+                problems.append(f"{generator}: {key} recorded by "
+                                + ', '.join(os.path.basename(path) for path in owner_paths))
+
+    if check_files:
+        problems.extend(_check_outputs(items, root))
+
+    if not problems:
+        manifest = build_manifest.load_manifest(manifest_file)
+        manifest['items'].update(items)
+        build_manifest.save_manifest(manifest, manifest_file)
+        for path in paths:
+            with contextlib.suppress(OSError):
+                os.remove(path)
+    return problems
+
+
+def main():
+    base_dir = os.path.dirname(os.path.abspath(__file__))
+    default_manifest = build_manifest.manifest_path(base_dir)
+
+    parser = argparse.ArgumentParser(description="Merge the partial manifests of a sharded run")
+    parser.add_argument('command', choices=['merge'])
+    parser.add_argument('partials', nargs='*',
+                        help='partial manifests (default: every one next to the manifest)')
+    parser.add_argument('--manifest', default=default_manifest,
+                        help='build manifest to merge into (default: design/.iconbuild.json)')
+    parser.add_argument('--skip-file-check', action='store_true',
+                        help="don't check that the recorded outputs are on disk")
+    args = parser.parse_args()
+
+    root, ext = os.path.splitext(args.manifest)
+    paths = args.partials or sorted(glob.glob(f'{glob.escape(root)}.*.shard-*{ext}'))
+    if not paths:
+        print("No partial manifests found")
+        sys.exit(1)
+
+    project_dir = os.path.dirname(base_dir)
+    problems = merge(paths, args.manifest, project_dir, not args.skip_file_check)
+    if problems:
+        for problem in problems:
+            print(f"✗ {problem}")
+        print(f"\nNot merged: {len(problems)} problems in {len(paths)} partial manifests")
+        sys.exit(1)
+    print(f"✓ Merged {len(paths)} partial manifests into {os.path.basename(args.manifest)} "
+          f"and removed them")
+
+
+if __name__ == '__main__':
+    main()
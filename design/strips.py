@@ -0,0 +1,252 @@
+#!/usr/bin/env python3
+"""
+Strip-wise (tiled) processing for large images.
+The array helpers in image_array.py build several full-size temporaries per
+scan (an int32 difference per channel, a float64 distance, a mask), about 25
+bytes per pixel on top of the image itself. In strip mode the bounds scans,
+background replacement and Lanczos resizes work on horizontal strips of
+STRIP_ROWS rows instead, so that working set is proportional to the strip,
+and the results are the same as the whole-image path.
+
+That bounds the working set of an image already in memory. A large source
+file is not decoded whole: file_strips decodes it top to bottom with libvips
+(sequential access, through backend_vips), and crop_file keeps only the rows
+and columns of one region, so process_grid_icons in strip mode reads each
+grid cell on its own. Without pyvips, file_strips falls back to decoding
+the file whole with Pillow.
+
+Resizing reads each strip with the extra rows the Lanczos kernel needs
+(3 source pixels either side, scaled by the reduction factor) and uses
+Pillow's own fixed-point coefficients, so every output row is computed
+from exactly the pixels and weights of a whole-image resize.
+
+Strip mode is off by default:
+    ICON_STRIP_ROWS=512   (or --strip-rows 512 in process_grid_icons.py)
+"""
+
+from PIL import Image
+import math
+import os
+
+import numpy as np
+
+import image_array
+
+# Rows per strip; 0 processes the whole image at once
+STRIP_ROWS = int(os.environ.get('ICON_STRIP_ROWS', 0))
+
+# Pillow's Lanczos kernel support (source pixels at scale 1) and the
+# fixed-point precision of its 8-bit resampler
+LANCZOS_SUPPORT = 3.0
+PRECISION_BITS = 32 - 8 - 2
+
+
+def add_strip_argument(parser):
+    """Add the shared --strip-rows option to an argparse parser."""
+    parser.add_argument('--strip-rows', type=int, default=STRIP_ROWS,
+                        help='process large images in strips of this many rows '
+                             '(bounded memory, same output; 0 = whole image)')
+
+
+def set_strip_rows(rows):
+    """Set the strip height for this process and any workers it starts."""
+    global STRIP_ROWS
+    STRIP_ROWS = max(0, rows)
+    os.environ['ICON_STRIP_ROWS'] = str(STRIP_ROWS)
+
+
+def row_ranges(height, rows=None):
+    """(top, bottom) row ranges covering height, one per strip."""
+    rows = STRIP_ROWS if rows is None else rows
+    if not rows or rows >= height:
+        return [(0, height)]
+    return [(top, min(top + rows, height)) for top in range(0, height, rows)]
+
+
+def rgb_strips(img, rows=None):
+    """
+    Yield (top, pixels) for each strip of img, pixels being an (h, W, 3)
+    array. Only one strip is converted to an array at a time.
+    """
+    ranges = row_ranges(img.size[1], rows)
+    if len(ranges) == 1:
+        yield 0, image_array.rgb_array(img)
+        return
+    for top, bottom in ranges:
+        yield top, image_array.rgb_array(img.crop((0, top, img.size[0], bottom)))
+
+
+def file_size(path):
+    """(width, height) of an image file, read from its header."""
+    with Image.open(path) as img:
+        return img.size
+
+
+def file_strips(path, rows=None):
+    """
+    Yield (top, pixels) for each strip of the image file at path, as RGB
+    arrays, decoding the file top to bottom (with libvips if installed).
+    Stopping early stops the decode.
+    """
+    rows = rows or STRIP_ROWS or file_size(path)[1]
+    try:
+        import backend_vips
+    except (ImportError, OSError):
+        yield from rgb_strips(Image.open(path).convert('RGB'), rows)
+        return
+    yield from backend_vips.read_strips(path, rows)
+
+
+def crop_file(path, box, rows=None):
+    """
+    Image.open(path).convert('RGB').crop(box) for a box inside the image,
+    read strip by strip: only the box and one strip are in memory, and the
+    decode stops at the box's bottom row.
+    """
+    left, top, right, bottom = box
+    pixels = np.empty((bottom - top, right - left, 3), dtype=np.uint8)
+    for strip_top, strip in file_strips(path, rows):
+        strip_bottom = strip_top + strip.shape[0]
+        first, last = max(top, strip_top), min(bottom, strip_bottom)
+        if first < last:
+            pixels[first - top:last - top] = strip[first - strip_top:last - strip_top, left:right]
+        if strip_bottom >= bottom:
+            break
+    return image_array.to_image(pixels)
+
+
+def mask_profiles(img, mask_fn, col_band=None, row_band=None, rows=None):
+    """
+    Column and row profiles of mask_fn(pixels), built strip by strip.
+    Returns (cols, rows): cols[x] is True if any pixel of column x is set
+    (only counting rows in col_band, a (top, bottom) range, if given), and
+    rows[y] likewise for row y (only counting columns in row_band).
+    """
+    width, height = img.size
+    col_top, col_bottom = col_band or (0, height)
+    row_left, row_right = row_band or (0, width)
+
+    cols = np.zeros(width, dtype=bool)
+    row_hits = np.zeros(height, dtype=bool)
+    for top, pixels in rgb_strips(img, rows):
+        mask = mask_fn(pixels)
+        bottom = top + mask.shape[0]
+        band = mask[max(col_top - top, 0):max(min(col_bottom, bottom) - top, 0)]
+        cols |= band.any(axis=0)
+        row_hits[top:bottom] = mask[:, row_left:row_right].any(axis=1)
+    return cols, row_hits
+
+
+def mask_bounds(img, mask_fn, rows=None):
+    """
+    Inclusive (left, top, right, bottom) of the pixels where mask_fn(pixels)
+    is True, or None; the strip-wise image_array.mask_bounds.
+    """
+    cols, row_hits = mask_profiles(img, mask_fn, rows=rows)
+    if not cols.any():
+        return None
+    return (image_array.first_true(cols, 0), image_array.first_true(row_hits, 0),
+            image_array.first_true(cols, 0, reverse=True),
+            image_array.first_true(row_hits, 0, reverse=True))
+
+
+def fill_where(pixels, mask_fn, color, rows=None):
+    """Set pixels where mask_fn(pixels) is True to color, in place, strip by strip."""
+    for top, bottom in row_ranges(pixels.shape[0], rows):
+        strip = pixels[top:bottom]
+        strip[mask_fn(strip)] = color
+    return pixels
+
+
+def _sinc(x):
+    if x == 0.0:
+        return 1.0
+    x = x * math.pi
+    return math.sin(x) / x
+
+
+def _lanczos(x):
+    if -LANCZOS_SUPPORT <= x < LANCZOS_SUPPORT:
+        return _sinc(x) * _sinc(x / LANCZOS_SUPPORT)
+    return 0.0
+
+
+_coeffs_cache = {}
+
+
+def lanczos_coeffs(in_size, out_size):
+    """
+    Pillow's fixed-point Lanczos coefficients for a 1-D resample, as
+    (first source row, (out_size, taps) int64 weights) arrays. Mirrors
+    precompute_coeffs and normalize_coeffs_8bpc in Pillow's Resample.c,
+    so applying them reproduces Image.resize bit for bit.
+    """
+    key = (in_size, out_size)
+    if key in _coeffs_cache:
+        return _coeffs_cache[key]
+
+    scale = in_size / out_size
+    filterscale = max(scale, 1.0)
+    support = LANCZOS_SUPPORT * filterscale
+    taps = int(math.ceil(support)) * 2 + 1
+
+    first = np.zeros(out_size, dtype=np.int64)
+    weights = np.zeros((out_size, taps), dtype=np.int64)
+    for out in range(out_size):
+        center = (out + 0.5) * scale
+        xmin = max(int(center - support + 0.5), 0)
+        xmax = min(int(center + support + 0.5), in_size) - xmin
+        k = [_lanczos((x + xmin - center + 0.5) / filterscale) for x in range(xmax)]
+        total = sum(k)
+        first[out] = xmin
+        for x, w in enumerate(k):
+            if total != 0.0:
+                w /= total
+            weights[out, x] = int(w * (1 << PRECISION_BITS) + (0.5 if w >= 0 else -0.5))
+
+    _coeffs_cache[key] = first, weights
+    return first, weights
+
+
+def resize(img, size, resample=Image.Resampling.LANCZOS, rows=None):
+    """
+    img.resize(size, resample), computed in strips of about rows source
+    rows, with the same output.
+    The horizontal pass is row by row, so Pillow runs it on each strip. The
+    vertical pass uses Pillow's own coefficients (see lanczos_coeffs), and
+    each strip reads the rows its kernel windows reach above and below it.
+    """
+    rows = STRIP_ROWS if rows is None else rows
+    width, height = img.size
+    out_w, out_h = size
+    if (not rows or rows >= height or resample != Image.Resampling.LANCZOS
+            or img.mode not in ('RGB', 'L') or out_h == height):
+        return img.resize(size, resample)
+
+    first, weights = lanczos_coeffs(height, out_h)
+    taps = weights.shape[1]
+    out_rows = max(1, int(rows * out_h / height))
+
+    result = np.empty((out_h, out_w) + ((3,) if img.mode == 'RGB' else ()), dtype=np.uint8)
+    for out_top in range(0, out_h, out_rows):
+        out_bottom = min(out_top + out_rows, out_h)
+        # Source rows reached by the kernels of this strip's output rows
+        src_top = int(first[out_top])
+        src_bottom = min(int(first[out_bottom - 1]) + taps, height)
+
+        strip = img.crop((0, src_top, width, src_bottom))
+        if out_w != width:
+            strip = strip.resize((out_w, src_bottom - src_top), resample)
+        pixels = np.asarray(strip).astype(np.int64)
+
+        acc = np.full((out_bottom - out_top,) + pixels.shape[1:], 1 << (PRECISION_BITS - 1),
+                      dtype=np.int64)
+        offsets = first[out_top:out_bottom] - src_top
+        extra = (1,) * (pixels.ndim - 1)
+        for tap in range(taps):
+            # Taps past a window's end have zero weight; clamp their row index
+            source = np.minimum(offsets + tap, pixels.shape[0] - 1)
+            acc += pixels[source] * weights[out_top:out_bottom, tap].reshape((-1,) + extra)
+        result[out_top:out_bottom] = np.clip(acc >> PRECISION_BITS, 0, 255)
+
+    return image_array.to_image(result, img.mode)
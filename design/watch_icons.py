@@ -0,0 +1,240 @@
+#!/usr/bin/env python3
+"""
+Watch mode: regenerate an icon's outputs as soon as its source is saved.
+    python watch_icons.py            (or python -m iconkit watch)
+
+Watched sources:
+    nano_icons/<file>      the process_nano_icons.ICONS sources
+    canva_icons/<name>.png a single Canva export of a grid icon, fixed with
+                           fix_icon_corners_v2 before rendering
+
+Only the icon whose source changed is regenerated. Changes are picked up
+with inotify on Linux, or by polling (--poll, or where inotify is not
+available), and debounced: an icon is processed once its source has not
+changed for --debounce seconds. The process stays warm, so a save is not
+paying for interpreter start-up and imports, and it keeps the content hash
+of every source and the fixed Canva icons in memory: a save that does not
+change a file's bytes is skipped, and re-saving an earlier version (undo)
+reuses its fixed icon. A save that cannot be processed (e.g. a file still
+being written) is reported and the icon is regenerated on its next save.
+"""
+
+from PIL import Image
+import argparse
+import collections
+import ctypes
+import ctypes.util
+import hashlib
+import os
+import select
+import struct
+import sys
+import time
+
+import build_manifest
+import fix_icon_corners_v2
+import icon_stages
+import output_writer
+import process_nano_icons
+import quality
+import write_behind
+
+DEBOUNCE = 0.1
+POLL_INTERVAL = 0.1
+
+# Fixed Canva icons kept in memory, by source content hash
+CACHE_ITEMS = 32
+
+# inotify events for a finished write and a file moved into place
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_TO = 0x00000080
+_EVENT = struct.Struct('iIII')
+
+
+def watch_sources(base_dir):
+    """Watched source paths: dict of path -> (kind, icon name)."""
+    sources = {os.path.join(base_dir, 'nano_icons', source_file): ('nano', name)
+               for name, source_file in process_nano_icons.ICONS.items()}
+    for name in fix_icon_corners_v2.ICON_NAMES:
+        sources[os.path.join(base_dir, 'canva_icons', f'{name}.png')] = ('canva', name)
+    return sources
+
+
+def open_inotify(dirs):
+    """
+    An inotify descriptor watching dirs, and its dict of watch -> dir.
+    Returns (None, {}) where inotify is not available.
+    """
+    try:
+        libc = ctypes.CDLL(ctypes.util.find_library('c'), use_errno=True)
+        fd = libc.inotify_init1(os.O_NONBLOCK | os.O_CLOEXEC)
+    except (OSError, AttributeError):
+        return None, {}
+    if fd < 0:
+        return None, {}
+
+    watches = {}
+    for path in dirs:
+        wd = libc.inotify_add_watch(fd, os.fsencode(path), IN_CLOSE_WRITE | IN_MOVED_TO)
+        if wd < 0:
+            os.close(fd)
+            return None, {}
+        watches[wd] = path
+    return fd, watches
+
+
+def read_inotify(fd, watches, timeout):
+    """Paths written or moved into a watched dir within timeout seconds."""
+    ready, _, _ = select.select([fd], [], [], timeout)
+    if not ready:
+        return set()
+    data = os.read(fd, 64 * 1024)
+    paths = set()
+    offset = 0
+    while offset < len(data):
+        wd, _, _, length = _EVENT.unpack_from(data, offset)
+        name = data[offset + _EVENT.size:offset + _EVENT.size + length].rstrip(b'\0')
+        offset += _EVENT.size + length
+        if wd in watches and name:
+            paths.add(os.path.join(watches[wd], os.fsdecode(name)))
+    return paths
+
+
+def snapshot(paths):
+    """(size, mtime) of each path that exists."""
+    stats = {}
+    for path in paths:
+        try:
+            st = os.stat(path)
+        except OSError:
+            continue
+        stats[path] = (st.st_size, st.st_mtime_ns)
+    return stats
+
+
+def file_digest(path):
+    """SHA-256 of a source's bytes."""
+    with open(path, 'rb') as f:
+        return hashlib.sha256(f.read()).hexdigest()
+
+
+def refresh_nano(name, base_dir, project_dir, manifest_file):
+    """
+    Regenerate one nano icon and record it in the build manifest. The
+    manifest is loaded afresh, so entries written meanwhile by another run
+    (e.g. process_nano_icons.py or a shard) are kept.
+    """
+    with write_behind.writer() as save:
+        ok = process_nano_icons.process_icon(name, process_nano_icons.ICONS[name],
+                                             base_dir, project_dir, save)
+    if ok:
+        manifest = build_manifest.load_manifest(manifest_file)
+        source_path = os.path.join(base_dir, 'nano_icons', process_nano_icons.ICONS[name])
+        outputs = process_nano_icons.icon_outputs(name, base_dir, project_dir)
+        build_manifest.record(manifest, f'nano/{name}',
+                              build_manifest.relative_paths([source_path], project_dir),
+                              build_manifest.relative_paths(outputs, project_dir),
+                              process_nano_icons.nano_config(), project_dir)
+        build_manifest.save_manifest(manifest, manifest_file)
+
+
+def refresh_canva(name, path, digest, fixed_cache, project_dir):
+    """Fix one Canva export (or reuse its fixed icon) and regenerate its sizes."""
+    raw = quality.reduce_source(Image.open(path).convert('RGB'))
+    fixed = fixed_cache.pop(digest, None)
+    if fixed is None:
+        fixed = fix_icon_corners_v2.fix_gray_pixels(raw)
+    fixed_cache[digest] = fixed
+    while len(fixed_cache) > CACHE_ITEMS:
+        fixed_cache.popitem(last=False)
+    icon_stages.render_platforms(name, fixed, project_dir, preview=raw)
+
+
+def watch(base_dir, project_dir, debounce=DEBOUNCE, poll=False):
+    """Watch the sources until interrupted."""
+    sources = watch_sources(base_dir)
+    dirs = sorted({os.path.dirname(path) for path in sources})
+    dirs = [path for path in dirs if os.path.isdir(path)]
+    manifest_file = build_manifest.manifest_path(base_dir)
+
+    fd, watches = (None, {}) if poll else open_inotify(dirs)
+    print(f"Watching {len(sources)} sources in {', '.join(os.path.relpath(d) for d in dirs)} "
+          f"({'inotify' if fd is not None else 'polling'}); Ctrl-C to stop")
+
+    # Content hashes of the sources as they are now, so only real changes run
+    digests = {path: file_digest(path) for path in snapshot(sources)}
+    fixed_cache = collections.OrderedDict()
+    stats = snapshot(sources)
+    pending = {}
+
+    while True:
+        timeout = debounce if pending else (None if fd is not None else POLL_INTERVAL)
+        if fd is not None:
+            changed = read_inotify(fd, watches, timeout)
+        else:
+            time.sleep(timeout)
+            current = snapshot(sources)
+            changed = {path for path in current if current[path] != stats.get(path)}
+            stats = current
+
+        now = time.monotonic()
+        for path in changed & sources.keys():
+            pending[path] = now
+
+        for path in [p for p, seen in pending.items() if now - seen >= debounce]:
+            del pending[path]
+            if not os.path.exists(path):
+                continue
+            digest = file_digest(path)
+            kind, name = sources[path]
+            if digests.get(path) == digest:
+                print(f"{name}: {os.path.basename(path)} unchanged")
+                continue
+
+            saved_at = os.stat(path).st_mtime
+            start = time.perf_counter()
+            try:
+                if kind == 'nano':
+                    refresh_nano(name, base_dir, project_dir, manifest_file)
+                else:
+                    print(f"Processing {name}...")
+                    refresh_canva(name, path, digest, fixed_cache, project_dir)
+            except Exception as e:
+                # A half-written or broken save: keep watching, and regenerate on the
+                # next save even if it restores the last good bytes
+                digests.pop(path, None)
+                print(f"✗ {name}: {type(e).__name__}: {e}")
+                sys.stdout.flush()
+                continue
+            # Only a successful refresh marks these bytes as done
+            digests[path] = digest
+            print(f"✓ {name} refreshed in {time.perf_counter() - start:.2f}s "
+                  f"({time.time() - saved_at:.2f}s after the save)")
+            sys.stdout.flush()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Regenerate icons when their sources change")
+    parser.add_argument('--debounce', type=float, default=DEBOUNCE,
+                        help=f'seconds a source must be unchanged before it is processed '
+                             f'(default {DEBOUNCE})')
+    parser.add_argument('--poll', action='store_true',
+                        help='poll for changes instead of using inotify')
+    quality.add_quality_argument(parser)
+    args = parser.parse_args()
+    quality.set_quality(args.quality)
+
+    base_dir = os.path.dirname(os.path.abspath(__file__))
+    project_dir = os.path.dirname(base_dir)
+
+    # Load every image plugin now rather than on the first save
+    Image.init()
+    try:
+        watch(base_dir, project_dir, args.debounce, args.poll)
+    except KeyboardInterrupt:
+        output_writer.print_summary()
+        print("\n✓ Stopped watching")
+
+
+if __name__ == '__main__':
+    main()
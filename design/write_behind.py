@@ -0,0 +1,75 @@
+#!/usr/bin/env python3
+"""
+Write-behind PNG encoder.
+Encoding (zlib) is most of the cost of a small output, and Pillow releases
+the GIL while it encodes, so queued saves run on a thread pool while the
+caller goes on resizing the next size or icon.
+
+    with write_behind.writer() as save:
+        render_plan.render(img, targets, save=save)
+
+Queued images must not be modified afterwards. The decoded bytes of queued
+but unwritten images are capped (max_pending_mb); save blocks while the cap
+is reached. The first failed write is raised by the next save call, or when
+the writer exits, which also waits for every queued write.
+
+Writes go through output_writer.write_png (unchanged files are skipped)
+with durable=True: each file is written to a temporary name in the same
+directory, fsynced and renamed over the target, so a crash leaves either
+the old file or the new one, never a truncated PNG.
+"""
+
+from concurrent.futures import ThreadPoolExecutor
+import contextlib
+import functools
+import os
+import threading
+
+import output_writer
+
+DEFAULT_WORKERS = min(4, os.cpu_count() or 1)
+DEFAULT_MAX_PENDING_MB = 64
+
+
+def image_bytes(img):
+    """Decoded size of an image, as counted against the in-flight cap."""
+    return img.size[0] * img.size[1] * len(img.getbands())
+
+
+@contextlib.contextmanager
+def writer(workers=DEFAULT_WORKERS, max_pending_mb=DEFAULT_MAX_PENDING_MB, durable=True):
+    """
+    Context manager yielding save(img, path), which queues an atomic PNG
+    write. Leaving the block waits for every write and raises the first
+    failure, if any.
+    """
+    limit = max_pending_mb * 1024 * 1024
+    state = {'pending': 0, 'error': None}
+    changed = threading.Condition()
+    pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='write-behind')
+
+    def finished(nbytes, future):
+        with changed:
+            state['pending'] -= nbytes
+            if future.exception() is not None and state['error'] is None:
+                state['error'] = future.exception()
+            changed.notify_all()
+
+    def save(img, path):
+        nbytes = image_bytes(img)
+        with changed:
+            # An image larger than the cap is still admitted once the queue drains
+            changed.wait_for(lambda: state['error'] is not None or state['pending'] == 0
+                             or state['pending'] + nbytes <= limit)
+            if state['error'] is not None:
+                raise state['error']
+            state['pending'] += nbytes
+        future = pool.submit(output_writer.write_png, img, path, durable)
+        future.add_done_callback(functools.partial(finished, nbytes))
+
+    try:
+        yield save
+    finally:
+        pool.shutdown(wait=True)
+    if state['error'] is not None:
+        raise state['error']
@@ -3,9 +3,23 @@
 Generate alternate app icons for iOS by applying color tints to the base icon.
 """
 
-from PIL import Image, ImageEnhance, ImageFilter
+from PIL import Image
+import argparse
 import colorsys
+import functools
 import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', '..', 'design'))
+import build_manifest
+import color_plan
+import memory_budget
+import output_writer
+import parallel
+import pixel_cache
+import quality
+import render_plan
+import sharding
 
 # Source icon
 SOURCE_ICON = "Assets.xcassets/AppIcon.appiconset/Icon-App-1024x1024@1x.png"
@@ -30,6 +44,10 @@ SIZES = [
     (180, "60x60@3x"),
 ]
 
+# What one icon job does, for memory_budget.predict
+ICON_OPS = ("copy", "convert", "resize", "encode")
+
+@pixel_cache.cached('shift_hue', version=1)
 def shift_hue(img, hue_shift, saturation_mult=1.0, brightness_mult=1.0):
     """Shift the hue of an image while preserving alpha."""
     if img.mode != 'RGBA':
@@ -79,7 +97,60 @@ def create_icon_with_background(source_img, bg_color, size):
 
     return bg
 
+def color_op(config, op=shift_hue):
+    """The icon's point-wise colour transform as a function of one image."""
+    return functools.partial(op, hue_shift=config["hue_shift"],
+                             saturation_mult=config["saturation"],
+                             brightness_mult=config["brightness"])
+
+def generate_icon(source, icon_name, config, script_dir,
+                  tolerance=color_plan.DEFAULT_TOLERANCE, verify=False):
+    """Apply one icon's colour transform and write its sizes."""
+    print(f"\nGenerating {icon_name} icon...")
+
+    # The colour transform is point-wise, so it may run after the resize
+    sizes = [size for size, _ in SIZES]
+    plan = color_plan.plan_point_op(source, color_op(config), sizes, tolerance)
+    print(f"  Plan: {color_plan.describe(plan)}")
+
+    # Generate each size (iOS alternate icons use this naming convention)
+    targets = [(size, os.path.join(script_dir, f"AppIcon-{icon_name}-{suffix}.png"))
+               for size, suffix in SIZES]
+    elapsed = color_plan.render_point_op(source, color_op(config), targets, plan)
+    for size, suffix in SIZES:
+        print(f"  Created: AppIcon-{icon_name}-{suffix}.png")
+    print(f"  Rendered in {elapsed:.2f}s")
+
+    if verify:
+        check = color_plan.verify_plan(source, color_op(config, shift_hue.uncached), sizes)
+        e = check['delta_e']
+        print(f"  Verify: op-first {check['op_first_seconds']:.2f}s, "
+              f"resize-first {check['resize_first_seconds']:.2f}s "
+              f"({check['op_first_seconds'] / check['resize_first_seconds']:.1f}x), "
+              f"full-size dE p{color_plan.ERROR_PERCENTILE} {e['percentile']:.2f} "
+              f"(max {e['max']:.2f})")
+
+def generate_shared_icon(source_handle, icon_name, config, script_dir, tolerance, verify):
+    """generate_icon in a worker, reading the source from shared memory."""
+    generate_icon(parallel.crop_shared(source_handle), icon_name, config, script_dir,
+                  tolerance, verify)
+
 def main():
+    parser = argparse.ArgumentParser(description="Generate alternate app icons")
+    parser.add_argument('--max-delta-e', type=float, default=color_plan.DEFAULT_TOLERANCE,
+                        help='colour error allowed for applying the tint after resizing '
+                             '(0 keeps the original order)')
+    parser.add_argument('--verify-order', action='store_true',
+                        help='also run both orders at full size and report time and error')
+    parallel.add_jobs_argument(parser)
+    quality.add_quality_argument(parser)
+    memory_budget.add_memory_argument(parser)
+    sharding.add_shard_argument(parser)
+    args = parser.parse_args()
+    quality.set_quality(args.quality)
+    memory_budget.set_max_memory(args.max_memory)
+    sharding.set_shard(args.shard)
+
     script_dir = os.path.dirname(os.path.abspath(__file__))
     source_path = os.path.join(script_dir, SOURCE_ICON)
 
@@ -91,30 +162,44 @@ def main():
     source = Image.open(source_path).convert('RGBA')
     print(f"Loaded source icon: {source.size}")
 
-    for icon_name, config in ICONS.items():
-        print(f"\nGenerating {icon_name} icon...")
-
-        # Apply color transformation
-        transformed = shift_hue(
-            source,
-            config["hue_shift"],
-            config["saturation"],
-            config["brightness"]
-        )
-
-        # Generate each size
-        for size, suffix in SIZES:
-            # Resize
-            resized = transformed.resize((size, size), Image.Resampling.LANCZOS)
-
-            # Output filename (iOS alternate icons use this naming convention)
-            output_name = f"AppIcon-{icon_name}-{suffix}.png"
-            output_path = os.path.join(script_dir, output_name)
-
-            # Save
-            resized.save(output_path, "PNG")
-            print(f"  Created: {output_name}")
-
+    names = sharding.select(ICONS)
+    if args.shard:
+        print(sharding.describe(names, ICONS))
+
+    if parallel.resolve_jobs(args.jobs) == 1:
+        for icon_name in names:
+            generate_icon(source, icon_name, ICONS[icon_name], script_dir,
+                          args.max_delta_e, args.verify_order)
+    else:
+        with parallel.shared_image(source) as source_handle:
+            parallel.run_per_icon(
+                generate_shared_icon,
+                [(source_handle, icon_name, ICONS[icon_name], script_dir,
+                  args.max_delta_e, args.verify_order)
+                 for icon_name in names],
+                args.jobs,
+                memory=[memory_budget.predict(source.size, ICON_OPS)] * len(names))
+
+    if args.shard:
+        # Paths are recorded relative to the project, like the other generators
+        project_dir = os.path.dirname(os.path.dirname(script_dir))
+        manifest_file = build_manifest.manifest_path(os.path.join(project_dir, 'design'))
+        manifest = build_manifest.load_manifest(manifest_file)
+        sources = build_manifest.relative_paths([source_path], project_dir)
+        for icon_name in names:
+            outputs = [os.path.join(script_dir, f"AppIcon-{icon_name}-{suffix}.png")
+                       for _, suffix in SIZES]
+            build_manifest.record(manifest, f"alternate/{icon_name}", sources,
+                                  build_manifest.relative_paths(outputs, project_dir),
+                                  {"icon": ICONS[icon_name], "sizes": SIZES,
+                                   "max_delta_e": args.max_delta_e,
+                                   "quality": quality.QUALITY,
+                                   "plan": render_plan.plan_config()}, project_dir)
+        sharding.write_partial(manifest_file, "alternate", manifest,
+                               [(icon_name, f"alternate/{icon_name}") for icon_name in ICONS])
+
+    pixel_cache.print_summary()
+    output_writer.print_summary()
     print("\nDone! Now add these to Info.plist CFBundleAlternateIcons")
 
 if __name__ == "__main__":